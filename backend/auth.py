@@ -1,14 +1,18 @@
+import asyncio
+import hashlib
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, TypeVar
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
 from config import settings
-from database import get_db
 from models import Student
-import requests
+from ttl_cache import TTLCache
+from wechat_client import WechatError, WechatUnavailable, wechat_client
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,6 +33,33 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+def create_refresh_token(data: Dict[str, Any], family: Optional[str] = None) -> str:
+    """
+    创建刷新令牌：带唯一的 jti 和令牌族 fam，每次刷新换发同族的新令牌并吊销旧的。
+    data 为换发访问令牌时使用的用户声明。
+    """
+    to_encode = data.copy()
+    to_encode.update({
+        "typ": "refresh",
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
+        "exp": datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days),
+    })
+    return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+
+def decode_refresh_token(token: str) -> Dict[str, Any]:
+    """校验刷新令牌的签名、有效期与类型（只做 HMAC 校验，不查库）"""
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        payload = None
+    if not payload or payload.get("typ") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的刷新令牌",
+        )
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -37,25 +68,102 @@ def get_password_hash(password: str) -> str:
     """获取密码哈希"""
     return pwd_context.hash(password)
 
+T = TypeVar("T")
+
+class PasswordHasher:
+    """
+    bcrypt 专用的有界线程池。
+
+    bcrypt 每次计算 100~300ms，在 async 接口里直接调用会卡住整个事件循环。这里固定
+    password_hash_workers 个线程（bcrypt 计算时释放 GIL，线程即可并行），排队的任务
+    超过 password_hash_max_queue 时直接返回 503，登录高峰不会拖慢其他接口。
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _release(self, future: Future) -> None:
+        # 按线程中的任务结束计数，调用方断开连接时任务仍占着名额直到算完
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="登录请求过多，请稍后重试",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": in_flight,
+            "queued": max(in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_queue)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码线程池中验证密码，线程池饱和时抛出 503"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码线程池中计算密码哈希，线程池饱和时抛出 503"""
+    return await password_hasher.run(get_password_hash, password)
+
+# 已验签令牌的载荷：键为令牌的 sha256，条目在令牌的 exp 时刻过期
+token_cache: TTLCache[Dict[str, Any]] = TTLCache(settings.token_cache_size)
+
 def verify_token(token: str) -> Dict[str, Any]:
-    """验证JWT令牌"""
+    """验证JWT令牌；验签通过的载荷缓存到令牌过期，同一令牌的后续请求不再重复验签"""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证令牌",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # 没有 exp 的令牌不缓存，每次都验签
+    if isinstance(payload.get("exp"), (int, float)):
+        token_cache.put(key, payload, float(payload["exp"]))
+    return payload
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, Any]:
     """获取当前认证用户的依赖项"""
     token = credentials.credentials
     payload = verify_token(token)
+    if payload.get("typ") == "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="刷新令牌不能用于访问接口",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     user_id: Optional[str] = payload.get("sub")
     user_type: Optional[str] = payload.get("user_type")
@@ -71,7 +179,8 @@ async def get_current_user(
         "user_id": user_id,
         "user_type": user_type,
         "name": payload.get("name"),
-        "student_code": payload.get("student_code")
+        "student_code": payload.get("student_code"),
+        "teacher_id": payload.get("teacher_id")
     }
 
 async def get_current_student(
@@ -96,23 +205,29 @@ async def get_current_teacher(
         )
     return current_user
 
-def get_wechat_session(code: str) -> Dict[str, Any]:
+async def get_current_admin(
+    current_user: Dict[str, Any] = Depends(get_current_teacher)
+) -> Dict[str, Any]:
+    """获取管理员（工号在 admin_teacher_ids 中的教师）的依赖项"""
+    if current_user.get("teacher_id") not in settings.admin_teacher_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限访问此接口"
+        )
+    return current_user
+
+async def get_wechat_session(code: str) -> Dict[str, Any]:
     """通过微信code获取openid和session_key"""
-    url = "https://api.weixin.qq.com/sns/jscode2session"
-    params = {
-        "appid": settings.wechat_app_id,
-        "secret": settings.wechat_app_secret,
-        "js_code": code,
-        "grant_type": "authorization_code"
-    }
-    
-    response = requests.get(url, params=params)
-    result = response.json()
-    
-    if "errcode" in result:
+    try:
+        return await wechat_client.jscode2session(code)
+    except WechatError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"微信登录失败: {result.get('errmsg', '未知错误')}"
+            detail=f"微信登录失败: {e.errmsg}"
+        )
+    except WechatUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(int(settings.wechat_breaker_reset_seconds))},
         )
-    
-    return result 
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+内容寻址的二进制存储
+
+答题卡图片、试卷/参考答案原件等大文件不再放在数据库行里，而是按内容的 sha256
+存到外部存储，数据库只保存 64 位十六进制的 key。相同内容只存一份。
+
+后端可插拔：默认本地文件系统（LocalBlobStore），对象存储实现 BlobStore 的
+put_bytes / get / exists 后用 register_backend 注册，再通过 blob_store_backend 配置启用。
+"""
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+from config import settings
+from models import RawAnswerSheet, Subject
+
+class BlobNotFound(KeyError):
+    """key 对应的内容不存在"""
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class BlobStore(ABC):
+    """存储后端接口：put 计算 key 并在内容不存在时写入"""
+
+    def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        if not self.exists(key):
+            self.put_bytes(key, data)
+        return key
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes) -> None:
+        """按 key 写入内容（同一 key 的内容总是相同，重复写入无害）"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """按 key 读取内容，不存在时抛出 BlobNotFound"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """key 对应的内容是否已存在"""
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统后端，按 key 前两级目录分散存放：root/ab/cd/abcd..."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，并发写入同一内容时不会读到半个文件
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+BLOB_BACKENDS: Dict[str, Callable[[], BlobStore]] = {
+    "local": lambda: LocalBlobStore(settings.blob_store_root),
+}
+
+def register_backend(name: str, factory: Callable[[], BlobStore]) -> None:
+    """注册对象存储等其他后端"""
+    BLOB_BACKENDS[name] = factory
+
+_store: Optional[BlobStore] = None
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BLOB_BACKENDS[settings.blob_store_backend]()
+    return _store
+
+# ==================== 模型字段 ====================
+
+# 模型上的二进制字段 -> 保存 key 的列。原二进制列保留为延迟加载，仅供未迁移的旧数据读取
+BLOB_FIELDS = {
+    Subject: {
+        "question": "question_blob_key",
+        "ref_answer": "ref_answer_blob_key",
+        "sample_answer_sheet": "sample_answer_sheet_blob_key",
+    },
+    RawAnswerSheet: {
+        "raw_image_blob": "raw_image_blob_key",
+    },
+}
+
+def read_blob(obj, field: str) -> Optional[bytes]:
+    """优先按 key 读取；没有 key 的旧数据才加载延迟列"""
+    key = getattr(obj, BLOB_FIELDS[type(obj)][field])
+    if key is not None:
+        return get_blob_store().get(key)
+    return getattr(obj, field)
@@ -0,0 +1,16 @@
+"""
+测试公共配置
+
+测试不读取本地的 config.py（其中是各自环境的数据库与密钥）：统一使用 config_example 中的
+默认配置，数据库连接串通过环境变量指向临时 SQLite 文件。各测试自建引擎，这里只保证导入
+database 等模块时不会指向 MySQL。
+"""
+import importlib
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="exam-test-"), "test.db")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("READ_REPLICA_URLS", None)
+sys.modules["config"] = importlib.import_module("config_example")
@@ -1,23 +1,144 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Any, AsyncGenerator, Dict, Generator, Optional, Tuple
 from config import settings
-from models import Base
+from models import Exam
+from pool_metrics import configure_engine, pool_options, pool_snapshot
+import query_metrics  # noqa: F401  注册SQL耗时统计事件
 
-# 创建数据库引擎
-engine = create_engine(
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str, explicit: Optional[str] = None) -> str:
+    """返回异步引擎使用的连接串：优先使用显式配置，否则把同步驱动替换为对应的异步驱动"""
+    if explicit:
+        return explicit
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+# 创建数据库引擎（同步，供脚本和离线任务使用）
+# 连接池大小、溢出、超时与探活策略见 Settings 的 db_pool_* 配置
+engine = configure_engine(create_engine(
     settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=True  # 开发时可以看到SQL语句，生产环境建议设为False
-)
+    echo=settings.sql_echo,  # 逐条打印SQL，仅用于本地调试；耗时统计见 query_metrics
+    **pool_options(settings.database_url, settings)
+), settings)
 
 # 创建SessionLocal类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# 创建数据库表
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+def _create_async_engine(url: str):
+    engine = create_async_engine(url, echo=settings.sql_echo, **pool_options(url, settings, is_async=True))
+    configure_engine(engine.sync_engine, settings)
+    return engine
+
+# 创建异步数据库引擎（接口使用，查询不阻塞事件循环）
+async_engine = _create_async_engine(
+    async_database_url(settings.database_url, settings.async_database_url)
+)
+
+# 创建AsyncSessionLocal类
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# 只读副本引擎（分析类GET接口使用），未配置时读请求也走主库
+replica_engines = [
+    _create_async_engine(async_database_url(url)) for url in settings.read_replica_urls
+]
+ReplicaSessionLocals = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False)
+    for replica in replica_engines
+]
+
+class ReplicaRouter:
+    """
+    读请求路由：轮询只读副本，副本上该考试的版本号（exam.publish_version）落后于主库时回退到主库。
+
+    版本号在每次发布（包括改分后的重新发布）和阅卷中的写入时加一，只增不减，因此副本的版本号
+    不低于主库即说明副本已包含这些写入。主库和各副本的版本号各自缓存 version_check_seconds 秒
+    （每个考试一条按主键的查询）；本进程提交写入后立即重新读取主库版本号，保证写后读一致，
+    其他进程的写入最多 version_check_seconds 秒后被感知，与响应缓存的版本号同步间隔一致。
+    不带考试ID的请求（如趋势页）跨多场考试，比较的是全部考试版本号之和。
+    """
+
+    def __init__(self, primary, session_makers, version_check_seconds: float):
+        self.primary = primary
+        self.session_makers = list(session_makers)
+        self.version_check_seconds = version_check_seconds
+        self._next = 0
+        # 会话工厂 -> {考试ID（None 表示全部考试）: (查询时刻, 版本号)}
+        self._versions: Dict[Any, Dict[Optional[int], Tuple[float, int]]] = {
+            maker: {} for maker in [primary] + self.session_makers
+        }
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def note_write(self, exam_id: int) -> None:
+        """本进程提交了该考试的写入（发布、改分）后调用，下次读请求重新读取主库版本号"""
+        with self._lock:
+            self._versions[self.primary].pop(exam_id, None)
+            self._versions[self.primary].pop(None, None)
+
+    async def _version(self, maker, exam_id: Optional[int]) -> int:
+        now = time.monotonic()
+        cached = self._versions[maker].get(exam_id)
+        if cached is not None and now - cached[0] < self.version_check_seconds:
+            return cached[1]
+        if exam_id is None:
+            query = select(func.sum(Exam.publish_version))
+        else:
+            query = select(Exam.publish_version).where(Exam.id == exam_id)
+        async with maker() as db:
+            version = (await db.execute(query)).scalar() or 0
+        with self._lock:
+            self._versions[maker][exam_id] = (now, version)
+        return version
+
+    async def session_maker(self, exam_id: Optional[int]):
+        if self.session_makers:
+            required = await self._version(self.primary, exam_id)
+            with self._lock:
+                start = self._next
+                self._next = (self._next + 1) % len(self.session_makers)
+            for offset in range(len(self.session_makers)):
+                replica = self.session_makers[(start + offset) % len(self.session_makers)]
+                if await self._version(replica, exam_id) >= required:
+                    with self._lock:
+                        self.replica_reads += 1
+                    return replica
+        with self._lock:
+            self.primary_reads += 1
+        return self.primary
+
+replica_router = ReplicaRouter(AsyncSessionLocal, ReplicaSessionLocals, settings.replica_version_check_seconds)
+
+def _request_exam_id(request: Request) -> Optional[int]:
+    """从路径参数 exam_id 或查询参数 examId 中取考试ID，演示数据ID返回None"""
+    value = request.path_params.get("exam_id") or request.query_params.get("examId")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# 连接池监控快照
+def pool_status() -> dict:
+    return {
+        "sync": pool_snapshot(engine.pool),
+        "async": pool_snapshot(async_engine.sync_engine.pool),
+        "replicas": [pool_snapshot(replica.sync_engine.pool) for replica in replica_engines],
+        "read_routing": {
+            "replica_reads": replica_router.replica_reads,
+            "primary_reads": replica_router.primary_reads,
+        },
+    }
 
 # 获取数据库会话的依赖项
 def get_db() -> Generator[Session, None, None]:
@@ -25,4 +146,15 @@ def get_db() -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# 获取异步数据库会话的依赖项
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# 获取只读数据库会话的依赖项：分析类接口使用，副本上该考试的版本号追上主库时才读副本
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_maker = await replica_router.session_maker(_request_exam_id(request))
+    async with session_maker() as db:
+        yield db
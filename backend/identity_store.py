@@ -0,0 +1,154 @@
+"""
+登录身份存储
+
+账号密码存放在 credential 表（(user_type, identity_id) 唯一索引），微信 openid 与账号的
+绑定存放在 wechat_binding 表（openid 唯一索引）。登录身份（含密码哈希）和绑定在进程内缓存
+identity_cache_ttl_seconds 秒：成绩发布当天同一设备反复登录时直接命中缓存，不访问数据库。
+
+修改账号（密码、姓名等）时同时更新 credential.updated_at。每个进程每隔
+identity_refresh_seconds 秒按 updated_at 索引查一次最近修改过的账号并使其缓存失效
+（一次范围查询，而不是每次登录一次），其他进程修改的密码最多延迟一个同步周期生效；
+本进程内的修改由 forget 立即生效。
+
+    python identity_store.py seed-demo [密码]                        # 为全部学生和演示教师建立账号
+    python identity_store.py set-password <student|teacher> <考号/工号> <密码>
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Credential, Student, WechatBinding
+from ttl_cache import TTLCache
+
+# 演示教师账号
+DEMO_TEACHER = {"identity_id": "teacher001", "user_id": "t1", "name": "王老师",
+                "avatar": "https://example.com/teacher_avatar.jpg"}
+
+class Identity(NamedTuple):
+    user_type: str
+    identity_id: str
+    user_id: str
+    name: Optional[str]
+    avatar: Optional[str]
+
+# 查找最近修改的账号时向前多看的时长：updated_at 在提交前由应用服务器时钟写入，
+# 覆盖提交延迟和服务器之间的时钟偏差
+CHANGE_LOOKBACK = timedelta(seconds=5)
+
+identity_cache: TTLCache[Tuple[Identity, str]] = TTLCache(settings.identity_cache_size)
+binding_cache: TTLCache[Tuple[str, str]] = TTLCache(settings.identity_cache_size)
+_changes_checked_at: Optional[datetime] = None
+
+def _expires_at() -> float:
+    return time.time() + settings.identity_cache_ttl_seconds
+
+async def _drop_changed(db: AsyncSession) -> None:
+    """每隔 identity_refresh_seconds 秒一次：使上次检查以来修改过的账号的缓存失效"""
+    global _changes_checked_at
+    now = datetime.now(timezone.utc)
+    since = _changes_checked_at
+    if since is not None and (now - since).total_seconds() < settings.identity_refresh_seconds:
+        return
+    _changes_checked_at = now
+    if since is None:
+        # 进程内第一次登录：缓存还是空的
+        return
+    changed = await db.execute(
+        select(Credential.user_type, Credential.identity_id)
+        .where(Credential.updated_at >= since - CHANGE_LOOKBACK)
+    )
+    for user_type, identity_id in changed:
+        identity_cache.pop((user_type, identity_id))
+
+async def get_login(db: AsyncSession, user_type: str, identity_id: str) -> Optional[Tuple[Identity, str]]:
+    """按 (用户类型, 考号/工号) 取登录身份和密码哈希，账号不存在时返回 None"""
+    key = (user_type, identity_id)
+    await _drop_changed(db)
+    cached = identity_cache.get(key)
+    if cached is not None:
+        return cached
+    credential = (await db.execute(
+        select(Credential).where(Credential.user_type == user_type, Credential.identity_id == identity_id)
+    )).scalar_one_or_none()
+    if credential is None:
+        return None
+    login = (Identity(credential.user_type, credential.identity_id, credential.user_id,
+                      credential.name, credential.avatar), credential.password_hash)
+    identity_cache.put(key, login, _expires_at())
+    return login
+
+async def bind_openid(db: AsyncSession, openid: str, identity: Identity) -> None:
+    """把 openid 绑定到该身份；已绑定其他账号时改绑到最近登录的账号"""
+    target = (identity.user_type, identity.identity_id)
+    if binding_cache.get(openid) == target:
+        return
+    binding = (await db.execute(
+        select(WechatBinding).where(WechatBinding.openid == openid)
+    )).scalar_one_or_none()
+    if binding is None:
+        db.add(WechatBinding(openid=openid, user_type=target[0], identity_id=target[1]))
+    elif (binding.user_type, binding.identity_id) != target:
+        binding.user_type, binding.identity_id = target
+        binding.bound_at = datetime.now(timezone.utc)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 同一设备的并发登录已经写入了绑定
+        await db.rollback()
+    binding_cache.put(openid, target, _expires_at())
+
+def forget(user_type: str, identity_id: str) -> None:
+    """账号信息修改后，使本进程缓存的身份立即失效（其他进程由 _drop_changed 发现）"""
+    identity_cache.pop((user_type, identity_id))
+
+# ==================== 账号维护（同步会话，供命令行使用） ====================
+
+def set_password(db: Session, user_type: str, identity_id: str, password_hash: str) -> bool:
+    credential = db.execute(
+        select(Credential).where(Credential.user_type == user_type, Credential.identity_id == identity_id)
+    ).scalar_one_or_none()
+    if credential is None:
+        return False
+    credential.password_hash = password_hash
+    credential.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    forget(user_type, identity_id)
+    return True
+
+def seed_demo(db: Session, password_hash: str) -> int:
+    """为还没有账号的学生（按考号）和演示教师建立账号，所有账号使用同一个密码，返回新建数"""
+    existing = set(db.execute(select(Credential.user_type, Credential.identity_id)).all())
+    credentials = [
+        Credential(user_type="student", identity_id=code, user_id=str(student_id), name=name,
+                   password_hash=password_hash)
+        for student_id, code, name in db.execute(select(Student.id, Student.student_code, Student.name))
+        if code and ("student", code) not in existing
+    ]
+    if ("teacher", DEMO_TEACHER["identity_id"]) not in existing:
+        credentials.append(Credential(user_type="teacher", password_hash=password_hash, **DEMO_TEACHER))
+    db.add_all(credentials)
+    db.commit()
+    return len(credentials)
+
+if __name__ == "__main__":
+    from auth import get_password_hash
+    from database import SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    with SessionLocal() as session:
+        if command == "seed-demo":
+            created = seed_demo(session, get_password_hash(sys.argv[2] if len(sys.argv) > 2 else "123456"))
+            print(f"新建账号: {created}")
+        elif command == "set-password" and len(sys.argv) == 5:
+            found = set_password(session, sys.argv[2], sys.argv[3], get_password_hash(sys.argv[4]))
+            print("密码已更新" if found else "账号不存在")
+        else:
+            print("用法: python identity_store.py seed-demo [密码] | set-password <student|teacher> <考号/工号> <密码>")
+            sys.exit(1)
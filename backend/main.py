@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import create_tables
-from routers import auth, student, teacher
+from database import engine
+from migrations import verify_schema
+from query_metrics import start_request
+from routers import auth, student, teacher, grading, metrics
+from wechat_client import wechat_client
 from config import settings
 
 # 创建FastAPI应用实例
@@ -22,10 +25,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 每个请求的SQL统计：语句条数与累计耗时写入响应头
+@app.middleware("http")
+async def query_accounting(request: Request, call_next):
+    stats = start_request(request.url.path)
+    response = await call_next(request)
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.2f}"
+    if stats.repeated:
+        response.headers["X-DB-Repeated-Statements"] = str(len(stats.repeated))
+    return response
+
 # 注册路由
 app.include_router(auth.router)
 app.include_router(student.router)
 app.include_router(teacher.router)
+app.include_router(grading.router)
+app.include_router(metrics.router)
 
 # 根路径
 @app.get("/")
@@ -48,9 +64,9 @@ async def health_check():
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行的操作"""
-    # 创建数据库表
-    create_tables()
-    print("数据库表创建完成")
+    # 只校验数据库结构版本，建表和加索引由 python migrations.py upgrade 完成
+    version = verify_schema(engine)
+    print(f"数据库结构版本: {version}")
     print(f"API文档地址: http://localhost:8000/docs")
 
 # 应用关闭事件
@@ -58,6 +74,7 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭时执行的操作"""
     print("应用正在关闭...")
+    await wechat_client.aclose()
 
 if __name__ == "__main__":
     import uvicorn
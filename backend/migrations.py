@@ -0,0 +1,406 @@
+"""
+数据库结构版本管理
+
+每个迁移是一个 (版本号, 说明, 函数) 三元组，按版本号顺序执行，每个迁移都写成幂等的
+（先检查表/列/索引是否存在），因此对旧库、半途失败的库重复执行都是安全的。
+已执行的迁移记录在 schema_version 表中。
+
+应用启动时只调用 verify_schema 检查版本号（一次查询），不再每次启动都做 create_all 的
+结构探测；升级由部署流程显式执行：
+
+    python migrations.py upgrade    # 执行所有未执行的迁移
+    python migrations.py current    # 查看当前版本
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import (
+    DECIMAL, BigInteger, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    UniqueConstraint, func, inspect, select, text
+)
+from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from models import (
+    Answer, Credential, Exam, GradeRecord, GradeRecordArchive, Question, RawAnswerSheet, RevokedToken, Student,
+    WechatBinding
+)
+
+# 版本表不属于业务模型，单独放在自己的 MetaData 中，不参与 create_all
+version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255)),
+    Column('applied_at', DateTime(timezone=True)),
+)
+
+# 回填二进制内容时每批处理的行数（每行可能是几MB的图片）
+BLOB_BACKFILL_BATCH = 50
+
+# ==================== 幂等的结构操作 ====================
+
+def add_column(connection: Connection, model, column_name: str) -> bool:
+    """表中缺少该列时按模型定义补上，返回是否执行了 ALTER"""
+    table = model.__table__
+    existing = {c["name"] for c in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return False
+    ddl = CreateColumn(table.c[column_name]).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+    return True
+
+def create_index(connection: Connection, model, index_name: str) -> bool:
+    """按模型中声明的同名索引建索引，已存在则跳过"""
+    table = model.__table__
+    existing = {ix["name"] for ix in inspect(connection).get_indexes(table.name)}
+    if index_name in existing:
+        return False
+    index = next(ix for ix in table.indexes if ix.name == index_name)
+    index.create(connection)
+    return True
+
+# ==================== 基线结构（迁移 1） ====================
+#
+# 引入迁移时已有的表，按当时的模型原样冻结在这里，之后修改 models.py 不影响它。
+# 不含迁移 2 补的列、迁移 3 建的索引；此后的结构变化都写成新的迁移。
+baseline_metadata = MetaData()
+
+Table(
+    'exam', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('intro', Text),
+    Column('school_name', String(255)),
+    Column('uploader_id', Text),
+    Column('chief_teacher_id', Text),
+    Column('grade', String(50)),
+    Column('material_root', Text),
+)
+
+Table(
+    'subject', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('exam_id', BIGINT, ForeignKey('exam.id')),
+    Column('name', String(10)),
+    Column('question_path', Text),
+    Column('ref_answer_path', Text),
+    Column('sample_answer_sheet_path', Text),
+    Column('question', LargeBinary),
+    Column('ref_answer', LargeBinary),
+    Column('sample_answer_sheet', LargeBinary),
+    Column('answer_sheet_division', Text),
+    Column('choice_sheet_location_list', Text),
+    UniqueConstraint('exam_id', 'name', name='uq_subject_exam_name'),
+)
+
+Table(
+    'question', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('subject_id', BIGINT, ForeignKey('subject.id')),
+    Column('question_code', BIGINT),
+    Column('question_text', Text),
+    Column('question_path', Text),
+    Column('ref_answer_text', Text),
+    Column('ref_answer_path', Text),
+    Column('template_text', Text),
+    Column('template_path', Text),
+    Column('strategy', Text),
+    Column('full_score', DECIMAL(5, 2)),
+    Column('question_type', String(50)),
+    Column('question_division', Text),
+    Column('sub_ocr_division', Text),
+    UniqueConstraint('subject_id', 'question_code', name='uq_subject_exam_name'),
+)
+
+Table(
+    'student', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('student_code', String(50)),
+    Column('name', String(100)),
+    Column('cclass', BIGINT),
+    UniqueConstraint('student_code', name='uq_student_code'),
+)
+
+Table(
+    'raw_answer_sheet', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('subject_id', BIGINT, ForeignKey('subject.id')),
+    Column('student_id', BIGINT, ForeignKey('student.id'), nullable=True),
+    Column('student_code', String(50)),
+    Column('exam_id', BIGINT, ForeignKey('exam.id')),
+    Column('raw_image_path', Text),
+    Column('raw_image_blob', LargeBinary),
+)
+
+Table(
+    'answer', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('raw_sheet_id', BIGINT, ForeignKey('raw_answer_sheet.id'), nullable=True),
+    Column('student_id', BIGINT, ForeignKey('student.id')),
+    Column('question_id', BIGINT, ForeignKey('question.id')),
+    Column('question_code', BIGINT),
+    Column('answer_image_path', Text),
+    Column('answer_text', Text),
+    Column('final_score', DECIMAL(5, 2)),
+    Column('final_comment', Text),
+    UniqueConstraint('question_id', 'student_id', name='uq_question_student'),
+)
+
+Table(
+    'reviewer', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('name', String(100)),
+)
+
+Table(
+    'grade_record', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('answer_id', BIGINT, ForeignKey('answer.id')),
+    Column('reviewer_id', BIGINT, ForeignKey('reviewer.id')),
+    Column('score', DECIMAL(5, 2)),
+    Column('comment', Text),
+    Column('timestamp', DateTime(timezone=True)),
+)
+
+Table(
+    'gradeprompts', baseline_metadata,
+    Column('id', BigInteger, primary_key=True),
+    Column('type', String(100, 'utf8mb4_general_ci'), comment='prompt类型:\r\nOCR\r\ngrade_phase1\r\ngrade_phase2\r\n...'),
+    Column('prompt', Text(collation='utf8mb4_general_ci'), comment='真正的prompt本体'),
+    Column('comment', Text(collation='utf8mb4_general_ci'), comment='解释,比如生物填空题prompt'),
+    comment='储存所有用来打分的propmt',
+)
+
+Table(
+    'knowledge_point', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('subject_name', String(10)),
+    Column('name', String(100)),
+    UniqueConstraint('subject_name', 'name', name='uq_knowledge_subject_name'),
+)
+
+Table(
+    'question_reviewer', baseline_metadata,
+    Column('question_id', BIGINT, ForeignKey('question.id'), primary_key=True),
+    Column('reviewer_id', BIGINT, ForeignKey('reviewer.id'), primary_key=True),
+)
+
+Table(
+    'question_knowledge', baseline_metadata,
+    Column('question_id', BIGINT, ForeignKey('question.id'), primary_key=True),
+    Column('knowledge_point_id', BIGINT, ForeignKey('knowledge_point.id'), primary_key=True),
+    Column('weight', DECIMAL(5, 4), nullable=False),
+)
+
+Table(
+    'exam_subject_score', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('exam_id', BIGINT, ForeignKey('exam.id'), nullable=False),
+    Column('student_id', BIGINT, ForeignKey('student.id'), nullable=False),
+    Column('subject_id', BIGINT, ForeignKey('subject.id'), nullable=False),
+    Column('subject_name', String(10)),
+    Column('cclass', BIGINT),
+    Column('score', DECIMAL(6, 2)),
+    Column('full_score', DECIMAL(6, 2)),
+    Column('level', String(5)),
+    Column('win_rate', DECIMAL(5, 1)),
+    UniqueConstraint('exam_id', 'student_id', 'subject_id', name='uq_exam_student_subject'),
+    Index('ix_exam_subject_score_scope', 'exam_id', 'subject_id', 'cclass'),
+)
+
+Table(
+    'exam_score_total', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('exam_id', BIGINT, ForeignKey('exam.id'), nullable=False),
+    Column('student_id', BIGINT, ForeignKey('student.id'), nullable=False),
+    Column('cclass', BIGINT),
+    Column('total_score', DECIMAL(7, 2)),
+    Column('level', String(5)),
+    Column('win_rate', DECIMAL(5, 1)),
+    Column('strength_subjects', Text),
+    Column('weak_subjects', Text),
+    UniqueConstraint('exam_id', 'student_id', name='uq_exam_student_total'),
+    Index('ix_exam_score_total_scope', 'exam_id', 'cclass'),
+)
+
+Table(
+    'class_knowledge_rate', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('exam_id', BIGINT, ForeignKey('exam.id'), nullable=False),
+    Column('cclass', BIGINT),
+    Column('knowledge_point_id', BIGINT, ForeignKey('knowledge_point.id'), nullable=False),
+    Column('rate', DECIMAL(5, 2)),
+    UniqueConstraint('exam_id', 'cclass', 'knowledge_point_id', name='uq_exam_class_knowledge'),
+)
+
+Table(
+    'win_rate_series', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('student_id', BIGINT, ForeignKey('student.id'), nullable=False),
+    Column('exam_id', BIGINT, ForeignKey('exam.id'), nullable=False),
+    Column('exam_label', String(255)),
+    Column('published_at', DateTime(timezone=True)),
+    Column('class_win_rate', DECIMAL(5, 1)),
+    Column('school_win_rate', DECIMAL(5, 1)),
+    Column('class_rank', Integer),
+    Column('school_rank', Integer),
+    UniqueConstraint('student_id', 'exam_id', name='uq_win_rate_student_exam'),
+    Index('ix_win_rate_student_published', 'student_id', 'published_at'),
+)
+
+Table(
+    'page_payload', baseline_metadata,
+    Column('id', BIGINT, primary_key=True, autoincrement=True),
+    Column('exam_id', BIGINT, ForeignKey('exam.id'), nullable=False),
+    Column('student_id', BIGINT, ForeignKey('student.id'), nullable=False),
+    Column('page', String(30), nullable=False),
+    Column('variant', String(30), nullable=False),
+    Column('version', Integer, nullable=False),
+    Column('body', Text),
+    UniqueConstraint('exam_id', 'student_id', 'page', 'variant', name='uq_payload_exam_student_page'),
+)
+
+# ==================== 迁移 ====================
+
+def _baseline(connection: Connection) -> None:
+    """按冻结的基线结构建立缺失的表（已存在的表不做改动）"""
+    baseline_metadata.create_all(bind=connection, checkfirst=True)
+
+def _analysis_columns(connection: Connection) -> None:
+    """已有表上补齐成绩发布与题目难度相关的列"""
+    for model, column_name in (
+        (Exam, "name"),
+        (Exam, "published_at"),
+        (Exam, "publish_version"),
+        (Question, "score_rate"),
+        (Question, "difficulty_level"),
+    ):
+        add_column(connection, model, column_name)
+
+def _hot_path_indexes(connection: Connection) -> None:
+    """常用查询路径上的组合索引
+
+    Question(subject_id) 已由唯一约束 (subject_id, question_code) 的最左前缀覆盖，不再单独建索引。
+    """
+    for model, index_name in (
+        (Answer, "ix_answer_student_question"),
+        (RawAnswerSheet, "ix_raw_sheet_exam_subject_student"),
+        (Student, "ix_student_cclass"),
+        (GradeRecord, "ix_grade_record_answer_time"),
+    ):
+        create_index(connection, model, index_name)
+
+def _blob_keys(connection: Connection) -> None:
+    """二进制列迁入内容寻址存储：补 *_blob_key 列，逐批把旧数据写入存储并清空原列"""
+    from blob_store import BLOB_FIELDS, get_blob_store
+
+    store = get_blob_store()
+    for model, fields in BLOB_FIELDS.items():
+        for key_column in fields.values():
+            add_column(connection, model, key_column)
+        table = model.__table__
+        for field, key_column in fields.items():
+            blob, key = table.c[field], table.c[key_column]
+            last_id = 0
+            while True:
+                rows = connection.execute(
+                    select(table.c.id, blob)
+                    .where(table.c.id > last_id, blob.is_not(None), key.is_(None))
+                    .order_by(table.c.id)
+                    .limit(BLOB_BACKFILL_BATCH)
+                ).all()
+                if not rows:
+                    break
+                for row_id, data in rows:
+                    connection.execute(
+                        table.update().where(table.c.id == row_id)
+                        .values({key_column: store.put(data), field: None})
+                    )
+                last_id = rows[-1][0]
+
+def _grade_record_archive(connection: Connection) -> None:
+    """评分记录归档表（数据由 services.grade_archive 定时迁入）"""
+    GradeRecordArchive.__table__.create(bind=connection, checkfirst=True)
+
+def _identity_tables(connection: Connection) -> None:
+    """登录凭证与微信绑定表（演示账号由 python identity_store.py seed-demo 写入）"""
+    for model in (Credential, WechatBinding):
+        model.__table__.create(bind=connection, checkfirst=True)
+
+def _revoked_tokens(connection: Connection) -> None:
+    """刷新令牌吊销表"""
+    RevokedToken.__table__.create(bind=connection, checkfirst=True)
+
+def _credential_updated_index(connection: Connection) -> None:
+    """按修改时间查找最近修改过的账号（登录缓存跨进程失效）"""
+    create_index(connection, Credential, "ix_credential_updated_at")
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline tables", _baseline),
+    (2, "exam publish and question difficulty columns", _analysis_columns),
+    (3, "hot-path composite indexes", _hot_path_indexes),
+    (4, "content-addressed blob keys", _blob_keys),
+    (5, "grade record archive table", _grade_record_archive),
+    (6, "credential and wechat binding tables", _identity_tables),
+    (7, "revoked refresh token table", _revoked_tokens),
+    (8, "credential updated_at index", _credential_updated_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ==================== 执行与校验 ====================
+
+def current_version(connection: Connection) -> Optional[int]:
+    """数据库当前结构版本；未建立版本表时返回None"""
+    if not inspect(connection).has_table(schema_version.name):
+        return None
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+def upgrade(engine: Engine, target: int = LATEST_VERSION) -> List[int]:
+    """依次执行未执行的迁移，每个迁移和它的版本记录在同一事务中提交，返回本次执行的版本号"""
+    with engine.begin() as connection:
+        version_metadata.create_all(bind=connection, checkfirst=True)
+        version = current_version(connection) or 0
+
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_version.insert().values(
+                version=number,
+                description=description,
+                applied_at=datetime.now(timezone.utc)
+            ))
+        applied.append(number)
+    return applied
+
+def verify_schema(engine: Engine) -> int:
+    """启动时校验结构版本，落后于代码时拒绝启动"""
+    with engine.connect() as connection:
+        version = current_version(connection)
+    if version is None or version < LATEST_VERSION:
+        raise RuntimeError(
+            f"数据库结构版本为 {version or 0}，当前代码需要 {LATEST_VERSION}，"
+            "请先运行 python migrations.py upgrade"
+        )
+    if version > LATEST_VERSION:
+        print(f"警告: 数据库结构版本 {version} 高于当前代码的 {LATEST_VERSION}，请确认部署的代码版本")
+    return version
+
+if __name__ == "__main__":
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        applied = upgrade(engine)
+        print(f"已执行迁移: {applied}" if applied else "数据库结构已是最新")
+    elif command == "current":
+        with engine.connect() as connection:
+            print(f"当前结构版本: {current_version(connection)}，代码版本: {LATEST_VERSION}")
+    else:
+        print("用法: python migrations.py [upgrade|current]")
+        sys.exit(1)
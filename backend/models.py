@@ -1,6 +1,6 @@
 from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, DECIMAL, create_engine, Table
-from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.orm import relationship, declarative_base, deferred
+from sqlalchemy.dialects.mysql import BIGINT, BINARY, LONGBLOB
 from sqlalchemy import LargeBinary, UniqueConstraint
 from datetime import datetime,timezone
 from typing import List, Optional
@@ -8,11 +8,26 @@ from typing import List, Optional
 from sqlalchemy import BigInteger, Column, DECIMAL, DateTime, ForeignKeyConstraint, Index, LargeBinary, String, Table, Text
 from sqlalchemy.dialects.mysql import TEXT
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.ext.compiler import compiles
 
 
 dbtype="mysql"
 Base = declarative_base()
 
+# 本地测试使用 SQLite 时，BIGINT 主键需编译为 INTEGER 才能自增
+@compiles(BIGINT, "sqlite")
+def _compile_bigint_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
+# SQLite 不认识 MySQL 的排序规则（如 utf8mb4_general_ci），建表时去掉 COLLATE
+@compiles(String, "sqlite")
+@compiles(Text, "sqlite")
+def _compile_string_sqlite(type_, compiler, **kw):
+    if type_.collation:
+        type_ = type_.copy()
+        type_.collation = None
+    return getattr(compiler, "visit_" + type_.__visit_name__)(type_, **kw)
+
 # 多对多中间表：题目和阅卷人之间的多对多关系
 question_reviewer = Table(
     'question_reviewer', Base.metadata,
@@ -20,16 +35,27 @@ question_reviewer = Table(
     Column('reviewer_id', BIGINT, ForeignKey('reviewer.id'), primary_key=True)
 )
 
+# 多对多中间表：题目和知识点之间的带权重关系（一道题可考查多个知识点）
+question_knowledge = Table(
+    'question_knowledge', Base.metadata,
+    Column('question_id', BIGINT, ForeignKey('question.id'), primary_key=True),
+    Column('knowledge_point_id', BIGINT, ForeignKey('knowledge_point.id'), primary_key=True),
+    Column('weight', DECIMAL(5, 4), nullable=False, default=1)   # 该知识点在本题中的权重
+)
+
 # 考试表
 class Exam(Base):
     __tablename__ = 'exam'
     id = Column(BIGINT, primary_key=True, autoincrement=True)
+    name = Column(String(255))                  # 考试名称
     intro = Column(Text)                        # 考试说明
     school_name = Column(String(255))           # 学校名称
     uploader_id = Column(Text)                  # 上传者 ID
     chief_teacher_id = Column(Text)             # 主责任教师 ID
     grade = Column(String(50))                  # 年级
     material_root = Column(Text)                # 考试材料包的根目录。可能是路径，可能是bucket/key
+    published_at = Column(DateTime(timezone=True))  # 成绩发布时间，未发布为空
+    publish_version = Column(Integer, nullable=False, default=0, server_default='0')  # 发布版本号，每次发布加一
     # 一场考试有多个科目，一对多关系
     subjects = relationship("Subject", back_populates="exam")
     rawanswersheets = relationship("RawAnswerSheet", back_populates="exam")
@@ -49,9 +75,15 @@ class Subject(Base):
     ref_answer_path = Column(Text)
     sample_answer_sheet_path = Column(Text)
 
-    question = Column(LargeBinary)
-    ref_answer = Column(LargeBinary)
-    sample_answer_sheet = Column(LargeBinary)
+    # 二进制内容存放在 blob_store 中，这里只保存内容的 sha256；写入用 blob_store.get_blob_store().put，读取用 blob_store.read_blob
+    question_blob_key = Column(String(64))
+    ref_answer_blob_key = Column(String(64))
+    sample_answer_sheet_blob_key = Column(String(64))
+
+    # 旧数据的二进制列，延迟加载：查询科目时不再带出大字段
+    question = deferred(Column(LargeBinary))
+    ref_answer = deferred(Column(LargeBinary))
+    sample_answer_sheet = deferred(Column(LargeBinary))
 
     answer_sheet_division = Column(Text)  # 答题卡切分配置（JSON 格式字符串）
     choice_sheet_location_list = Column(Text) #保存多选题的位置
@@ -92,14 +124,22 @@ class Question(Base):
     question_type = Column(String(50))  # 问题类型
     question_division=Column(Text)          #一个json文件，包含一个xywh坐标，从原始答题卡划分为本题。
     sub_ocr_division= Column(Text)          #一个json列表，包含一组xywh坐标，从本题划分到子题，用于OCR
+
+    # 难度：阅卷定稿后按全体考生批量计算
+    score_rate = Column(DECIMAL(5, 4))      # 全体平均得分率（平均得分 / 满分）
+    difficulty_level = Column(String(10))   # 难度等级：极易/较易/适中/较难/极难
     
     subject = relationship("Subject", back_populates="questions")     # 多对一：属于某个科目
     answers = relationship("Answer", back_populates="question")       # 一对多：包含多个答案
     reviewers = relationship("Reviewer", secondary=question_reviewer, back_populates="questions")  # 多对多：若干监考老师对应若干问题
+    knowledge_points = relationship("KnowledgePoint", secondary=question_knowledge, back_populates="questions")  # 多对多：考查的知识点
 
 # 原始答题卡表
 class RawAnswerSheet(Base):
     __tablename__ = 'raw_answer_sheet'
+    __table_args__ = (
+        Index('ix_raw_sheet_exam_subject_student', 'exam_id', 'subject_id', 'student_code'),  # 按考号匹配答题卡
+    )
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     subject_id = Column(BIGINT, ForeignKey('subject.id'))  # 属于哪个科目
     student_id = Column(BIGINT, ForeignKey('student.id'), nullable=True)  # 学生 ID，可为空
@@ -108,7 +148,8 @@ class RawAnswerSheet(Base):
 
     student = relationship("Student", back_populates="raw_sheets")  # 多对一 ：属于某个学生
     raw_image_path = Column(Text)                                   # 原始答题卡图片路径
-    raw_image_blob = Column(LargeBinary)                            # 图片数据
+    raw_image_blob_key = Column(String(64))                         # 图片内容的 sha256，内容存放在 blob_store
+    raw_image_blob = deferred(Column(LargeBinary))                  # 旧数据的图片内容（延迟加载）
 
      # ORM 关系
     exam = relationship("Exam", back_populates="rawanswersheets")  # 多对一：属于某个考试
@@ -119,6 +160,7 @@ class Student(Base):
     __tablename__ = 'student'
     __table_args__ = (
         UniqueConstraint('student_code', name='uq_student_code'),
+        Index('ix_student_cclass', 'cclass'),   # 按班级取学生
     )
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     student_code = Column(String(50))  # 学生编号
@@ -132,6 +174,7 @@ class Answer(Base):
     __tablename__ = 'answer'
     __table_args__ = (
         UniqueConstraint('question_id', 'student_id', name='uq_question_student'),
+        Index('ix_answer_student_question', 'student_id', 'question_id'),   # 按学生取全部作答
     )
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     raw_sheet_id = Column(BIGINT, ForeignKey('raw_answer_sheet.id'), nullable=True)  # 原始答题卡 ID
@@ -162,6 +205,9 @@ class Reviewer(Base):
 # 评分记录
 class GradeRecord(Base):
     __tablename__ = 'grade_record'
+    __table_args__ = (
+        Index('ix_grade_record_answer_time', 'answer_id', 'timestamp'),   # 按答案取评分历史
+    )
     id = Column(BIGINT, primary_key=True, autoincrement=True)
     answer_id = Column(BIGINT, ForeignKey('answer.id'))          # 多对一：属于某个答案
     reviewer_id = Column(BIGINT, ForeignKey('reviewer.id'))      # 多对一：属于某个评卷人
@@ -172,6 +218,21 @@ class GradeRecord(Base):
     answer = relationship("Answer", back_populates="grade_records")     # 多对一：属于某个答案
     reviewer = relationship("Reviewer", back_populates="grade_records") # 多对一：属于某个评卷人
 
+# 评分记录归档：已发布较久的考试的 grade_record 按 (考试, 学生) 压缩成一行，移出热表
+class GradeRecordArchive(Base):
+    __tablename__ = 'grade_record_archive'
+    __table_args__ = (
+        Index('ix_grade_archive_exam_student', 'exam_id', 'student_id'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)        # 考试 ID
+    student_id = Column(BIGINT, ForeignKey('student.id'), nullable=False)  # 学生 ID
+    record_count = Column(Integer, nullable=False)      # 归档的评分记录条数
+    first_timestamp = Column(DateTime(timezone=True))   # 最早一条记录的时间
+    last_timestamp = Column(DateTime(timezone=True))    # 最晚一条记录的时间
+    archived_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))  # 归档时间
+    records = deferred(Column(LargeBinary().with_variant(LONGBLOB, "mysql")))  # zlib 压缩的 JSON 记录列表
+
 #prompt表
 class GradePrompts(Base):
     __tablename__ = 'gradeprompts'
@@ -180,4 +241,129 @@ class GradePrompts(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     type: Mapped[Optional[str]] = mapped_column(String(100, 'utf8mb4_general_ci'), comment='prompt类型:\r\nOCR\r\ngrade_phase1\r\ngrade_phase2\r\n...')
     prompt: Mapped[Optional[str]] = mapped_column(Text(collation='utf8mb4_general_ci'), comment='真正的prompt本体')
-    comment: Mapped[Optional[str]] = mapped_column(Text(collation='utf8mb4_general_ci'), comment='解释,比如生物填空题prompt') 
\ No newline at end of file
+    comment: Mapped[Optional[str]] = mapped_column(Text(collation='utf8mb4_general_ci'), comment='解释,比如生物填空题prompt') 
+
+# 成绩立方体：学生 × 科目 × 考试 的科目总分，考试定稿时一次性生成
+class ExamSubjectScore(Base):
+    __tablename__ = 'exam_subject_score'
+    __table_args__ = (
+        UniqueConstraint('exam_id', 'student_id', 'subject_id', name='uq_exam_student_subject'),
+        Index('ix_exam_subject_score_scope', 'exam_id', 'subject_id', 'cclass'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)        # 考试 ID
+    student_id = Column(BIGINT, ForeignKey('student.id'), nullable=False)  # 学生 ID
+    subject_id = Column(BIGINT, ForeignKey('subject.id'), nullable=False)  # 科目 ID
+    subject_name = Column(String(10))        # 科目名称（冗余，避免回表）
+    cclass = Column(BIGINT)                  # 学生班级（冗余，便于按班级统计）
+    score = Column(DECIMAL(6, 2))            # 科目得分
+    full_score = Column(DECIMAL(6, 2))       # 科目满分
+    level = Column(String(5))                # 科目等级（按年级排名赋分）
+    win_rate = Column(DECIMAL(5, 1))         # 科目年级胜率（击败全年级百分比）
+
+# 成绩立方体：学生在一场考试中的总分
+class ExamScoreTotal(Base):
+    __tablename__ = 'exam_score_total'
+    __table_args__ = (
+        UniqueConstraint('exam_id', 'student_id', name='uq_exam_student_total'),
+        Index('ix_exam_score_total_scope', 'exam_id', 'cclass'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)        # 考试 ID
+    student_id = Column(BIGINT, ForeignKey('student.id'), nullable=False)  # 学生 ID
+    cclass = Column(BIGINT)                  # 学生班级
+    total_score = Column(DECIMAL(7, 2))      # 考试总分
+    level = Column(String(5))                # 总分等级
+    win_rate = Column(DECIMAL(5, 1))         # 总分年级胜率
+    strength_subjects = Column(Text)         # 优势科目，json列表
+    weak_subjects = Column(Text)             # 劣势科目，json列表
+
+# 知识点，按科目名称归类，可跨考试复用
+class KnowledgePoint(Base):
+    __tablename__ = 'knowledge_point'
+    __table_args__ = (
+        UniqueConstraint('subject_name', 'name', name='uq_knowledge_subject_name'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    subject_name = Column(String(10))        # 科目名称
+    name = Column(String(100))               # 知识点名称
+
+    questions = relationship("Question", secondary=question_knowledge, back_populates="knowledge_points")  # 多对多：考查该知识点的题目
+
+# 班级知识点掌握率，考试定稿时一次性计算
+class ClassKnowledgeRate(Base):
+    __tablename__ = 'class_knowledge_rate'
+    __table_args__ = (
+        UniqueConstraint('exam_id', 'cclass', 'knowledge_point_id', name='uq_exam_class_knowledge'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)                        # 考试 ID
+    cclass = Column(BIGINT)                                                                 # 班级
+    knowledge_point_id = Column(BIGINT, ForeignKey('knowledge_point.id'), nullable=False)  # 知识点 ID
+    rate = Column(DECIMAL(5, 2))             # 班级加权得分率（百分比）
+
+# 学生历次考试胜率序列：只追加，考试发布时写入一次
+class WinRateSeries(Base):
+    __tablename__ = 'win_rate_series'
+    __table_args__ = (
+        UniqueConstraint('student_id', 'exam_id', name='uq_win_rate_student_exam'),
+        Index('ix_win_rate_student_published', 'student_id', 'published_at'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    student_id = Column(BIGINT, ForeignKey('student.id'), nullable=False)  # 学生 ID
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)        # 考试 ID
+    exam_label = Column(String(255))             # 考试名称（冗余，供趋势图横轴显示）
+    published_at = Column(DateTime(timezone=True))  # 考试发布时间，决定序列顺序
+    class_win_rate = Column(DECIMAL(5, 1))       # 班级胜率（击败本班百分比）
+    school_win_rate = Column(DECIMAL(5, 1))      # 年级胜率（击败全年级百分比）
+    class_rank = Column(Integer)                 # 班级名次
+    school_rank = Column(Integer)                # 年级名次
+
+# 预渲染的学生分析页数据：考试发布时生成，接口直接返回其中的 JSON
+class PagePayload(Base):
+    __tablename__ = 'page_payload'
+    __table_args__ = (
+        UniqueConstraint('exam_id', 'student_id', 'page', 'variant', name='uq_payload_exam_student_page'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    exam_id = Column(BIGINT, ForeignKey('exam.id'), nullable=False)        # 考试 ID
+    student_id = Column(BIGINT, ForeignKey('student.id'), nullable=False)  # 学生 ID
+    page = Column(String(30), nullable=False)                 # 页面，如 scores、level-position
+    variant = Column(String(30), nullable=False, default='')  # 页面变体，如 class / grade
+    version = Column(Integer, nullable=False)                 # 生成时的 exam.publish_version
+    body = Column(Text)                                       # 序列化后的 JSON
+
+
+# 登录凭证：学生按考号、教师按工号登录，密码为 bcrypt 哈希
+class Credential(Base):
+    __tablename__ = 'credential'
+    __table_args__ = (
+        UniqueConstraint('user_type', 'identity_id', name='uq_credential_identity'),
+        Index('ix_credential_updated_at', 'updated_at'),   # 各进程按修改时间发现需要失效的缓存
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    user_type = Column(String(10), nullable=False)      # student / teacher
+    identity_id = Column(String(50), nullable=False)    # 考号或工号
+    user_id = Column(String(50), nullable=False)        # 令牌中的用户 ID（学生为 student.id）
+    name = Column(String(100))                          # 显示名称（冗余，登录时不回表）
+    avatar = Column(Text)                               # 头像地址
+    password_hash = Column(String(100), nullable=False) # bcrypt 哈希
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))  # 最近修改时间
+
+# 微信 openid 与登录身份的绑定，首次用账号密码登录时写入
+class WechatBinding(Base):
+    __tablename__ = 'wechat_binding'
+    __table_args__ = (
+        UniqueConstraint('openid', name='uq_wechat_binding_openid'),
+    )
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    openid = Column(String(64), nullable=False)         # 小程序 openid
+    user_type = Column(String(10), nullable=False)      # student / teacher
+    identity_id = Column(String(50), nullable=False)    # 绑定的考号或工号
+    bound_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))  # 绑定时间
+
+# 已吊销的刷新令牌：键为令牌 jti 或令牌族 fam（UUID 的 16 字节），过期后可清理
+class RevokedToken(Base):
+    __tablename__ = 'revoked_token'
+    token_id = Column(LargeBinary(16).with_variant(BINARY(16), "mysql"), primary_key=True)  # jti 或 fam
+    expires_at = Column(DateTime(timezone=True), nullable=False)   # 对应令牌的过期时间，之后该行不再需要
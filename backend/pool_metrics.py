@@ -0,0 +1,180 @@
+"""
+数据库连接池配置与监控
+
+- InstrumentedQueuePool / InstrumentedAsyncQueuePool：记录每次借出连接的等待时间（直方图）、
+  溢出连接创建次数与借出超时次数
+- 借出前探活策略：always（每次借出都ping）、never（不ping）、idle（仅空闲超过阈值的连接才ping）
+- pool_snapshot：汇总直方图与当前在用/空闲连接数，供 /metrics/pool 接口输出
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# 借出等待时间直方图的桶上界（毫秒），最后一个桶收纳超出上界的样本
+CHECKOUT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+PRE_PING_STRATEGIES = ("always", "never", "idle")
+
+class CheckoutStats:
+    """单个连接池的借出统计，多线程下加锁更新"""
+
+    def __init__(self, buckets=CHECKOUT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+            self.overflow_events = 0
+            self.timeouts = 0
+            self.pings = 0
+            self.stale_connections = 0
+
+    def observe(self, wait_ms: float, overflowed: bool) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, wait_ms)] += 1
+            self.count += 1
+            self.total_ms += wait_ms
+            self.max_ms = max(self.max_ms, wait_ms)
+            if overflowed:
+                self.overflow_events += 1
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def pinged(self, stale: bool) -> None:
+        with self._lock:
+            self.pings += 1
+            if stale:
+                self.stale_connections += 1
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        """累计直方图：le 为桶上界（毫秒），count 为等待时间不超过该上界的次数"""
+        result, running = [], 0
+        for le, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += n
+            result.append({"le": le, "count": running})
+        return result
+
+class _InstrumentedMixin:
+    """包装 QueuePool._do_get：计时、识别溢出连接、统计超时"""
+
+    stats: CheckoutStats
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timed_out()
+            raise
+        # _overflow 从 -pool_size 起计，超过0说明新建的是溢出连接
+        overflowed = self._overflow > overflow_before and self._overflow > 0
+        self.stats.observe((time.perf_counter() - started) * 1000, overflowed)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    def __init__(self, *args, **kwargs):
+        self.stats = CheckoutStats()
+        super().__init__(*args, **kwargs)
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        self.stats = CheckoutStats()
+        super().__init__(*args, **kwargs)
+
+def _keeps_default_pool(url: str, is_async: bool) -> bool:
+    """内存SQLite只能用单连接池；aiosqlite连接绑定创建它的事件循环，也沿用方言默认（NullPool）"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return False
+    return is_async or parsed.database in (None, "", ":memory:")
+
+def pool_options(url: str, settings, is_async: bool = False) -> Dict[str, Any]:
+    """根据配置生成 create_engine 的连接池参数"""
+    if settings.db_pool_pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"db_pool_pre_ping 必须是 {PRE_PING_STRATEGIES} 之一")
+
+    options: Dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping == "always"}
+    if _keeps_default_pool(url, is_async):
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+def install_idle_ping(engine: Engine, idle_seconds: float) -> None:
+    """idle 策略：连接归还时记下时间，借出时仅对空闲超过阈值的连接做一次ping"""
+    pool, dialect = engine.pool, engine.dialect
+
+    @event.listens_for(pool, "connect")
+    @event.listens_for(pool, "checkin")
+    def _touch(dbapi_connection, connection_record):
+        connection_record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        idle_since = connection_record.info.get("idle_since")
+        if idle_since is None or time.monotonic() - idle_since < idle_seconds:
+            return
+        stats = getattr(pool, "stats", None)
+        try:
+            alive = dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if stats is not None:
+            stats.pinged(stale=not alive)
+        if not alive:
+            # 抛出 DisconnectionError 后连接池会丢弃该连接并重新建立
+            raise exc.DisconnectionError("空闲连接已失效")
+
+def configure_engine(engine: Engine, settings) -> Engine:
+    """按探活策略给引擎挂上事件，返回引擎本身"""
+    if settings.db_pool_pre_ping == "idle":
+        install_idle_ping(engine, settings.db_pool_ping_idle_seconds)
+    return engine
+
+def pool_snapshot(pool: Pool) -> Dict[str, Any]:
+    """连接池当前状态：在用/空闲连接数与借出统计"""
+    snapshot: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        snapshot.update(
+            size=pool.size(),
+            in_use=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    stats: Optional[CheckoutStats] = getattr(pool, "stats", None)
+    if stats is not None:
+        snapshot.update(
+            checkouts=stats.count,
+            wait_ms_avg=round(stats.total_ms / stats.count, 3) if stats.count else 0.0,
+            wait_ms_max=round(stats.max_ms, 3),
+            wait_ms_histogram=stats.histogram(),
+            overflow_events=stats.overflow_events,
+            timeouts=stats.timeouts,
+            idle_pings=stats.pings,
+            stale_connections=stats.stale_connections,
+        )
+    return snapshot
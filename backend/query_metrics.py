@@ -0,0 +1,105 @@
+"""
+SQL 执行监控
+
+在所有引擎（主库、副本、同步与异步）上挂 before/after_cursor_execute 事件，记录每条语句的耗时：
+- 超过 slow_query_ms 的语句写入结构化慢查询日志（logger "sql.slow"，每行一个 JSON）
+- 请求期间的语句条数与累计耗时记在 contextvar 中，由 main 中的中间件写入响应头
+  X-DB-Query-Count / X-DB-Time-Ms
+- 同一请求内相同语句重复执行达到 n_plus_one_threshold 次时记一条 N+1 告警（logger "sql.n_plus_one"）
+
+异步会话通过 run_sync 在 greenlet 中执行查询，SQLAlchemy 会把调用方的 contextvars
+上下文带进 greenlet，因此事件回调能拿到当前请求的统计对象。
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+slow_query_logger = logging.getLogger("sql.slow")
+n_plus_one_logger = logging.getLogger("sql.n_plus_one")
+
+# 日志中语句文本的最大长度
+STATEMENT_LOG_LIMIT = 2000
+
+class RequestQueryStats:
+    """一个请求内的 SQL 统计"""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+        self.repeated: Dict[str, int] = {}
+
+    def record(self, statement: str, duration_ms: float) -> Optional[int]:
+        """记录一条语句，返回该语句在本请求内的执行次数"""
+        self.count += 1
+        self.total_ms += duration_ms
+        self.statements[statement] += 1
+        return self.statements[statement]
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+def start_request(path: str = "") -> RequestQueryStats:
+    stats = RequestQueryStats(path)
+    _current.set(stats)
+    return stats
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+def _log(logger: logging.Logger, level: int, record: Dict[str, Any]) -> None:
+    logger.log(level, json.dumps(record, ensure_ascii=False, default=str))
+
+def _short(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= STATEMENT_LOG_LIMIT else statement[:STATEMENT_LOG_LIMIT] + "..."
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    duration_ms = (time.perf_counter() - started) * 1000
+    stats = _current.get()
+
+    if duration_ms >= settings.slow_query_ms:
+        # 参数可能包含学生信息，只记录条数
+        _log(slow_query_logger, logging.WARNING, {
+            "event": "slow_query",
+            "duration_ms": round(duration_ms, 3),
+            "statement": _short(statement),
+            "executemany": executemany,
+            "rowcount": cursor.rowcount,
+            "database": conn.engine.url.database,
+            "path": stats.path if stats is not None else None,
+        })
+
+    if stats is None:
+        return
+    times = stats.record(statement, duration_ms)
+    if times >= settings.n_plus_one_threshold:
+        stats.repeated[statement] = times
+    if times == settings.n_plus_one_threshold:
+        _log(n_plus_one_logger, logging.WARNING, {
+            "event": "repeated_query",
+            "count": times,
+            "statement": _short(statement),
+            "path": stats.path,
+        })
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # 出错的语句不会触发 after_cursor_execute，弹出对应的开始时间
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
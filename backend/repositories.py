@@ -0,0 +1,73 @@
+"""
+数据访问层：按页面声明的预加载方案（loading profile）
+
+路由和服务不再直接在 ORM 对象上逐层访问关系（exam.subjects → subject.questions → ...），
+那样每访问一次未加载的关系就多一次查询（N+1）。这里给每种访问路径声明一个方案，
+一次性用 selectinload / joinedload 把需要的关系取回；方案之外的关系统一 raiseload，
+新增代码如果访问了没有声明的关系会直接报错，而不是悄悄多出查询。
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Query, Session, contains_eager, load_only, raiseload, selectinload
+
+from models import Answer, Exam, Question, Student, Subject
+
+class LoadingProfile(NamedTuple):
+    model: type
+    options: Tuple[Any, ...]
+    joins: Tuple[Any, ...] = ()    # 需要在查询中显式 JOIN 的关系（用于过滤并由 contains_eager 填充）
+
+LOADING_PROFILES: Dict[str, LoadingProfile] = {
+    # 考试及其科目名称：科目列表、科目切换
+    "exam_subjects": LoadingProfile(Exam, (
+        selectinload(Exam.subjects),
+    )),
+    # 考试报告：考试 → 科目 → 题目 → 知识点，共四条查询
+    "exam_report": LoadingProfile(Exam, (
+        selectinload(Exam.subjects)
+        .selectinload(Subject.questions)
+        .selectinload(Question.knowledge_points),
+    )),
+    # 学生答题卡：答案、题目、科目一条 JOIN 取回，JOIN 同时用于按考试/科目过滤
+    "answer_sheet": LoadingProfile(Answer, (
+        contains_eager(Answer.question).contains_eager(Question.subject),
+    ), joins=(Answer.question, Question.subject)),
+    # 班级花名册：只取名单需要的列
+    "class_roster": LoadingProfile(Student, (
+        load_only(Student.id, Student.student_code, Student.name, Student.cclass),
+    )),
+}
+
+def query(db: Session, profile: str) -> Query:
+    """按方案构造查询，方案之外的关系访问会抛出异常"""
+    model, options, joins = LOADING_PROFILES[profile]
+    result = db.query(model)
+    for relationship in joins:
+        result = result.join(relationship)
+    return result.options(*options, raiseload("*"))
+
+def get_exam(db: Session, exam_id: int, profile: str = "exam_subjects") -> Optional[Exam]:
+    return query(db, profile).filter(Exam.id == exam_id).one_or_none()
+
+def student_answers(
+    db: Session,
+    exam_id: int,
+    student_id: int,
+    subject_name: Optional[str] = None
+) -> List[Answer]:
+    """学生在某场考试（可限定科目）中的全部答案，按科目、题号排序"""
+    result = query(db, "answer_sheet").filter(Answer.student_id == student_id, Subject.exam_id == exam_id)
+    if subject_name is not None:
+        result = result.filter(Subject.name == subject_name)
+    return result.order_by(Subject.id, Question.question_code).all()
+
+def exam_answers(db: Session, exam_id: int) -> Dict[int, List[Answer]]:
+    """整场考试的全部答案按学生分组（每个学生内的顺序同 student_answers），供发布时批量渲染"""
+    answers: Dict[int, List[Answer]] = {}
+    result = query(db, "answer_sheet").filter(Subject.exam_id == exam_id)
+    for answer in result.order_by(Answer.student_id, Subject.id, Question.question_code):
+        answers.setdefault(answer.student_id, []).append(answer)
+    return answers
+
+def class_roster(db: Session, cclass: int) -> List[Student]:
+    return query(db, "class_roster").filter(Student.cclass == cclass).order_by(Student.student_code).all()
@@ -1,14 +1,21 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from database import get_db
-from auth import create_access_token, get_wechat_session
-from models import Student
+from config import settings
+from database import get_async_db
+from auth import (
+    create_access_token, create_refresh_token, decode_refresh_token, get_wechat_session, verify_password_async
+)
+from identity_store import bind_openid, get_login
+from token_store import TokenRevoked, consume, revoke_family
 
 router = APIRouter(prefix="/auth", tags=["认证 (Authentication)"])
 
+# 账号不存在时用于校验的哈希，保证两种情况的耗时相同
+DUMMY_PASSWORD_HASH = "$2b$12$4MkXMSdbJhvwT1h6PtuyYOe.CrdZURJgtH/CDdTtpMWeRD20VZ/L2"
+
 class LoginRequest(BaseModel):
     code: str
     userType: str
@@ -23,75 +30,88 @@ class UserInfo(BaseModel):
 
 class LoginResponse(BaseModel):
     token: str
+    refreshToken: str     # 访问令牌过期后用于换发新令牌，一次有效
     userInfo: UserInfo
 
+class RefreshRequest(BaseModel):
+    refreshToken: str
+
+class RefreshResponse(BaseModel):
+    token: str
+    refreshToken: str
+
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """用户登录与身份绑定"""
     
-    # 1. 验证微信code（在生产环境中会调用微信API）
-    try:
-        # wechat_session = get_wechat_session(request.code)
-        # 测试环境跳过微信验证
-        pass
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"微信登录验证失败: {str(e)}"
-        )
+    # 1. 验证微信code（测试环境可通过 wechat_login_enabled 关闭）
+    if settings.wechat_login_enabled:
+        wechat_session = await get_wechat_session(request.code)
     
     # 2. 验证用户身份（学号/工号和密码）
-    if request.userType == "student":
-        # 模拟学生验证
-        if request.identityId == "20240001" and request.password == "123456":
-            user_info = UserInfo(
-                id="1",
-                name="张三",
-                type="student",
-                avatar="https://example.com/avatar.jpg"
-            )
-            token_data = {
-                "sub": "1",
-                "user_type": "student",
-                "name": "张三",
-                "student_code": "20240001"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="学号或密码错误"
-            )
-    
-    elif request.userType == "teacher":
-        # 模拟教师验证
-        if request.identityId == "teacher001" and request.password == "123456":
-            user_info = UserInfo(
-                id="t1",
-                name="王老师",
-                type="teacher",
-                avatar="https://example.com/teacher_avatar.jpg"
-            )
-            token_data = {
-                "sub": "t1",
-                "user_type": "teacher",
-                "name": "王老师",
-                "teacher_id": "teacher001"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="工号或密码错误"
-            )
-    else:
+    if request.userType not in ("student", "teacher"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="不支持的用户类型"
         )
+    login_record = await get_login(db, request.userType, request.identityId)
+    identity, password_hash = login_record if login_record is not None else (None, DUMMY_PASSWORD_HASH)
+    # 账号不存在时同样计算一次哈希，响应时间不泄露账号是否存在
+    password_ok = await verify_password_async(request.password, password_hash)
+    if identity is None or not password_ok:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="学号或密码错误" if request.userType == "student" else "工号或密码错误"
+        )
+
+    if settings.wechat_login_enabled:
+        await bind_openid(db, wechat_session["openid"], identity)
+
+    user_info = UserInfo(
+        id=identity.user_id,
+        name=identity.name or "",
+        type=identity.user_type,
+        avatar=identity.avatar
+    )
+    token_data = {
+        "sub": identity.user_id,
+        "user_type": identity.user_type,
+        "name": identity.name
+    }
+    if identity.user_type == "student":
+        token_data["student_code"] = identity.identity_id
+    else:
+        token_data["teacher_id"] = identity.identity_id
     
     # 3. 生成JWT令牌
     access_token = create_access_token(data=token_data)
     
     return LoginResponse(
         token=access_token,
+        refreshToken=create_refresh_token(token_data),
         userInfo=user_info
-    ) 
\ No newline at end of file
+    )
+
+@router.post("/refresh", response_model=RefreshResponse)
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """用刷新令牌换发访问令牌和新的刷新令牌，旧刷新令牌随即失效"""
+    payload = decode_refresh_token(request.refreshToken)
+    try:
+        await consume(db, payload)
+    except TokenRevoked as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    
+    token_data = {key: value for key, value in payload.items() if key not in ("typ", "jti", "fam", "exp")}
+    return RefreshResponse(
+        token=create_access_token(data=token_data),
+        refreshToken=create_refresh_token(token_data, family=payload["fam"])
+    )
+
+@router.post("/logout")
+async def logout(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """退出登录：吊销刷新令牌所在的令牌族（已签发的访问令牌在过期前仍然有效）"""
+    await revoke_family(db, decode_refresh_token(request.refreshToken))
+    return {"message": "已退出登录"} 
\ No newline at end of file
@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from config import settings
+from database import SessionLocal, get_async_read_db
+from auth import get_current_admin, get_current_teacher
+from models import Exam
+from services.grade_archive import grade_history
+from services.grade_ingest import GradeIngestError, ingest_grades
+from services.score_import import ROW_READERS, ScoreImportError, file_format, import_score_sheet
+
+router = APIRouter(prefix="/grading", tags=["阅卷 - 成绩录入 (Grading)"])
+
+# ==================== Pydantic Models ====================
+
+class GradeItem(BaseModel):
+    student_id: int
+    question_id: int
+    final_score: float = Field(..., ge=0)
+    final_comment: Optional[str] = None   # 最终评语，为空时保留原评语
+    reviewer_id: Optional[int] = None     # 评卷人，机器评分可为空
+    comment: Optional[str] = None         # 本次评分记录的评语
+
+class GradeIngestRequest(BaseModel):
+    items: List[GradeItem] = Field(..., min_length=1, max_length=settings.grade_ingest_max_rows)
+
+class GradeBatchReport(BaseModel):
+    batch: int
+    rows: int
+    inserted: int      # 新建的答案数
+    changed: int       # 得分发生变化的答案数
+    seconds: float
+    rows_per_second: Optional[float] = None
+
+class GradeIngestResponse(BaseModel):
+    exam_id: int
+    rows: int
+    seconds: float
+    rows_per_second: Optional[float] = None
+    batches: List[GradeBatchReport]
+
+class ImportRowError(BaseModel):
+    row: int           # 文件中的行号（表头为第1行）
+    message: str
+
+class ScoreImportResponse(BaseModel):
+    exam_id: int
+    dry_run: bool
+    rows: int          # 读取的数据行数
+    imported: int
+    rejected: int
+    errors: List[ImportRowError]
+    seconds: float
+    rows_per_second: Optional[float] = None
+    batches: List[GradeBatchReport]
+
+class GradeRecordItem(BaseModel):
+    id: int
+    answer_id: Optional[int] = None
+    question_id: Optional[int] = None
+    question_code: Optional[int] = None
+    reviewer_id: Optional[int] = None
+    score: Optional[float] = None
+    comment: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    archived: bool     # 是否来自归档表
+
+class GradeHistoryResponse(BaseModel):
+    exam_id: int
+    student_id: int
+    records: List[GradeRecordItem]
+
+# ==================== Helpers ====================
+
+def _ingest(exam_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """在线程池中用同步会话分批写入，批量 upsert 不占用事件循环"""
+    with SessionLocal() as db:
+        if db.get(Exam, exam_id) is None:
+            raise HTTPException(status_code=404, detail="考试不存在")
+        try:
+            return ingest_grades(db, exam_id, items)
+        except GradeIngestError as e:
+            raise HTTPException(status_code=422, detail=e.errors)
+
+def _import_sheet(exam_id: int, fmt: str, stream, dry_run: bool) -> Dict[str, Any]:
+    """在线程池中用同步会话流式导入，解析和写入不占用事件循环"""
+    with SessionLocal() as db:
+        if db.get(Exam, exam_id) is None:
+            raise HTTPException(status_code=404, detail="考试不存在")
+        try:
+            return import_score_sheet(db, exam_id, ROW_READERS[fmt](stream), dry_run=dry_run)
+        except ScoreImportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== API Endpoints ====================
+
+@router.post("/exams/{exam_id}/answers", response_model=GradeIngestResponse)
+async def ingest_exam_grades(
+    exam_id: int,
+    request: GradeIngestRequest,
+    current_user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """批量录入阅卷得分（仅管理员）：按 (题目, 学生) upsert 答案并追加评分记录，分批提交并返回每批吞吐"""
+    
+    items = [item.model_dump() for item in request.items]
+    result = await run_in_threadpool(_ingest, exam_id, items)
+    return GradeIngestResponse(**result)
+
+@router.post("/exams/{exam_id}/import", response_model=ScoreImportResponse)
+async def import_exam_scores(
+    exam_id: int,
+    file: UploadFile = File(..., description="成绩表（CSV 或 XLSX）"),
+    dry_run: bool = Query(False, description="只校验不写入"),
+    current_user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """导入成绩表（仅管理员）：逐行解析、按考号和(科目, 题号)匹配、按满分校验，分批写入；不合格的行跳过并返回行号"""
+    try:
+        fmt = file_format(file.filename or "")
+    except ScoreImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await run_in_threadpool(_import_sheet, exam_id, fmt, file.file, dry_run)
+    return ScoreImportResponse(**result)
+
+@router.get("/exams/{exam_id}/records", response_model=GradeHistoryResponse)
+async def get_grade_history(
+    exam_id: int,
+    student_id: int = Query(..., description="学生 ID"),
+    question_id: Optional[int] = Query(None, description="只看某道题"),
+    current_user: Dict[str, Any] = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """审计：学生在一场考试中的全部评分记录，包含已归档的历史记录"""
+    records = await db.run_sync(grade_history, exam_id, student_id, question_id)
+    return GradeHistoryResponse(exam_id=exam_id, student_id=student_id, records=records)
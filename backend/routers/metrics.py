@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from database import pool_status
+from auth import get_current_admin, password_hasher, token_cache
+from identity_store import binding_cache, identity_cache
+from wechat_client import wechat_client
+
+# 监控接口只对管理员开放：连接池、缓存与线程池状态不应暴露给普通用户
+router = APIRouter(prefix="/metrics", tags=["监控 (Metrics)"], dependencies=[Depends(get_current_admin)])
+
+@router.get("/pool")
+async def pool_metrics():
+    """连接池监控：借出等待时间直方图、在用/空闲连接数、溢出与超时次数"""
+    return pool_status()
+
+@router.get("/auth")
+async def auth_metrics():
+    """令牌/身份/绑定缓存的命中率，密码线程池的排队与拒绝次数，微信接口的重试与熔断状态"""
+    return {
+        "token_cache": token_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "identity_cache": identity_cache.stats(),
+        "binding_cache": binding_cache.stats(),
+        "wechat": wechat_client.stats(),
+    }
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
 from datetime import date
-from database import get_db
+from database import get_async_read_db
 from auth import get_current_student
-from models import Exam, Student, Answer, Question, Subject
+from models import Answer, ExamSubjectScore, ExamScoreTotal
+from repositories import student_answers
+from services.score_cube import get_student_cube
+from services.payloads import published_response
+from services.page_cache import cached_page
+from services.rank_index import rank_indexes, class_scope, GRADE_SCOPE
+from services.what_if import evaluate_scenarios
+from services.cohort_stats import cohort_stats
+from services.difficulty import DIFFICULTY_LEVELS
+from services.knowledge import mastery_level, student_knowledge_rates
+from services.trend import describe_trend, recent_win_rates
 
 router = APIRouter(prefix="/student", tags=["学生端 - 核心分析 (Student - Core Analysis)"])
 
@@ -76,6 +88,12 @@ class Page04IdealRanking(BaseModel):
     rank_change: int
     current_rank: int
 
+class IdealRankingBatchRequest(BaseModel):
+    scenarios: List[IdealScoresRequest] = Field(..., min_length=1, max_length=50)
+
+class Page04IdealRankingBatch(BaseModel):
+    results: List[Page04IdealRanking]
+
 # Page05 - 偏科分析页
 class RadarData(BaseModel):
     subject: str
@@ -147,6 +165,246 @@ class Page09KnowledgeAnalysis(BaseModel):
     knowledge_points: List[KnowledgePoint]
     tabs: List[str]
 
+# ==================== Helpers ====================
+
+def _parse_id(value: Any) -> Optional[int]:
+    """把路径参数或令牌中的ID转换为数据库主键，演示数据（如 exam_001）返回None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _class_number(class_id: str) -> Optional[int]:
+    """班级ID转换为班级号：class_003 与 3 都对应 3 班"""
+    return _parse_id(class_id[len("class_"):] if class_id.startswith("class_") else class_id)
+
+def _serve_page(
+    db: Session,
+    exam_id: Optional[int],
+    student_id: Optional[int],
+    page: str,
+    build: Callable[[Session, ExamScoreTotal, List[ExamSubjectScore]], Any],
+    variant: Optional[str] = "",
+    params: Any = (),
+    cached: bool = True
+) -> Union[Response, BaseModel, None]:
+    """
+    依次查找 响应缓存 → 预渲染数据 → 成绩立方体。
+
+    演示考试（如 exam_001，exam_id 为None）返回None，由接口返回演示数据；真实考试中该学生
+    没有成绩（考试未定稿或未参考）时返回 404，不能用演示数据代替。
+    variant 为None表示该页面没有预渲染数据（带参数的页面），直接由成绩立方体计算。
+    cached 为False时不写入页面缓存：理想排名等任意参数的假设计算每次都不同，只在已缓存的
+    排名索引上直接计算，避免挤掉预渲染页面的缓存条目。
+    在异步接口中通过 AsyncSession.run_sync 调用，查询走异步驱动，不阻塞事件循环。
+    """
+    def compute():
+        if variant is not None:
+            payload = published_response(db, exam_id, student_id, page, variant)
+            if payload is not None:
+                return payload
+        total, subject_rows = get_student_cube(db, exam_id, student_id)
+        return build(db, total, subject_rows) if total is not None else None
+    
+    if not cached:
+        response = compute() if exam_id is not None and student_id is not None else None
+    else:
+        response = cached_page(db, exam_id, student_id, page, (variant, params), compute)
+    if response is None and exam_id is not None:
+        raise HTTPException(status_code=404, detail="成绩未发布")
+    return response
+
+# ==================== Page Builders ====================
+# 以下函数根据成绩立方体生成各页数据，既用于实时计算，也用于考试发布时预渲染
+
+def build_exam_scores(total: ExamScoreTotal, subject_rows: List[ExamSubjectScore]) -> Page01ExamScores:
+    """01-根据成绩立方体生成考试成绩页数据"""
+    return Page01ExamScores(
+        total_score=float(total.total_score),
+        overall_level=total.level,
+        subject_scores=[
+            SubjectScore(subject=row.subject_name, score=float(row.score), level=row.level)
+            for row in subject_rows
+        ]
+    )
+
+def build_level_position(
+    db: Session,
+    total: ExamScoreTotal,
+    subject_rows: List[ExamSubjectScore],
+    mode: str
+) -> Page02LevelPosition:
+    """02-根据成绩立方体计算等级位置页数据"""
+    scope = class_scope(total.cclass) if mode == "class" else GRADE_SCOPE
+    grade_size = rank_indexes.get(db, total.exam_id, None, GRADE_SCOPE).size
+    class_size = rank_indexes.get(db, total.exam_id, None, scope).size
+    stats = cohort_stats.get(db, total.exam_id)
+    
+    subject_comparison = []
+    for row in subject_rows:
+        score = float(row.score)
+        subject_stats = stats.get(scope, row.subject_id) or {"mean": score, "max": score}
+        subject_comparison.append(SubjectComparison(
+            subject=row.subject_name,
+            score=score,
+            rank=rank_indexes.get(db, total.exam_id, row.subject_id, scope).rank(row.score),
+            avg=round(subject_stats["mean"], 1),
+            max=subject_stats["max"],
+            diff=subject_stats["max"] - score
+        ))
+    
+    return Page02LevelPosition(
+        grouping_mode="班级" if mode == "class" else "年级",
+        class_size=class_size,
+        grade_size=grade_size,
+        subject_comparison=subject_comparison
+    )
+
+def build_pk_analysis(db: Session, total: ExamScoreTotal, cclass: Optional[int]) -> Page03PKAnalysis:
+    """03-在指定班级的总分排名索引上计算成绩PK页数据"""
+    index = rank_indexes.get(db, total.exam_id, None, class_scope(cclass))
+    return Page03PKAnalysis(
+        rank_percent=index.beat_percent(total.total_score),
+        rank_index=index.rank(total.total_score),
+        class_total_students=index.size
+    )
+
+def build_bias_analysis(total: ExamScoreTotal, subject_rows: List[ExamSubjectScore]) -> Optional[Page05BiasAnalysis]:
+    """05-读取成绩立方体中预先计算的胜率，尚未计算时返回None"""
+    if total.win_rate is None:
+        return None
+    return Page05BiasAnalysis(
+        radar_data=[
+            RadarData(
+                subject=row.subject_name,
+                total_win_rate=float(total.win_rate),
+                subject_win_rate=float(row.win_rate or 0)
+            )
+            for row in subject_rows
+        ],
+        strength_subjects=json.loads(total.strength_subjects or "[]"),
+        weak_subjects=json.loads(total.weak_subjects or "[]")
+    )
+
+def _question_label(subject_name: str, question_type: Optional[str], question_code: int) -> str:
+    """题目标签，如 数学单选3"""
+    type_name = (question_type or "").rstrip("题")
+    return f"{subject_name}{type_name}{question_code}"
+
+def build_loss_analysis(
+    db: Session,
+    total: ExamScoreTotal,
+    subject_rows: List[ExamSubjectScore],
+    answers: Optional[List[Answer]] = None
+) -> Page08LossAnalysis:
+    """08-把学生本人的答案与预先计算好的题目难度关联，得到失分分析页数据（发布时由调用方批量传入答案）"""
+    if answers is None:
+        answers = student_answers(db, total.exam_id, total.student_id)
+    
+    groups = {level: {"level": level, "total_score": 0.0, "count": 0, "correct": 0, "partial": 0,
+                      "question_numbers": []} for level, _ in DIFFICULTY_LEVELS}
+    easy_levels = {level for level, _ in DIFFICULTY_LEVELS[:3]}
+    all_lost, partly_lost, strengths, potentials = [], [], [], []
+    gains: Dict[str, float] = {}
+    
+    for answer in answers:
+        question, subject_name = answer.question, answer.question.subject.name
+        code, level = question.question_code, question.difficulty_level
+        full_score, score = float(question.full_score or 0), float(answer.final_score or 0)
+        label = _question_label(subject_name, question.question_type, code)
+        group = groups.get(level)
+        if group is not None:
+            group["total_score"] += full_score
+            group["count"] += 1
+            group["question_numbers"].append(f"{subject_name}{code}")
+        
+        if score >= full_score:
+            if group is not None:
+                group["correct"] += 1
+            # 大多数同学失分的题目拿了满分
+            if level is not None and level not in easy_levels:
+                strengths.append(label)
+            continue
+        
+        if score <= 0:
+            all_lost.append(label)
+        else:
+            partly_lost.append(label)
+            if group is not None:
+                group["partial"] += 1
+        # 大多数同学能拿分的题目失了分，是最容易追回的分数
+        if level in easy_levels:
+            potentials.append(label)
+            gains[subject_name] = gains.get(subject_name, 0.0) + full_score - score
+    
+    difficulty_analysis = []
+    for group in groups.values():
+        count = group["count"]
+        rate = (group["correct"] + group["partial"] * 0.5) / count * 100 if count else 0.0
+        difficulty_analysis.append(DifficultyAnalysis(rate=round(rate, 1), **group))
+    
+    # 追回潜力分后的排名变化
+    scenario = {row.subject_name: float(row.score) + gains.get(row.subject_name, 0.0) for row in subject_rows}
+    cohort = rank_indexes.get(db, total.exam_id, None, GRADE_SCOPE)
+    prediction = evaluate_scenarios(cohort, total.total_score, subject_rows, [scenario])[0]
+    
+    return Page08LossAnalysis(
+        difficulty_analysis=difficulty_analysis,
+        loss_questions=LossQuestions(全部丢分=all_lost, 部分丢分=partly_lost),
+        优势得分题=strengths,
+        潜力追分题=potentials,
+        gain_prediction=GainPrediction(
+            potential_gain_score=sum(gains.values()),
+            rank_improvement=prediction["rank_change"]
+        )
+    )
+
+def build_question_analysis(
+    db: Session,
+    total: ExamScoreTotal,
+    subject_rows: List[ExamSubjectScore],
+    subject: str
+) -> Page07QuestionAnalysis:
+    """07-学生本人在所选科目（总分为全部科目）下的逐题得分"""
+    subject_names = [row.subject_name for row in subject_rows]
+    selected = subject if subject in subject_names else "总分"
+    answers = student_answers(db, total.exam_id, total.student_id, None if selected == "总分" else selected)
+    return Page07QuestionAnalysis(
+        selected_subject=selected,
+        available_subjects=["总分"] + subject_names,
+        current_questions=[
+            QuestionItem(
+                id=answer.question.question_code,
+                type=answer.question.question_type or "",
+                correct_answer=answer.question.ref_answer_text or "",
+                full_score=float(answer.question.full_score or 0),
+                score=float(answer.final_score or 0)
+            )
+            for answer in answers
+        ]
+    )
+
+def build_knowledge_analysis(
+    db: Session,
+    total: ExamScoreTotal,
+    rates: Optional[List[Tuple[Any, float, float]]] = None
+) -> Page09KnowledgeAnalysis:
+    """09-学生本人知识点得分率与本班得分率对比（发布时由调用方批量传入得分率）"""
+    if rates is None:
+        rates = student_knowledge_rates(db, total.exam_id, total.student_id, total.cclass)
+    return Page09KnowledgeAnalysis(
+        knowledge_points=[
+            KnowledgePoint(
+                name=point.name,
+                class_rate=class_rate,
+                personal_rate=personal_rate,
+                level=mastery_level(personal_rate, class_rate)
+            )
+            for point, class_rate, personal_rate in rates
+        ],
+        tabs=["满分知识点", "优势知识点", "短板知识点"]
+    )
+
 # ==================== API Endpoints ====================
 
 @router.get("/exams", response_model=ExamListResponse)
@@ -154,7 +412,7 @@ async def get_student_exams(
     page: int = 1,
     limit: int = 10,
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取历史考试列表"""
     
@@ -227,10 +485,19 @@ async def get_student_exams(
 async def get_exam_scores(
     exam_id: str,
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """01-获取考试成绩页数据"""
     
+    # 已定稿的考试：缓存或预渲染数据，否则读取成绩立方体
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "scores",
+        lambda db, total, rows: build_exam_scores(total, rows)
+    )
+    if response is not None:
+        return response
+    
     # 模拟数据：根据exam_id返回不同的成绩
     mock_scores = {
         "exam_001": {
@@ -262,13 +529,22 @@ async def get_level_position(
     exam_id: str,
     mode: str = Query(..., description="对比模式: class 或 grade"),
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """02-获取等级位置页数据"""
     
     # 根据mode返回不同的对比数据
     grouping_mode = "班级" if mode == "class" else "年级"
     
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "level-position",
+        lambda db, total, rows: build_level_position(db, total, rows, mode),
+        variant="class" if mode == "class" else "grade"
+    )
+    if response is not None:
+        return response
+    
     # 模拟科目对比数据
     subject_comparison = [
         {
@@ -333,10 +609,24 @@ async def get_pk_analysis(
     exam_id: str,
     class_id: Optional[str] = Query(None, description="班级ID"),
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """03-获取成绩PK页数据"""
     
+    # 默认与本班比较（已预渲染），也可以指定其他班级
+    cclass = None if class_id is None else _class_number(class_id)
+    if class_id is not None and cclass is None:
+        raise HTTPException(status_code=400, detail="班级ID无效")
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "pk-analysis",
+        lambda db, total, rows: build_pk_analysis(db, total, total.cclass if cclass is None else cclass),
+        variant="" if cclass is None else None,
+        params=cclass
+    )
+    if response is not None:
+        return response
+    
     # 模拟PK数据
     return Page03PKAnalysis(
         rank_percent=75.6,  # 击败了75.6%的同学
@@ -344,14 +634,24 @@ async def get_pk_analysis(
         class_total_students=45
     )
 
-@router.post("/exams/{exam_id}/ideal-ranking", response_model=Page04IdealRanking)
-async def calculate_ideal_ranking(
-    exam_id: str,
-    request: IdealScoresRequest,
-    current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
-):
-    """04-计算并获取理想排名页数据"""
+def _ideal_scores_dict(request: IdealScoresRequest) -> Dict[str, float]:
+    return {item.subject: item.ideal_score for item in request.ideal_scores}
+
+def _evaluate_ideal_rankings(
+    db: Session,
+    total: ExamScoreTotal,
+    subject_rows: List[ExamSubjectScore],
+    requests: List[IdealScoresRequest]
+) -> List[Page04IdealRanking]:
+    """在全年级总分排名索引上批量评估假设分数"""
+    cohort = rank_indexes.get(db, total.exam_id, None, GRADE_SCOPE)
+    results = evaluate_scenarios(
+        cohort, total.total_score, subject_rows, [_ideal_scores_dict(item) for item in requests]
+    )
+    return [Page04IdealRanking(**result) for result in results]
+
+def _mock_ideal_ranking(request: IdealScoresRequest) -> Page04IdealRanking:
+    """演示数据的理想排名"""
     
     # 当前成绩数据
     current_subjects = [
@@ -364,7 +664,7 @@ async def calculate_ideal_ranking(
     ]
     
     # 计算理想分数
-    ideal_scores_dict = {item.subject: item.ideal_score for item in request.ideal_scores}
+    ideal_scores_dict = _ideal_scores_dict(request)
     
     subjects = []
     new_total_score = 0
@@ -396,14 +696,64 @@ async def calculate_ideal_ranking(
         current_rank=current_rank
     )
 
+@router.post("/exams/{exam_id}/ideal-ranking", response_model=Page04IdealRanking)
+async def calculate_ideal_ranking(
+    exam_id: str,
+    request: IdealScoresRequest,
+    current_user: Dict[str, Any] = Depends(get_current_student),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """04-计算并获取理想排名页数据"""
+    
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "ideal-ranking",
+        lambda db, total, rows: _evaluate_ideal_rankings(db, total, rows, [request])[0],
+        variant=None,
+        cached=False
+    )
+    if response is not None:
+        return response
+    return _mock_ideal_ranking(request)
+
+@router.post("/exams/{exam_id}/ideal-ranking/batch", response_model=Page04IdealRankingBatch)
+async def calculate_ideal_rankings(
+    exam_id: str,
+    request: IdealRankingBatchRequest,
+    current_user: Dict[str, Any] = Depends(get_current_student),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """04-批量计算多组理想分数的预测排名（滑块拖动时一次提交多个场景）"""
+    
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "ideal-ranking-batch",
+        lambda db, total, rows: Page04IdealRankingBatch(
+            results=_evaluate_ideal_rankings(db, total, rows, request.scenarios)
+        ),
+        variant=None,
+        cached=False
+    )
+    if response is not None:
+        return response
+    return Page04IdealRankingBatch(results=[_mock_ideal_ranking(scenario) for scenario in request.scenarios])
+
 @router.get("/exams/{exam_id}/bias-analysis", response_model=Page05BiasAnalysis)
 async def get_bias_analysis(
     exam_id: str,
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """05-获取偏科分析页数据"""
     
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "bias-analysis",
+        lambda db, total, rows: build_bias_analysis(total, rows)
+    )
+    if response is not None:
+        return response
+    
     # 模拟雷达图数据
     radar_data = [
         {"subject": "语文", "total_win_rate": 75.6, "subject_win_rate": 68.2},
@@ -424,11 +774,26 @@ async def get_bias_analysis(
 async def get_trend_analysis(
     mode: str = Query(..., description="对比模式: class 或 school"),
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """06-获取历次趋势页数据"""
     
-    # 模拟历次考试趋势数据
+    student_pk = _parse_id(current_user["user_id"])
+    if student_pk is not None:
+        series = await db.run_sync(recent_win_rates, student_pk)
+        return Page06Trend(
+            trend_data=[
+                TrendData(
+                    date=row.exam_label,
+                    class_win_rate=float(row.class_win_rate),
+                    school_win_rate=float(row.school_win_rate)
+                )
+                for row in series
+            ],
+            trend_analysis=describe_trend(series, mode) or "暂无已发布的考试成绩"
+        )
+    
+    # 模拟历次考试趋势数据（演示账号）
     trend_data = [
         {"date": "2023年9月月考", "class_win_rate": 65.2, "school_win_rate": 58.3},
         {"date": "2023年10月月考", "class_win_rate": 71.8, "school_win_rate": 62.1},
@@ -449,10 +814,19 @@ async def get_question_analysis(
     exam_id: str,
     subject: str = Query(..., description="科目名称"),
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """07-获取试题分析页数据"""
     
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "question-analysis",
+        lambda db, total, rows: build_question_analysis(db, total, rows, subject),
+        variant=None, params=subject
+    )
+    if response is not None:
+        return response
+    
     # 可选科目列表
     available_subjects = ["总分", "语文", "数学", "英语", "物理", "化学", "生物"]
     
@@ -483,10 +857,18 @@ async def get_question_analysis(
 async def get_loss_analysis(
     exam_id: str,
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """08-获取失分分析页数据"""
     
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "loss-analysis",
+        lambda db, total, rows: build_loss_analysis(db, total, rows)
+    )
+    if response is not None:
+        return response
+    
     # 难度分析数据
     difficulty_analysis = [
         {
@@ -554,10 +936,18 @@ async def get_loss_analysis(
 async def get_knowledge_analysis(
     exam_id: str,
     current_user: Dict[str, Any] = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """09-获取知识点分析页数据"""
     
+    exam_pk, student_pk = _parse_id(exam_id), _parse_id(current_user["user_id"])
+    response = await db.run_sync(
+        _serve_page, exam_pk, student_pk, "knowledge-analysis",
+        lambda db, total, rows: build_knowledge_analysis(db, total)
+    )
+    if response is not None:
+        return response
+    
     # 知识点分析数据
     knowledge_points = [
         {"name": "函数与导数", "class_rate": 78.5, "personal_rate": 85.2, "level": "优秀掌握"},
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from database import get_db
-from auth import get_current_teacher
+from typing import List, Dict, Any, Optional
+from database import get_async_read_db
+from auth import get_current_admin, get_current_teacher
+from models import ExamScoreTotal, Student
+from services.rank_index import rank_indexes, class_scope
+from services.cohort_stats import cohort_stats, summarize
+from services.publish import republish
 
 router = APIRouter(prefix="/teacher", tags=["教师端 (Teacher)"])
 
@@ -28,17 +34,23 @@ class ClassScoreResponse(BaseModel):
     statistics: Statistics
     students: List[StudentScore]
 
-# ==================== API Endpoints ====================
+class FinalizeResponse(BaseModel):
+    exam_id: int
+    student_count: int
+    payload_count: int
+    version: int
 
-@router.get("/classes", response_model=List[ClassInfo])
-async def get_teacher_classes(
-    current_user: Dict[str, Any] = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
-):
-    """获取教师所教班级列表"""
-    
-    # 获取当前教师ID
-    teacher_id = current_user["user_id"]
+# ==================== Helpers ====================
+
+def _parse_id(value: Any) -> Optional[int]:
+    """把路径参数转换为数据库主键，演示数据（如 class_001）返回None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _teacher_classes(current_user: Dict[str, Any]) -> List[Dict[str, str]]:
+    """教师所教的班级（在实际项目中，应该从数据库查询教师与班级的关系）"""
     teacher_name = current_user.get("name", "张老师")
     
     # 模拟数据：根据教师返回其所教的班级
@@ -55,30 +67,80 @@ async def get_teacher_classes(
             {"class_id": "class_005", "class_name": "高三(5)班"},
             {"class_id": "class_006", "class_name": "高三(6)班"}
         ]
+    return mock_classes
+
+def _class_number(class_id: str) -> Optional[int]:
+    """班级ID转换为班级号：class_003 与 3 都对应 3 班"""
+    return _parse_id(class_id[len("class_"):] if class_id.startswith("class_") else class_id)
+
+def _class_scores_from_cube(db: Session, exam_pk: int, cclass: int) -> Optional[ClassScoreResponse]:
+    """从成绩立方体读取本班学生成绩，考试未定稿时返回None"""
+    rows = (
+        db.query(ExamScoreTotal.student_id, Student.name, ExamScoreTotal.total_score)
+        .join(Student, ExamScoreTotal.student_id == Student.id)
+        .filter(ExamScoreTotal.exam_id == exam_pk, ExamScoreTotal.cclass == cclass)
+        .all()
+    )
+    if not rows:
+        return None
+
+    index = rank_indexes.get(db, exam_pk, None, class_scope(cclass))
+    students = sorted(
+        (StudentScore(
+            student_id=str(student_id),
+            student_name=name or "",
+            total_score=float(total_score),
+            rank=index.rank(total_score)
+        ) for student_id, name, total_score in rows),
+        key=lambda x: x.rank
+    )
+    class_stats = cohort_stats.get(db, exam_pk).get(class_scope(cclass), None)
+    return ClassScoreResponse(
+        statistics=Statistics(
+            avgScore=class_stats["mean"],
+            maxScore=class_stats["max"],
+            passRate=class_stats["pass_rate"]
+        ),
+        students=students
+    )
+
+# ==================== API Endpoints ====================
+
+@router.get("/classes", response_model=List[ClassInfo])
+async def get_teacher_classes(
+    current_user: Dict[str, Any] = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """获取教师所教班级列表"""
     
-    return [ClassInfo(**class_data) for class_data in mock_classes]
+    return [ClassInfo(**class_data) for class_data in _teacher_classes(current_user)]
 
 @router.get("/classes/{class_id}/scores", response_model=ClassScoreResponse)
 async def get_class_scores(
     class_id: str,
     examId: str = Query(..., description="考试ID"),
     current_user: Dict[str, Any] = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取班级成绩单"""
     
-    # 获取当前教师ID
-    teacher_id = current_user["user_id"]
-    
     # 验证教师是否有权限查看该班级
-    # 在实际项目中，应该从数据库查询教师与班级的关系
-    allowed_classes = ["class_001", "class_002", "class_003", "class_004"]
-    if class_id not in allowed_classes:
+    cclass = _class_number(class_id)
+    allowed_classes = {_class_number(c["class_id"]) for c in _teacher_classes(current_user)}
+    if cclass is None or cclass not in allowed_classes:
         raise HTTPException(
             status_code=403,
             detail="您没有权限查看此班级的成绩"
         )
     
+    # 真实考试：从成绩立方体读取本班学生，名次由排名索引给出；演示考试（如 exam_001）返回模拟数据
+    exam_pk = _parse_id(examId)
+    if exam_pk is not None:
+        response = await db.run_sync(_class_scores_from_cube, exam_pk, cclass)
+        if response is None:
+            raise HTTPException(status_code=404, detail="成绩未发布")
+        return response
+    
     # 模拟班级成绩数据
     mock_class_scores = {
         "class_001": {
@@ -201,11 +263,11 @@ async def get_class_scores(
             student.rank = i
         
         # 重新计算统计数据
-        scores = [s.total_score for s in adjusted_students]
+        summary = summarize((s.total_score for s in adjusted_students), pass_line=400)
         stats = Statistics(
-            avgScore=sum(scores) / len(scores),
-            maxScore=max(scores),
-            passRate=len([s for s in scores if s >= 400]) / len(scores) * 100
+            avgScore=summary["mean"],
+            maxScore=summary["max"],
+            passRate=summary["pass_rate"]
         )
         
         return ClassScoreResponse(
@@ -217,4 +279,17 @@ async def get_class_scores(
     return ClassScoreResponse(
         statistics=Statistics(**class_data["statistics"]),
         students=[StudentScore(**student) for student in class_data["students"]]
-    ) 
\ No newline at end of file
+    )
+
+@router.post("/exams/{exam_id}/finalize", response_model=FinalizeResponse)
+async def finalize_exam(
+    exam_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """阅卷定稿并发布（仅管理员）：运行发布流水线，预渲染学生端各静态分析页"""
+    
+    # 在线程池中用独立的同步会话运行，发布流水线不占用事件循环
+    result = await run_in_threadpool(republish, exam_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="考试不存在")
+    return FinalizeResponse(exam_id=exam_id, **result)
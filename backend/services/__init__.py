@@ -0,0 +1 @@
+# 服务模块初始化文件 
\ No newline at end of file
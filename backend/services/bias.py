@@ -0,0 +1,91 @@
+"""
+偏科分析
+
+对一场考试的全体学生一次性计算 科目 × 学生 的年级胜率矩阵：每一列只排序一次，
+再用二分查找为每个学生得到"分数低于他的人数"。同时根据科目胜率与总分胜率之差
+得出优势、劣势科目。结果写回成绩立方体，Page05 雷达图请求只做查表。
+"""
+
+import json
+from typing import List
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+from models import ExamScoreTotal, ExamSubjectScore
+from services.cohort_stats import load_cohort
+
+BIAS_MARGIN = 3.0   # 科目胜率高于/低于总分胜率超过该百分点记为优势/劣势科目
+
+def win_rate_matrix(scores: np.ndarray) -> np.ndarray:
+    """每列的胜率矩阵（击败该列有效人数的百分比），缺考位置为 NaN"""
+    rates = np.full(scores.shape, np.nan)
+    for column in range(scores.shape[1]):
+        values = scores[:, column]
+        present = ~np.isnan(values)
+        count = int(present.sum())
+        if count == 0:
+            continue
+        ordered = np.sort(values[present])
+        lower = np.searchsorted(ordered, values[present], side="left")
+        rates[present, column] = np.round(lower / count * 100, 1)
+    return rates
+
+def split_subjects(names: List[str], subject_rates: np.ndarray, total_rate: float):
+    """根据科目胜率与总分胜率之差划分优势、劣势科目（按差值从大到小）"""
+    diffs = [(name, rate - total_rate) for name, rate in zip(names, subject_rates) if not np.isnan(rate)]
+    strengths = [name for name, diff in sorted(diffs, key=lambda x: -x[1]) if diff >= BIAS_MARGIN]
+    weaknesses = [name for name, diff in sorted(diffs, key=lambda x: x[1]) if diff <= -BIAS_MARGIN]
+    return strengths, weaknesses
+
+def build_bias_profiles(db: Session, exam_id: int) -> int:
+    """计算并写回一场考试全体学生的科目胜率和优势/劣势科目，返回学生数（由调用方提交事务）"""
+    scores, _, _, student_ids, subject_ids = load_cohort(db, exam_id)
+    if len(student_ids) == 0:
+        return 0
+    rates = win_rate_matrix(scores)
+
+    names = dict(
+        db.query(ExamSubjectScore.subject_id, ExamSubjectScore.subject_name)
+        .filter(ExamSubjectScore.exam_id == exam_id)
+        .distinct()
+        .all()
+    )
+    subject_names = [names.get(subject_id, "") for subject_id in subject_ids[:-1]]
+
+    subject_updates, total_updates = [], []
+    for row, student_id in enumerate(student_ids.tolist()):
+        for column, subject_id in enumerate(subject_ids[:-1]):
+            if not np.isnan(rates[row, column]):
+                subject_updates.append({
+                    "b_student_id": student_id,
+                    "b_subject_id": subject_id,
+                    "b_win_rate": float(rates[row, column]),
+                })
+        strengths, weaknesses = split_subjects(subject_names, rates[row, :-1], rates[row, -1])
+        total_updates.append({
+            "b_student_id": student_id,
+            "b_win_rate": float(rates[row, -1]),
+            "b_strengths": json.dumps(strengths, ensure_ascii=False),
+            "b_weaknesses": json.dumps(weaknesses, ensure_ascii=False),
+        })
+
+    subject_table = ExamSubjectScore.__table__
+    total_table = ExamScoreTotal.__table__
+    db.execute(
+        update(subject_table)
+        .where(subject_table.c.exam_id == exam_id,
+               subject_table.c.student_id == bindparam("b_student_id"),
+               subject_table.c.subject_id == bindparam("b_subject_id"))
+        .values(win_rate=bindparam("b_win_rate")),
+        subject_updates
+    )
+    db.execute(
+        update(total_table)
+        .where(total_table.c.exam_id == exam_id,
+               total_table.c.student_id == bindparam("b_student_id"))
+        .values(win_rate=bindparam("b_win_rate"),
+                strength_subjects=bindparam("b_strengths"),
+                weak_subjects=bindparam("b_weaknesses")),
+        total_updates
+    )
+    return len(total_updates)
@@ -0,0 +1,202 @@
+"""
+群体统计（班级 / 年级）
+
+把一场考试的成绩立方体一次性读成 NumPy 矩阵（学生 × 科目，最后一列为总分），
+在一次向量化计算中得到每个班级、全年级、每个科目的平均分、最高分、最低分、
+标准差、及格率、分位数和分数段人数，取代接口里逐个学生的 Python 循环。
+"""
+
+import threading
+import warnings
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from models import ExamScoreTotal, ExamSubjectScore
+from services.exam_versions import exam_versions
+
+PASS_RATIO = 0.6                  # 及格线：满分的60%
+PERCENTILES = (25, 50, 75, 90)    # 输出的分位数
+SEGMENTS = 10                     # 分数段：按满分等分为10段
+
+# 统计范围的键：("grade", None) 或 ("class", 班级号)，与 rank_index 保持一致
+ScopeKey = Tuple[str, Optional[int]]
+
+class CohortStats:
+    """一场考试的群体统计结果，按 (范围, subject_id) 查询，subject_id 为 None 表示总分"""
+
+    def __init__(self, subject_ids: List[Optional[int]], results: Dict[ScopeKey, Dict[str, np.ndarray]]):
+        self._columns = {subject_id: column for column, subject_id in enumerate(subject_ids)}
+        self._results = results
+
+    def get(self, scope: ScopeKey, subject_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """返回某范围某科目的统计量，没有数据时返回None"""
+        result = self._results.get(scope)
+        column = self._columns.get(subject_id)
+        if result is None or column is None or result["count"][column] == 0:
+            return None
+        return {
+            name: (values[column].tolist() if values.ndim > 1 else values[column].item())
+            for name, values in result.items()
+        }
+
+def load_cohort(db: Session, exam_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[Optional[int]]]:
+    """
+    从成绩立方体读取整场考试的分数矩阵。
+
+    返回 (scores, full_scores, classes, student_ids, subject_ids)：scores 形状为
+    (学生数, 科目数 + 1)，缺考为 NaN，最后一列为总分；student_ids 与行一一对应，
+    subject_ids 与列一一对应，总分列为 None。
+    """
+    totals = (
+        db.query(ExamScoreTotal.student_id, ExamScoreTotal.cclass, ExamScoreTotal.total_score)
+        .filter(ExamScoreTotal.exam_id == exam_id)
+        .all()
+    )
+    subject_rows = (
+        db.query(ExamSubjectScore.student_id, ExamSubjectScore.subject_id,
+                 ExamSubjectScore.score, ExamSubjectScore.full_score)
+        .filter(ExamSubjectScore.exam_id == exam_id)
+        .all()
+    )
+
+    row_of = {student_id: row for row, (student_id, _, _) in enumerate(totals)}
+    subject_ids = sorted({subject_id for _, subject_id, _, _ in subject_rows})
+    column_of = {subject_id: column for column, subject_id in enumerate(subject_ids)}
+
+    scores = np.full((len(totals), len(subject_ids) + 1), np.nan)
+    full_scores = np.zeros(len(subject_ids) + 1)
+    if subject_rows:
+        rows = np.array([row_of[student_id] for student_id, _, _, _ in subject_rows])
+        columns = np.array([column_of[subject_id] for _, subject_id, _, _ in subject_rows])
+        scores[rows, columns] = [float(score or 0) for _, _, score, _ in subject_rows]
+        full_scores[columns] = [float(full or 0) for _, _, _, full in subject_rows]
+    scores[:, -1] = [float(total or 0) for _, _, total in totals]
+    full_scores[-1] = full_scores[:-1].sum()
+
+    classes = np.array([-1 if cclass is None else cclass for _, cclass, _ in totals], dtype=np.int64)
+    student_ids = np.array([student_id for student_id, _, _ in totals], dtype=np.int64)
+    return scores, full_scores, classes, student_ids, subject_ids + [None]
+
+def compute_stats(scores: np.ndarray, full_scores: np.ndarray, classes: np.ndarray) -> Dict[ScopeKey, Dict[str, np.ndarray]]:
+    """对全年级和每个班级、每一列同时计算统计量"""
+    results = {("grade", None): _describe(scores, full_scores)}
+    if len(scores) == 0:
+        return results
+
+    # 按班级排序后，每个班级是一段连续的行，可用 reduceat 一次算完所有班级
+    order = np.argsort(classes, kind="stable")
+    sorted_scores, sorted_classes = scores[order], classes[order]
+    class_values, starts = np.unique(sorted_classes, return_index=True)
+
+    present = ~np.isnan(sorted_scores)
+    filled = np.where(present, sorted_scores, 0.0)
+    filled_min = np.where(present, sorted_scores, np.inf)
+    counts = np.add.reduceat(present, starts, axis=0)
+    sums = np.add.reduceat(filled, starts, axis=0)
+    squares = np.add.reduceat(filled * filled, starts, axis=0)
+    maxima = np.fmax.reduceat(sorted_scores, starts, axis=0)
+    minima = np.minimum.reduceat(filled_min, starts, axis=0)
+    passed = np.add.reduceat(present & (filled >= full_scores * PASS_RATIO), starts, axis=0)
+    ends = np.append(starts[1:], len(sorted_scores))
+    groups = np.repeat(np.arange(len(starts)), ends - starts)
+    segments = _segment_counts(sorted_scores, full_scores, groups, len(starts))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+        pass_rates = passed / counts * 100
+
+    for group, cclass in enumerate(class_values):
+        block = sorted_scores[starts[group]:ends[group]]
+        results[("class", None if cclass == -1 else int(cclass))] = {
+            "count": counts[group],
+            "mean": means[group],
+            "max": maxima[group],
+            "min": np.where(np.isinf(minima[group]), np.nan, minima[group]),
+            "std": stds[group],
+            "pass_rate": pass_rates[group],
+            "percentiles": _percentiles(block),
+            "segments": segments[group],
+        }
+    return results
+
+def _describe(scores: np.ndarray, full_scores: np.ndarray) -> Dict[str, np.ndarray]:
+    """整块矩阵按列的统计量"""
+    present = ~np.isnan(scores)
+    counts = present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        filled = np.where(present, scores, 0.0)
+        means = filled.sum(axis=0) / counts
+        stds = np.sqrt(np.maximum((filled * filled).sum(axis=0) / counts - means * means, 0.0))
+        pass_rates = (present & (filled >= full_scores * PASS_RATIO)).sum(axis=0) / counts * 100
+        maxima = np.where(present, scores, -np.inf).max(axis=0, initial=-np.inf)
+        minima = np.where(present, scores, np.inf).min(axis=0, initial=np.inf)
+    return {
+        "count": counts,
+        "mean": means,
+        "max": np.where(np.isinf(maxima), np.nan, maxima),
+        "min": np.where(np.isinf(minima), np.nan, minima),
+        "std": stds,
+        "pass_rate": pass_rates,
+        "percentiles": _percentiles(scores),
+        "segments": _segment_counts(scores, full_scores, np.zeros(len(scores), dtype=np.int64), 1)[0],
+    }
+
+def _percentiles(block: np.ndarray) -> np.ndarray:
+    """按列的分位数，形状为 (列数, len(PERCENTILES))"""
+    if len(block) == 0:
+        return np.full((block.shape[1], len(PERCENTILES)), np.nan)
+    with warnings.catch_warnings():
+        # 整列缺考时 nanpercentile 会告警并返回 NaN，这里按缺失处理
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(block, PERCENTILES, axis=0).T
+
+def _segment_counts(scores: np.ndarray, full_scores: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """分数段人数，形状为 (组数, 列数, SEGMENTS)；满分计入最高段"""
+    columns = scores.shape[1]
+    present = ~np.isnan(scores)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(full_scores > 0, scores / full_scores, 0.0)
+    bins = np.clip(np.floor(np.nan_to_num(ratio) * SEGMENTS), 0, SEGMENTS - 1).astype(np.int64)
+    flat = (groups[:, None] * columns + np.arange(columns)[None, :]) * SEGMENTS + bins
+    counts = np.bincount(flat[present], minlength=group_count * columns * SEGMENTS)
+    return counts.reshape(group_count, columns, SEGMENTS)
+
+def summarize(scores: Iterable[float], pass_line: float) -> Dict[str, float]:
+    """对一组临时分数（如演示数据）做向量化统计"""
+    values = np.asarray(list(scores), dtype=float)
+    if values.size == 0:
+        return {"mean": 0.0, "max": 0.0, "std": 0.0, "pass_rate": 0.0}
+    return {
+        "mean": float(values.mean()),
+        "max": float(values.max()),
+        "std": float(values.std()),
+        "pass_rate": float((values >= pass_line).mean() * 100),
+    }
+
+class CohortStatsRegistry:
+    """按 (考试, 版本号) 缓存群体统计，首次使用时从成绩立方体计算；读到新版本时丢弃旧版本"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[int, int], CohortStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, exam_id: int) -> CohortStats:
+        version = exam_versions.current(db, exam_id)
+        stats = self._stats.get((exam_id, version))
+        if stats is None:
+            scores, full_scores, classes, _, subject_ids = load_cohort(db, exam_id)
+            stats = CohortStats(subject_ids, compute_stats(scores, full_scores, classes))
+            with self._lock:
+                stats = self._stats.setdefault((exam_id, version), stats)
+                for stale in [key for key in self._stats if key[0] == exam_id and key[1] < version]:
+                    del self._stats[stale]
+        return stats
+
+    def invalidate(self, exam_id: int) -> None:
+        """成绩变化后丢弃该考试各版本的统计结果"""
+        with self._lock:
+            for key in [key for key in self._stats if key[0] == exam_id]:
+                del self._stats[key]
+
+cohort_stats = CohortStatsRegistry()
@@ -0,0 +1,56 @@
+"""
+题目难度
+
+阅卷定稿后按全体考生的 Answer.final_score / Question.full_score 一次性计算每道题的
+平均得分率和难度等级，写回 Question。Page08 只需把学生本人的答案与之关联。
+"""
+
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from models import Answer, Question, Subject
+
+# 难度等级及其平均得分率下限，按从易到难排列
+DIFFICULTY_LEVELS = [
+    ("极易", Decimal("0.9")),
+    ("较易", Decimal("0.7")),
+    ("适中", Decimal("0.5")),
+    ("较难", Decimal("0.3")),
+    ("极难", Decimal("0")),
+]
+
+def difficulty_level(score_rate: Optional[Decimal]) -> Optional[str]:
+    """根据平均得分率返回难度等级"""
+    if score_rate is None:
+        return None
+    for level, lower in DIFFICULTY_LEVELS:
+        if score_rate >= lower:
+            return level
+    return DIFFICULTY_LEVELS[-1][0]
+
+def build_question_difficulty(db: Session, exam_id: int) -> int:
+    """批量计算一场考试所有题目的难度，返回更新的题目数（由调用方提交事务）"""
+    rows = (
+        db.query(Question.id, Question.full_score, func.avg(Answer.final_score))
+        .join(Subject, Question.subject_id == Subject.id)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .filter(Subject.exam_id == exam_id)
+        .group_by(Question.id, Question.full_score)
+        .all()
+    )
+
+    updates = []
+    for question_id, full_score, avg_score in rows:
+        score_rate = None
+        if avg_score is not None and full_score:
+            score_rate = (Decimal(str(avg_score)) / full_score).quantize(Decimal("0.0001"))
+        updates.append({
+            "id": question_id,
+            "score_rate": score_rate,
+            "difficulty_level": difficulty_level(score_rate),
+        })
+
+    if updates:
+        db.execute(update(Question), updates)
+    return len(updates)
@@ -0,0 +1,58 @@
+"""
+考试版本号
+
+exam.publish_version 在每次（重新）发布时加一。各 worker 在进程内缓存已知的版本号，
+每隔 exam_version_refresh_seconds 秒与数据库同步一次；响应缓存、排名索引和群体统计
+都以 (考试, 版本号) 为键，版本号变化后自然读到新数据，不依赖其他进程通知。
+
+发布流水线在提交前就要用新立方体构建索引，publish_exam 把待提交的新版本号记在
+会话的 info["publish_versions"] 中，同一会话内的读取以它为准。
+"""
+
+import threading
+import time
+from typing import Dict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import settings
+from models import Exam
+
+class ExamVersions:
+    """本进程已知的考试版本号，定期与数据库同步"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[int, int] = {}
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, db: Session, exam_id: int) -> int:
+        pending = db.info.get("publish_versions")
+        if pending and exam_id in pending:
+            return pending[exam_id]
+        now = time.monotonic()
+        if exam_id not in self._versions or now - self._synced_at > self.refresh_seconds:
+            self._sync(db, exam_id, now)
+        return self._versions.get(exam_id, 0)
+
+    def _sync(self, db: Session, exam_id: int, now: float) -> None:
+        with self._lock:
+            exam_ids = set(self._versions) | {exam_id}
+        rows = db.query(Exam.id, Exam.publish_version).filter(Exam.id.in_(exam_ids)).all()
+        with self._lock:
+            self._versions = {exam_id: 0 for exam_id in exam_ids}
+            self._versions.update({exam_id: version or 0 for exam_id, version in rows})
+            self._synced_at = now
+
+    def forget(self, exam_id: int) -> None:
+        """本进程写入后调用，下次读取时重新从数据库加载版本号"""
+        with self._lock:
+            self._versions.pop(exam_id, None)
+
+exam_versions = ExamVersions(settings.exam_version_refresh_seconds)
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_publish_versions(session: Session) -> None:
+    """事务结束后版本号以数据库为准"""
+    session.info.pop("publish_versions", None)
@@ -0,0 +1,161 @@
+"""
+评分记录归档
+
+grade_record 保存每一次阅卷打分，是增长最快的表，而热路径只关心当前考试。发布超过
+grade_archive_after_days 天的考试，其评分记录按 (考试, 学生) 打包成一行 JSON，zlib 压缩后
+写入 grade_record_archive，并从 grade_record 删除，热表和它的索引只保留近期考试。
+
+归档按学生分批，每批的写入归档与删除热数据在同一事务中提交，中途失败重跑是安全的；
+归档后又产生的评分记录（复核改分）在下次运行时追加为新的归档行。
+归档数据只通过 grade_history（审计接口）读取，不参与分析页面计算。
+
+定时任务执行：
+
+    python -m services.grade_archive          # 按 grade_archive_after_days 归档
+    python -m services.grade_archive 365      # 只归档发布超过 365 天的考试
+"""
+import json
+import sys
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, distinct, insert, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Answer, Exam, GradeRecord, GradeRecordArchive, Question, Subject
+
+# 按 id 删除热数据时每条语句的 id 个数
+DELETE_BATCH = 1000
+
+def _pack(records: List[Dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(records, ensure_ascii=False, default=str).encode("utf-8"))
+
+def _unpack(data: bytes) -> List[Dict[str, Any]]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+def _record_columns():
+    """评分记录连同答案的学生、题目信息，热数据与归档数据使用同一组字段"""
+    return (
+        GradeRecord.id, GradeRecord.answer_id, Answer.student_id, Answer.question_id, Answer.question_code,
+        GradeRecord.reviewer_id, GradeRecord.score, GradeRecord.comment, GradeRecord.timestamp,
+    )
+
+def _record_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "answer_id": row.answer_id,
+        "question_id": row.question_id,
+        "question_code": row.question_code,
+        "reviewer_id": row.reviewer_id,
+        "score": str(row.score) if row.score is not None else None,
+        "comment": row.comment,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+    }
+
+def _exam_records():
+    return (
+        select(*_record_columns())
+        .join(Answer, GradeRecord.answer_id == Answer.id)
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+    )
+
+def archive_exam(db: Session, exam_id: int, batch_students: Optional[int] = None) -> Dict[str, Any]:
+    """把一场考试的全部评分记录移入归档表，返回归档的学生数、记录数与压缩前后字节数"""
+    batch_students = batch_students or settings.grade_archive_batch_students
+    student_ids = db.execute(
+        select(distinct(Answer.student_id))
+        .join(GradeRecord, GradeRecord.answer_id == Answer.id)
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+        .where(Subject.exam_id == exam_id)
+        .order_by(Answer.student_id)
+    ).scalars().all()
+
+    summary = {"exam_id": exam_id, "students": 0, "records": 0, "raw_bytes": 0, "archived_bytes": 0}
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(student_ids), batch_students):
+        chunk = student_ids[start:start + batch_students]
+        by_student: Dict[int, List[Any]] = defaultdict(list)
+        for row in db.execute(
+            _exam_records()
+            .where(Subject.exam_id == exam_id, Answer.student_id.in_(chunk))
+            .order_by(Answer.student_id, GradeRecord.timestamp, GradeRecord.id)
+        ):
+            by_student[row.student_id].append(row)
+
+        archives = []
+        record_ids = []
+        for student_id, rows in by_student.items():
+            records = [_record_dict(row) for row in rows]
+            data = _pack(records)
+            timestamps = [row.timestamp for row in rows if row.timestamp is not None]
+            archives.append({
+                "exam_id": exam_id,
+                "student_id": student_id,
+                "record_count": len(records),
+                "first_timestamp": min(timestamps) if timestamps else None,
+                "last_timestamp": max(timestamps) if timestamps else None,
+                "archived_at": now,
+                "records": data,
+            })
+            record_ids.extend(row.id for row in rows)
+            summary["raw_bytes"] += len(json.dumps(records, ensure_ascii=False).encode("utf-8"))
+            summary["archived_bytes"] += len(data)
+
+        if archives:
+            db.execute(insert(GradeRecordArchive), archives)
+            for offset in range(0, len(record_ids), DELETE_BATCH):
+                db.execute(delete(GradeRecord).where(GradeRecord.id.in_(record_ids[offset:offset + DELETE_BATCH])))
+        db.commit()
+        summary["students"] += len(archives)
+        summary["records"] += len(record_ids)
+    return summary
+
+def archive_grade_records(db: Session, after_days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """归档所有发布超过 after_days 天的考试，返回每场考试的归档结果"""
+    after_days = settings.grade_archive_after_days if after_days is None else after_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+    exam_ids = db.execute(
+        select(Exam.id).where(Exam.published_at.is_not(None), Exam.published_at < cutoff).order_by(Exam.id)
+    ).scalars().all()
+    return [archive_exam(db, exam_id) for exam_id in exam_ids]
+
+def grade_history(
+    db: Session,
+    exam_id: int,
+    student_id: int,
+    question_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """学生在一场考试中的评分记录（热表与归档合并），按时间排序，归档记录带 archived=True"""
+    hot = _exam_records().where(Subject.exam_id == exam_id, Answer.student_id == student_id)
+    if question_id is not None:
+        hot = hot.where(Answer.question_id == question_id)
+    records = [{**_record_dict(row), "archived": False} for row in db.execute(hot)]
+
+    for data in db.execute(
+        select(GradeRecordArchive.records)
+        .where(GradeRecordArchive.exam_id == exam_id, GradeRecordArchive.student_id == student_id)
+    ).scalars():
+        records.extend(
+            {**record, "archived": True}
+            for record in _unpack(data)
+            if question_id is None or record["question_id"] == question_id
+        )
+    records.sort(key=lambda record: (record["timestamp"] or "", record["id"]))
+    return records
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    with SessionLocal() as session:
+        results = archive_grade_records(session, days)
+    for result in results:
+        print(f"考试 {result['exam_id']}: 归档 {result['students']} 名学生的 {result['records']} 条评分记录，"
+              f"{result['raw_bytes']} -> {result['archived_bytes']} 字节")
+    if not results:
+        print("没有需要归档的考试")
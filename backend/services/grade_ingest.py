@@ -0,0 +1,191 @@
+"""
+批量录入阅卷成绩
+
+一次请求可能有几十万条 学生 × 题目 的得分。按 grade_ingest_chunk_size 分批：
+每批一条多行 INSERT ... ON DUPLICATE KEY UPDATE（SQLite 为 ON CONFLICT DO UPDATE）
+写入 answer（冲突键 uq_question_student），一条 executemany 追加 grade_record，然后提交。
+
+Core 写入不经过 ORM flush，page_cache 的事件监听捕获不到，因此每批显式调用
+record_score_writes：已发布的考试在提交后重新发布，阅卷中的考试版本号加一。
+"""
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Answer, GradeRecord, Question, Student, Subject
+from services.page_cache import record_score_writes
+
+# 校验失败时最多返回的错误条数
+MAX_REPORTED_ERRORS = 50
+
+class GradeIngestError(ValueError):
+    """录入数据校验失败，errors 为 [{"index", "message"}]"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} 条成绩校验失败")
+        self.errors = errors
+
+def _upsert_statement(db: Session, rows: List[Dict[str, Any]]):
+    """按方言生成多行 upsert：已有答案更新得分，新评语为空时保留原评语；其他方言抛出 ValueError"""
+    table = Answer.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(rows)
+        return stmt.on_duplicate_key_update(
+            final_score=stmt.inserted.final_score,
+            final_comment=func.coalesce(stmt.inserted.final_comment, table.c.final_comment),
+        )
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.question_id, table.c.student_id],
+            set_={
+                "final_score": stmt.excluded.final_score,
+                "final_comment": func.coalesce(stmt.excluded.final_comment, table.c.final_comment),
+            },
+        )
+    raise ValueError(f"不支持的数据库方言: {dialect}")
+
+def validate_grades(db: Session, exam_id: int, items: Sequence[Dict[str, Any]]) -> Dict[int, Tuple[int, Decimal]]:
+    """
+    校验题目属于该考试、学生存在、得分在 [0, 满分] 内，返回 {question_id: (题号, 满分)}。
+    有错误时抛出 GradeIngestError。
+    """
+    questions = {
+        question_id: (code, full_score)
+        for question_id, code, full_score in db.query(Question.id, Question.question_code, Question.full_score)
+        .join(Subject, Question.subject_id == Subject.id)
+        .filter(Subject.exam_id == exam_id)
+    }
+    student_ids = {item["student_id"] for item in items}
+    known_students = set()
+    for chunk in _chunks(sorted(student_ids), settings.grade_ingest_chunk_size):
+        known_students.update(db.execute(select(Student.id).where(Student.id.in_(chunk))).scalars())
+
+    errors = []
+    seen = set()
+    for index, item in enumerate(items):
+        key = (item["question_id"], item["student_id"])
+        question = questions.get(item["question_id"])
+        if question is None:
+            message = f"题目 {item['question_id']} 不属于考试 {exam_id}"
+        elif item["student_id"] not in known_students:
+            message = f"学生 {item['student_id']} 不存在"
+        elif not 0 <= Decimal(str(item["final_score"])) <= (question[1] or 0):
+            message = f"得分 {item['final_score']} 超出 [0, {question[1]}]"
+        elif key in seen:
+            message = f"题目 {key[0]} 学生 {key[1]} 重复"
+        else:
+            seen.add(key)
+            continue
+        errors.append({"index": index, "message": message})
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+    if errors:
+        raise GradeIngestError(errors)
+    return questions
+
+def _chunks(items: Sequence[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def write_grade_chunk(
+    db: Session,
+    exam_id: int,
+    chunk: Sequence[Dict[str, Any]],
+    question_codes: Dict[int, int]
+) -> Dict[str, Any]:
+    """
+    写入并提交一批已校验的成绩，返回该批的行数、新建数、改分数与吞吐。
+
+    同一批内 (question_id, student_id) 不能重复；question_codes 为 {question_id: 题号}。
+    """
+    started = time.perf_counter()
+    keys = [(item["question_id"], item["student_id"]) for item in chunk]
+    key_filter = tuple_(Answer.question_id, Answer.student_id).in_(keys)
+    old_scores = {
+        (question_id, student_id): score
+        for question_id, student_id, score in db.execute(
+            select(Answer.question_id, Answer.student_id, Answer.final_score).where(key_filter)
+        )
+    }
+
+    db.execute(_upsert_statement(db, [
+        {
+            "question_id": item["question_id"],
+            "student_id": item["student_id"],
+            "question_code": question_codes[item["question_id"]],
+            "final_score": item["final_score"],
+            "final_comment": item.get("final_comment"),
+        }
+        for item in chunk
+    ]))
+    answer_ids = {
+        (question_id, student_id): answer_id
+        for answer_id, question_id, student_id in db.execute(
+            select(Answer.id, Answer.question_id, Answer.student_id).where(key_filter)
+        )
+    }
+    now = datetime.now(timezone.utc)
+    db.execute(insert(GradeRecord), [
+        {
+            "answer_id": answer_ids[(item["question_id"], item["student_id"])],
+            "reviewer_id": item.get("reviewer_id"),
+            "score": item["final_score"],
+            "comment": item.get("comment"),
+            "timestamp": now,
+        }
+        for item in chunk
+    ])
+
+    changed = sum(
+        1 for item in chunk
+        if old_scores.get((item["question_id"], item["student_id"])) != Decimal(str(item["final_score"]))
+    )
+    record_score_writes(db, exam_ids={exam_id})
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": len(chunk),
+        "inserted": sum(1 for key in keys if key not in old_scores),
+        "changed": changed,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(len(chunk) / seconds, 1) if seconds else None,
+    }
+
+def ingest_grades(
+    db: Session,
+    exam_id: int,
+    items: Sequence[Dict[str, Any]],
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    分批 upsert 答案得分并追加评分记录，每批单独提交，返回每批的行数与吞吐。
+
+    items 中每项包含 student_id、question_id、final_score，可选 final_comment、reviewer_id、comment。
+    """
+    chunk_size = chunk_size or settings.grade_ingest_chunk_size
+    questions = validate_grades(db, exam_id, items)
+    question_codes = {question_id: code for question_id, (code, _) in questions.items()}
+    started = time.perf_counter()
+    batches = [
+        {"batch": number, **write_grade_chunk(db, exam_id, chunk, question_codes)}
+        for number, chunk in enumerate(_chunks(items, chunk_size), start=1)
+    ]
+
+    seconds = time.perf_counter() - started
+    return {
+        "exam_id": exam_id,
+        "rows": len(items),
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(len(items) / seconds, 1) if seconds and items else None,
+        "batches": batches,
+    }
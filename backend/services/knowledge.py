@@ -0,0 +1,125 @@
+"""
+知识点掌握情况
+
+题目与知识点是带权重的多对多关系（question_knowledge）。考试定稿时按班级一次性
+计算每个知识点的加权得分率写入 class_knowledge_rate；Page09 只需对学生本人的答案
+做一次加权求和（点积），再与本班得分率比较，不再扫描全班同学的答案。
+"""
+
+from decimal import Decimal
+from typing import Dict, List, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from models import Answer, ClassKnowledgeRate, KnowledgePoint, Question, Student, Subject, question_knowledge
+
+EXCELLENT_RATE = 80.0   # 个人得分率不低于本班且达到该值为"优秀掌握"
+
+def mastery_level(personal_rate: float, class_rate: float) -> str:
+    """根据个人得分率与班级得分率给出掌握程度"""
+    if personal_rate < class_rate:
+        return "未掌握"
+    if personal_rate >= EXCELLENT_RATE:
+        return "优秀掌握"
+    return "及格掌握"
+
+def _weighted_rate(weighted_score, weighted_full) -> Decimal:
+    if not weighted_full:
+        return Decimal("0")
+    return (Decimal(str(weighted_score or 0)) / Decimal(str(weighted_full)) * 100).quantize(Decimal("0.01"))
+
+def build_class_knowledge_rates(db: Session, exam_id: int) -> int:
+    """重新计算一场考试各班级的知识点得分率，返回写入行数（由调用方提交事务）"""
+    weight = question_knowledge.c.weight
+    rows = (
+        db.query(
+            Student.cclass,
+            question_knowledge.c.knowledge_point_id,
+            func.sum(weight * Answer.final_score),
+            func.sum(weight * Question.full_score)
+        )
+        .select_from(Answer)
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+        .join(question_knowledge, question_knowledge.c.question_id == Question.id)
+        .join(Student, Answer.student_id == Student.id)
+        .filter(Subject.exam_id == exam_id)
+        .group_by(Student.cclass, question_knowledge.c.knowledge_point_id)
+        .all()
+    )
+
+    db.query(ClassKnowledgeRate).filter(ClassKnowledgeRate.exam_id == exam_id).delete(synchronize_session=False)
+    values = [
+        {
+            "exam_id": exam_id,
+            "cclass": cclass,
+            "knowledge_point_id": knowledge_point_id,
+            "rate": _weighted_rate(weighted_score, weighted_full),
+        }
+        for cclass, knowledge_point_id, weighted_score, weighted_full in rows
+    ]
+    if values:
+        db.execute(insert(ClassKnowledgeRate), values)
+    return len(values)
+
+def _personal_answers(db: Session, exam_id: int):
+    return (
+        db.query(
+            Answer.student_id,
+            question_knowledge.c.knowledge_point_id,
+            question_knowledge.c.weight,
+            Answer.final_score,
+            Question.full_score
+        )
+        .select_from(Answer)
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+        .join(question_knowledge, question_knowledge.c.question_id == Question.id)
+        .filter(Subject.exam_id == exam_id)
+    )
+
+def _class_rates(db: Session, exam_id: int):
+    return (
+        db.query(ClassKnowledgeRate.cclass, KnowledgePoint, ClassKnowledgeRate.rate)
+        .join(ClassKnowledgeRate, ClassKnowledgeRate.knowledge_point_id == KnowledgePoint.id)
+        .filter(ClassKnowledgeRate.exam_id == exam_id)
+        .order_by(KnowledgePoint.subject_name, KnowledgePoint.id)
+    )
+
+def _accumulate(sums: Dict[int, Dict[int, List[Decimal]]], answers) -> None:
+    for student_id, knowledge_point_id, weight, score, full_score in answers:
+        acc = sums.setdefault(student_id, {}).setdefault(knowledge_point_id, [Decimal("0"), Decimal("0")])
+        acc[0] += weight * (score or 0)
+        acc[1] += weight * (full_score or 0)
+
+def _combine(class_rates, sums: Dict[int, List[Decimal]]) -> List[Tuple[KnowledgePoint, float, float]]:
+    return [
+        (point, float(rate or 0), float(_weighted_rate(*sums[point.id])))
+        for point, rate in class_rates
+        if point.id in sums
+    ]
+
+def student_knowledge_rates(
+    db: Session, exam_id: int, student_id: int, cclass: int
+) -> List[Tuple[KnowledgePoint, float, float]]:
+    """返回 [(知识点, 本班得分率, 个人得分率)]，个人得分率由学生本人答案加权求和得到"""
+    sums: Dict[int, Dict[int, List[Decimal]]] = {}
+    _accumulate(sums, _personal_answers(db, exam_id).filter(Answer.student_id == student_id).all())
+    class_rates = [
+        (point, rate)
+        for _, point, rate in _class_rates(db, exam_id).filter(ClassKnowledgeRate.cclass == cclass)
+    ]
+    return _combine(class_rates, sums.get(student_id, {}))
+
+def exam_knowledge_rates(
+    db: Session, exam_id: int, classes: Dict[int, int]
+) -> Dict[int, List[Tuple[KnowledgePoint, float, float]]]:
+    """一次取回整场考试的数据，按学生返回与 student_knowledge_rates 相同的结果（classes 为 学生ID → 班级）"""
+    sums: Dict[int, Dict[int, List[Decimal]]] = {}
+    _accumulate(sums, _personal_answers(db, exam_id).all())
+    by_class: Dict[int, List[Tuple[KnowledgePoint, float]]] = {}
+    for cclass, point, rate in _class_rates(db, exam_id):
+        by_class.setdefault(cclass, []).append((point, rate))
+    return {
+        student_id: _combine(by_class.get(cclass, []), sums.get(student_id, {}))
+        for student_id, cclass in classes.items()
+    }
@@ -0,0 +1,187 @@
+"""
+学生分析页响应缓存
+
+缓存键为 (exam_id, student_id, 页面, 参数)，每条缓存记录生成时的考试版本号
+（exam.publish_version）。版本号只在考试（重新）发布时变化，而改分会触发重新发布：
+该考试的 Answer.final_score / GradeRecord 写入由 Session 事件捕获，提交后交给后台的
+republisher 重新运行完整的发布流水线（成绩立方体、等级、胜率、难度、知识点得分率、
+预渲染页面），流水线提交时版本号加一，新的分数和全部派生数据同时可见。
+阅卷中（尚未生成成绩立方体）的考试没有需要重建的数据，写入时在同一事务内直接把版本号加一。
+两次改分之间的读请求完全命中内存，不访问数据库。
+
+多进程部署时，其他 worker 的发布通过每隔 exam_version_refresh_seconds 秒一次的
+版本号同步感知（services/exam_versions.py，一次按主键的查询，而不是每个请求一次）；
+排名索引和群体统计同样按版本号缓存，同步到新版本号后自动重新加载。
+
+配置了只读副本时，本进程的写入还会通知 replica_router 重新读取主库版本号，副本追上该版本前读请求回退到主库。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Optional, Set, Tuple, Union
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from config import settings
+from database import replica_router
+from models import Answer, Exam, ExamScoreTotal, GradeRecord, Question, Subject
+from services.cohort_stats import cohort_stats
+from services.exam_versions import exam_versions
+from services.rank_index import rank_indexes
+
+class PageCache:
+    """按版本号校验的 LRU 响应缓存，缓存的是已序列化的 JSON 字节"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+page_cache = PageCache(settings.page_cache_size)
+
+def cached_page(
+    db: Session,
+    exam_id: Optional[int],
+    student_id: Optional[int],
+    page: str,
+    params: Hashable,
+    compute: Callable[[], Union[BaseModel, Response, None]]
+) -> Optional[Response]:
+    """命中缓存直接返回；否则调用 compute 生成页面并写入缓存。compute 返回None时不缓存"""
+    if exam_id is None or student_id is None:
+        return None
+    key = (exam_id, student_id, page, params)
+    # 先取版本号再计算，计算期间发生的改分会让这条缓存立即过期
+    version = exam_versions.current(db, exam_id)
+    body = page_cache.get(key, version)
+    if body is None:
+        result = compute()
+        if result is None:
+            return None
+        body = result.body if isinstance(result, Response) else result.model_dump_json().encode()
+        page_cache.put(key, version, body)
+    return Response(content=body, media_type="application/json")
+
+def mark_exam_changed(exam_ids: Set[int]) -> None:
+    """成绩在本进程外部（如批量 Core 写入）变化后调用，使内存中的索引和版本号失效"""
+    for exam_id in exam_ids:
+        rank_indexes.invalidate(exam_id)
+        cohort_stats.invalidate(exam_id)
+        exam_versions.forget(exam_id)
+        replica_router.note_write(exam_id)
+
+# ==================== 写入驱动的失效 ====================
+
+@event.listens_for(Session, "after_flush")
+def _collect_score_writes(session: Session, flush_context) -> None:
+    """记录本次 flush 中改分涉及的题目和答案，交给 record_score_writes 处理"""
+    question_ids: Set[int] = set()
+    answer_ids: Set[int] = set()
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Answer) and obj.question_id is not None:
+            question_ids.add(obj.question_id)
+    for obj in session.dirty:
+        if isinstance(obj, Answer) and obj.question_id is not None:
+            if inspect(obj).attrs.final_score.history.has_changes():
+                question_ids.add(obj.question_id)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, GradeRecord) and obj.answer_id is not None:
+            answer_ids.add(obj.answer_id)
+
+    if question_ids or answer_ids:
+        record_score_writes(session, question_ids, answer_ids)
+
+def record_score_writes(
+    session: Session,
+    question_ids: Iterable[int] = (),
+    answer_ids: Iterable[int] = (),
+    exam_ids: Iterable[int] = ()
+) -> None:
+    """
+    登记当前事务内的改分：已发布的考试在提交后由 republisher 重新发布，
+    阅卷中的考试在同一事务内把版本号加一。
+
+    question_ids 为改了得分的题目，answer_ids 为只写了评分记录的答案，
+    exam_ids 为调用方已知受影响的考试。ORM 写入由 after_flush 自动调用，
+    批量 Core 写入（不经过 flush）需要显式调用。
+    """
+    connection = session.connection()
+    exam_ids = set(exam_ids)
+    question_ids = set(question_ids)
+    answer_ids = set(answer_ids)
+    if question_ids:
+        exam_ids.update(connection.execute(
+            select(Subject.exam_id)
+            .join(Question, Question.subject_id == Subject.id)
+            .where(Question.id.in_(question_ids))
+            .distinct()
+        ).scalars())
+    if answer_ids:
+        exam_ids.update(connection.execute(
+            select(Subject.exam_id)
+            .join(Question, Question.subject_id == Subject.id)
+            .join(Answer, Answer.question_id == Question.id)
+            .where(Answer.id.in_(answer_ids))
+            .distinct()
+        ).scalars())
+    if not exam_ids:
+        return
+
+    # 已生成成绩立方体的考试由重新发布递增版本号，不能在这里提前递增，
+    # 否则当前版本的预渲染页面失效而新版本的页面还没有生成
+    published = set(connection.execute(
+        select(ExamScoreTotal.exam_id).where(ExamScoreTotal.exam_id.in_(exam_ids)).distinct()
+    ).scalars())
+    grading = exam_ids - published
+    if grading:
+        connection.execute(
+            update(Exam.__table__)
+            .where(Exam.__table__.c.id.in_(grading))
+            .values(publish_version=Exam.__table__.c.publish_version + 1)
+        )
+    pending = session.info.setdefault("score_changes", {"changed": set(), "republish": set()})
+    pending["changed"].update(grading)
+    pending["republish"].update(published)
+
+@event.listens_for(Session, "after_commit")
+def _apply_score_writes(session: Session) -> None:
+    """事务提交后让阅卷中考试的版本号失效，并把已发布的考试排入重新发布队列"""
+    pending = session.info.pop("score_changes", None)
+    if not pending:
+        return
+    for exam_id in pending["changed"]:
+        exam_versions.forget(exam_id)
+        replica_router.note_write(exam_id)
+    if pending["republish"]:
+        # 发布流水线依赖学生端页面构建函数，后者又依赖本模块，只能在这里导入
+        from services.publish import republisher
+        republisher.schedule(pending["republish"])
+
+@event.listens_for(Session, "after_rollback")
+def _discard_score_writes(session: Session) -> None:
+    session.info.pop("score_changes", None)
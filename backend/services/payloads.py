@@ -0,0 +1,52 @@
+"""
+预渲染页面数据的读写
+
+考试发布时把各学生的静态分析页序列化为 JSON 存入 page_payload，并打上
+exam.publish_version 版本号。接口读取时只返回与当前发布版本一致的数据，
+直接把存好的字节作为响应体，不再经过模型校验和序列化。
+"""
+
+from typing import Iterable, Optional
+from fastapi import Response
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import Exam, PagePayload
+
+INSERT_CHUNK_SIZE = 1000
+
+def published_response(
+    db: Session, exam_id: Optional[int], student_id: Optional[int], page: str, variant: str = ""
+) -> Optional[Response]:
+    """返回当前发布版本的预渲染页面，没有时返回None"""
+    if exam_id is None or student_id is None:
+        return None
+    body = (
+        db.query(PagePayload.body)
+        .join(Exam, (Exam.id == PagePayload.exam_id) & (Exam.publish_version == PagePayload.version))
+        .filter(
+            PagePayload.exam_id == exam_id,
+            PagePayload.student_id == student_id,
+            PagePayload.page == page,
+            PagePayload.variant == variant
+        )
+        .scalar()
+    )
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json")
+
+def replace_payloads(db: Session, exam_id: int, rows: Iterable[dict]) -> int:
+    """用新版本的页面数据替换一场考试的全部旧数据，返回写入行数（由调用方提交事务）"""
+    db.query(PagePayload).filter(PagePayload.exam_id == exam_id).delete(synchronize_session=False)
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            db.execute(insert(PagePayload), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.execute(insert(PagePayload), chunk)
+        count += len(chunk)
+    return count
@@ -0,0 +1,150 @@
+"""
+考试发布流水线
+
+阅卷定稿后依次生成成绩立方体、题目难度、班级知识点得分率、偏科画像和胜率序列，
+再把每个学生的静态分析页（Page01/02/03/05/08/09）预渲染为 JSON 并打上版本号。
+需要参数的页面（Page04 假设分数、Page07 科目筛选、指定班级的 Page03）仍按需计算。
+
+已发布考试的改分提交后由 republisher 在后台线程重新运行整条流水线：同一考试排队期间
+的多次改分合并为一次，流水线完成前学生端继续看到上一版本的完整数据。
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Exam, ExamScoreTotal, ExamSubjectScore
+from repositories import exam_answers
+from routers import student as student_pages
+from services.bias import build_bias_profiles
+from services.cohort_stats import cohort_stats
+from services.difficulty import build_question_difficulty
+from services.knowledge import build_class_knowledge_rates, exam_knowledge_rates
+from services.page_cache import mark_exam_changed
+from services.payloads import replace_payloads
+from services.rank_index import rank_indexes
+from services.score_cube import build_score_cube
+from services.trend import append_win_rates
+
+logger = logging.getLogger("publish")
+
+def publish_exam(db: Session, exam: Exam) -> Dict[str, int]:
+    """执行完整的发布流水线（由调用方提交事务，并在提交后使内存索引失效）"""
+    student_count = build_score_cube(db, exam.id)
+    build_question_difficulty(db, exam.id)
+    build_class_knowledge_rates(db, exam.id)
+    build_bias_profiles(db, exam.id)
+
+    # 后续步骤读取内存中的排名索引与统计，必须基于新立方体加载：新版本号提交前只对本会话可见，
+    # 索引按新版本号缓存，不会被仍在读取旧版本的请求用到
+    exam.publish_version = (exam.publish_version or 0) + 1
+    db.info.setdefault("publish_versions", {})[exam.id] = exam.publish_version
+    rank_indexes.invalidate(exam.id)
+    cohort_stats.invalidate(exam.id)
+    append_win_rates(db, exam, rank_indexes)
+
+    payload_count = replace_payloads(db, exam.id, render_payloads(db, exam.id, exam.publish_version))
+    return {
+        "student_count": student_count,
+        "payload_count": payload_count,
+        "version": exam.publish_version,
+    }
+
+def republish(exam_id: int) -> Optional[Dict[str, int]]:
+    """用独立的同步会话锁定考试行、运行发布流水线并提交，无论成败都让内存中的索引失效；考试不存在时返回 None"""
+    with SessionLocal() as db:
+        # 行锁让定稿接口与后台重新发布串行执行，版本号不会被并发覆盖
+        exam = db.get(Exam, exam_id, with_for_update=True)
+        if exam is None:
+            return None
+        try:
+            result = publish_exam(db, exam)
+            db.commit()
+        finally:
+            mark_exam_changed({exam_id})
+    return result
+
+class Republisher:
+    """改分后的后台重新发布：单个工作线程按考试排队，排队中的同一考试只执行一次"""
+
+    def __init__(self):
+        self._pending: Dict[int, None] = {}    # 按排队顺序的考试ID
+        self._running: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+
+    def schedule(self, exam_ids: Iterable[int]) -> None:
+        with self._condition:
+            for exam_id in exam_ids:
+                self._pending[exam_id] = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="republisher", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待已排队的重新发布全部完成，超时返回 False（供测试和命令行使用）"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and self._running is None, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                exam_id = next(iter(self._pending))
+                del self._pending[exam_id]
+                self._running = exam_id
+            try:
+                republish(exam_id)
+            except Exception:
+                # 失败时学生端保持上一版本，下一次改分会再次触发重新发布
+                logger.exception("重新发布考试 %s 失败", exam_id)
+            finally:
+                with self._condition:
+                    self._running = None
+                    self._condition.notify_all()
+
+def render_payloads(db: Session, exam_id: int, version: int) -> Iterator[dict]:
+    """逐个学生生成静态页面的 page_payload 行"""
+    subject_rows: Dict[int, List[ExamSubjectScore]] = {}
+    for row in (
+        db.query(ExamSubjectScore)
+        .filter(ExamSubjectScore.exam_id == exam_id)
+        .order_by(ExamSubjectScore.student_id, ExamSubjectScore.subject_id)
+    ):
+        subject_rows.setdefault(row.student_id, []).append(row)
+
+    # 答案和知识点得分率按考试各取一次，避免每个学生两次查询
+    totals = db.query(ExamScoreTotal).filter(ExamScoreTotal.exam_id == exam_id).all()
+    answers = exam_answers(db, exam_id)
+    knowledge_rates = exam_knowledge_rates(db, exam_id, {total.student_id: total.cclass for total in totals})
+
+    for total in totals:
+        rows = subject_rows.get(total.student_id, [])
+        pages = {
+            ("scores", ""): student_pages.build_exam_scores(total, rows),
+            ("level-position", "class"): student_pages.build_level_position(db, total, rows, "class"),
+            ("level-position", "grade"): student_pages.build_level_position(db, total, rows, "grade"),
+            ("pk-analysis", ""): student_pages.build_pk_analysis(db, total, total.cclass),
+            ("bias-analysis", ""): student_pages.build_bias_analysis(total, rows),
+            ("loss-analysis", ""): student_pages.build_loss_analysis(
+                db, total, rows, answers.get(total.student_id, [])
+            ),
+            ("knowledge-analysis", ""): student_pages.build_knowledge_analysis(
+                db, total, knowledge_rates[total.student_id]
+            ),
+        }
+        for (page, variant), model in pages.items():
+            if model is None:
+                continue
+            yield {
+                "exam_id": exam_id,
+                "student_id": total.student_id,
+                "page": page,
+                "variant": variant,
+                "version": version,
+                "body": model.model_dump_json(),
+            }
+
+republisher = Republisher()
@@ -0,0 +1,111 @@
+"""
+排名索引
+
+按 (exam_id, 考试版本号, subject_id, 范围) 维护一棵树状数组（Fenwick tree），分数做坐标离散化。
+排名、击败百分比、范围人数都在 O(log n) 内得到。subject_id 为 None 表示总分。
+索引建好后不再修改：改分触发重新发布，版本号加一后按新版本号整体重新加载。
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from models import ExamScoreTotal, ExamSubjectScore
+from services.exam_versions import exam_versions
+
+# 范围：("grade", None) 表示全年级，("class", 班级号) 表示某个班
+Scope = Tuple[str, Optional[int]]
+GRADE_SCOPE: Scope = ("grade", None)
+
+def class_scope(cclass: Optional[int]) -> Scope:
+    return ("class", cclass)
+
+class RankIndex:
+    """单个群体的分数排名索引"""
+
+    def __init__(self, scores: Iterable[Decimal]):
+        scores = list(scores)
+        self._values: List[Decimal] = sorted(set(scores))
+        self._tree: List[int] = [0] * (len(self._values) + 1)
+        self.size = 0
+        for score in scores:
+            self._add(self._position(score), 1)
+
+    def _position(self, score: Decimal) -> int:
+        """分数在离散化坐标中的位置（从1开始），分数必须已存在"""
+        return bisect_left(self._values, score) + 1
+
+    def _add(self, position: int, delta: int) -> None:
+        self.size += delta
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def _prefix(self, position: int) -> int:
+        """坐标 1..position 上的人数"""
+        count = 0
+        while position > 0:
+            count += self._tree[position]
+            position -= position & -position
+        return count
+
+    def count_less(self, score: Decimal) -> int:
+        """分数严格低于 score 的人数"""
+        return self._prefix(bisect_left(self._values, score))
+
+    def count_greater(self, score: Decimal) -> int:
+        """分数严格高于 score 的人数"""
+        return self.size - self._prefix(bisect_right(self._values, score))
+
+    def rank(self, score: Decimal) -> int:
+        """并列排名：高于该分数的人数 + 1（score 不必在群体中，可用于假设分数）"""
+        return self.count_greater(score) + 1
+
+    def beat_percent(self, score: Decimal) -> float:
+        """击败了群体中百分之多少的人"""
+        if self.size == 0:
+            return 0.0
+        return round(self.count_less(score) / self.size * 100, 1)
+
+class RankIndexRegistry:
+    """
+    按 (exam_id, 版本号, subject_id, 范围) 缓存排名索引，首次使用时从成绩立方体加载。
+    其他进程重新发布后，本进程同步到新版本号即读到新索引，并丢弃该考试的旧版本索引。
+    """
+
+    def __init__(self):
+        self._indexes: Dict[Tuple[int, int, Optional[int], Scope], RankIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, exam_id: int, subject_id: Optional[int], scope: Scope) -> RankIndex:
+        version = exam_versions.current(db, exam_id)
+        key = (exam_id, version, subject_id, scope)
+        index = self._indexes.get(key)
+        if index is None:
+            index = RankIndex(self._load_scores(db, exam_id, subject_id, scope))
+            with self._lock:
+                index = self._indexes.setdefault(key, index)
+                for stale in [k for k in self._indexes if k[0] == exam_id and k[1] < version]:
+                    del self._indexes[stale]
+        return index
+
+    def _load_scores(self, db: Session, exam_id: int, subject_id: Optional[int], scope: Scope) -> List[Decimal]:
+        if subject_id is None:
+            column, model = ExamScoreTotal.total_score, ExamScoreTotal
+            query = db.query(column).filter(model.exam_id == exam_id)
+        else:
+            column, model = ExamSubjectScore.score, ExamSubjectScore
+            query = db.query(column).filter(model.exam_id == exam_id, model.subject_id == subject_id)
+        kind, cclass = scope
+        if kind == "class":
+            query = query.filter(model.cclass == cclass)
+        return [score for (score,) in query]
+
+    def invalidate(self, exam_id: int) -> None:
+        """成绩立方体重建后丢弃该考试的全部索引"""
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == exam_id]:
+                del self._indexes[key]
+
+rank_indexes = RankIndexRegistry()
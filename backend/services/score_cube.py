@@ -0,0 +1,136 @@
+"""
+成绩立方体（学生 × 科目 × 考试）
+
+考试阅卷定稿后调用 build_score_cube 一次性汇总 Answer.final_score，
+Page01 / Page02 等接口只按 (exam_id, student_id) 读取立方体中的行，
+不再在每次请求时对 Answer / Question / Subject 做多表聚合。
+"""
+
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from models import Answer, ExamScoreTotal, ExamSubjectScore, Question, Student, Subject
+
+# 等级赋分：21个等级及其累计人数百分比上限（A1 前1%，A2 前3% ……）
+LEVEL_BANDS = [
+    ("A1", 1), ("A2", 3), ("A3", 6), ("A4", 10), ("A5", 15),
+    ("B1", 21), ("B2", 28), ("B3", 36), ("B4", 43), ("B5", 50),
+    ("C1", 57), ("C2", 64), ("C3", 71), ("C4", 78), ("C5", 84),
+    ("D1", 89), ("D2", 93), ("D3", 96), ("D4", 98), ("D5", 99),
+    ("E", 100),
+]
+
+def score_level(rank: int, size: int) -> str:
+    """根据年级排名（从1开始）返回等级"""
+    if size <= 0:
+        return LEVEL_BANDS[-1][0]
+    position = (rank - 1) / size * 100
+    for level, upper in LEVEL_BANDS:
+        if position < upper:
+            return level
+    return LEVEL_BANDS[-1][0]
+
+def competition_ranks(scores: List[Decimal]) -> List[int]:
+    """按分数从高到低计算并列排名（如 1, 2, 2, 4），返回与输入顺序一致的名次"""
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    ranks = [0] * len(scores)
+    for position, index in enumerate(order):
+        if position > 0 and scores[index] == scores[order[position - 1]]:
+            ranks[index] = ranks[order[position - 1]]
+        else:
+            ranks[index] = position + 1
+    return ranks
+
+def build_score_cube(db: Session, exam_id: int) -> int:
+    """重新生成一场考试的成绩立方体，返回写入的学生人数（由调用方提交事务）"""
+
+    # 1. 每个科目的满分
+    full_scores: Dict[int, Decimal] = dict(
+        db.query(Question.subject_id, func.sum(Question.full_score))
+        .join(Subject, Question.subject_id == Subject.id)
+        .filter(Subject.exam_id == exam_id)
+        .group_by(Question.subject_id)
+        .all()
+    )
+
+    # 2. 一次聚合得到 学生 × 科目 的得分
+    rows = (
+        db.query(
+            Answer.student_id,
+            Subject.id,
+            Subject.name,
+            Student.cclass,
+            func.sum(Answer.final_score),
+        )
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+        .join(Student, Answer.student_id == Student.id)
+        .filter(Subject.exam_id == exam_id)
+        .group_by(Answer.student_id, Subject.id, Subject.name, Student.cclass)
+        .all()
+    )
+
+    subject_rows: List[dict] = []
+    totals: Dict[int, dict] = {}
+    for student_id, subject_id, subject_name, cclass, score in rows:
+        score = score or Decimal("0")
+        subject_rows.append({
+            "exam_id": exam_id,
+            "student_id": student_id,
+            "subject_id": subject_id,
+            "subject_name": subject_name,
+            "cclass": cclass,
+            "score": score,
+            "full_score": full_scores.get(subject_id),
+        })
+        total = totals.setdefault(student_id, {
+            "exam_id": exam_id,
+            "student_id": student_id,
+            "cclass": cclass,
+            "total_score": Decimal("0"),
+        })
+        total["total_score"] += score
+
+    # 3. 按年级排名赋等级
+    by_subject: Dict[int, List[dict]] = {}
+    for row in subject_rows:
+        by_subject.setdefault(row["subject_id"], []).append(row)
+    for group in by_subject.values():
+        _assign_levels(group, "score")
+    total_rows = list(totals.values())
+    _assign_levels(total_rows, "total_score")
+
+    # 4. 整体替换旧数据
+    db.query(ExamSubjectScore).filter(ExamSubjectScore.exam_id == exam_id).delete(synchronize_session=False)
+    db.query(ExamScoreTotal).filter(ExamScoreTotal.exam_id == exam_id).delete(synchronize_session=False)
+    if subject_rows:
+        db.execute(insert(ExamSubjectScore), subject_rows)
+    if total_rows:
+        db.execute(insert(ExamScoreTotal), total_rows)
+    return len(total_rows)
+
+def _assign_levels(rows: List[dict], key: str) -> None:
+    """为同一科目（或总分）的所有行写入等级"""
+    ranks = competition_ranks([row[key] for row in rows])
+    for row, rank in zip(rows, ranks):
+        row["level"] = score_level(rank, len(rows))
+
+def get_student_cube(
+    db: Session, exam_id: int, student_id: int
+) -> Tuple[Optional[ExamScoreTotal], List[ExamSubjectScore]]:
+    """读取某学生在某场考试的总分行和科目行（走唯一索引）"""
+    total = (
+        db.query(ExamScoreTotal)
+        .filter(ExamScoreTotal.exam_id == exam_id, ExamScoreTotal.student_id == student_id)
+        .first()
+    )
+    if total is None:
+        return None, []
+    subjects = (
+        db.query(ExamSubjectScore)
+        .filter(ExamSubjectScore.exam_id == exam_id, ExamSubjectScore.student_id == student_id)
+        .order_by(ExamSubjectScore.subject_id)
+        .all()
+    )
+    return total, subjects
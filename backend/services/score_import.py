@@ -0,0 +1,175 @@
+"""
+成绩表导入（管理员批量导入阅卷结果）
+
+模板为每行一道题的长表，表头（中英文均可）：
+    考号/student_code, 科目/subject, 题号/question_code, 得分/score, 评语/comment（可选）
+
+逐行流式解析：CSV 用 csv.reader 读文件流，XLSX 用 openpyxl 的只读模式逐行迭代，
+内存占用与文件大小无关。考号、(科目, 题号) 通过导入前一次性加载的字典解析，得分按
+Question.full_score 校验；合格的行凑满 grade_ingest_chunk_size 条后交给
+grade_ingest.write_grade_chunk 批量写入并提交。不合格的行跳过并记录行号，不影响其他行。
+"""
+import codecs
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Question, Student, Subject
+from services.grade_ingest import MAX_REPORTED_ERRORS, write_grade_chunk
+
+# 表头别名 -> 字段
+HEADER_ALIASES = {
+    "考号": "student_code", "学号": "student_code", "student_code": "student_code",
+    "科目": "subject", "subject": "subject",
+    "题号": "question_code", "question_code": "question_code",
+    "得分": "score", "分数": "score", "score": "score",
+    "评语": "comment", "comment": "comment",
+}
+REQUIRED_COLUMNS = ("student_code", "subject", "question_code", "score")
+
+class ScoreImportError(ValueError):
+    """文件格式错误（无法识别的格式、缺少必需列等），整个文件不导入"""
+
+def iter_csv_rows(stream: IO[bytes]) -> Iterator[Sequence[Any]]:
+    """逐行读取 CSV（UTF-8，可带 BOM）"""
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    yield from reader
+
+def iter_xlsx_rows(stream: IO[bytes]) -> Iterator[Sequence[Any]]:
+    """以只读模式逐行读取 XLSX 第一个工作表"""
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+ROW_READERS = {
+    "csv": iter_csv_rows,
+    "xlsx": iter_xlsx_rows,
+}
+
+def file_format(filename: str) -> str:
+    suffix = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if suffix not in ROW_READERS:
+        raise ScoreImportError(f"不支持的文件格式: {filename}，请上传 CSV 或 XLSX")
+    return suffix
+
+def _column_positions(header: Sequence[Any]) -> Dict[str, int]:
+    positions = {}
+    for index, name in enumerate(header):
+        field = HEADER_ALIASES.get(str(name or "").strip().lower())
+        if field is not None and field not in positions:
+            positions[field] = index
+    missing = [column for column in REQUIRED_COLUMNS if column not in positions]
+    if missing:
+        raise ScoreImportError(f"缺少必需的列: {', '.join(missing)}")
+    return positions
+
+def _cell(row: Sequence[Any], index: Optional[int]) -> str:
+    if index is None or index >= len(row) or row[index] is None:
+        return ""
+    value = row[index]
+    # XLSX 中的整数题号、考号会被读成 float
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def import_score_sheet(
+    db: Session,
+    exam_id: int,
+    rows: Iterator[Sequence[Any]],
+    dry_run: bool = False,
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    流式导入成绩表，返回读取行数、导入行数、跳过行数、出错行（最多 MAX_REPORTED_ERRORS 条）与每批吞吐。
+
+    dry_run 为真时只校验不写入。同一批内同一学生同一题出现多次时以最后一行为准。
+    """
+    chunk_size = chunk_size or settings.grade_ingest_chunk_size
+    started = time.perf_counter()
+    try:
+        positions = _column_positions(next(rows))
+    except StopIteration:
+        raise ScoreImportError("文件为空")
+
+    # 导入前一次性加载解析用的字典
+    students = dict(db.query(Student.student_code, Student.id))
+    questions: Dict[Tuple[str, str], Tuple[int, int, Decimal]] = {
+        (subject_name, str(code)): (question_id, code, full_score or Decimal("0"))
+        for question_id, subject_name, code, full_score in db.query(
+            Question.id, Subject.name, Question.question_code, Question.full_score
+        ).join(Subject, Question.subject_id == Subject.id).filter(Subject.exam_id == exam_id)
+    }
+    question_codes = {question_id: code for question_id, code, _ in questions.values()}
+
+    read = imported = rejected = 0
+    errors: List[Dict[str, Any]] = []
+    batches: List[Dict[str, Any]] = []
+    pending: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+    def flush() -> None:
+        nonlocal imported
+        if pending and not dry_run:
+            batches.append({"batch": len(batches) + 1,
+                            **write_grade_chunk(db, exam_id, list(pending.values()), question_codes)})
+        imported += len(pending)
+        pending.clear()
+
+    for line, row in enumerate(rows, start=2):
+        if not any(cell not in (None, "") for cell in row):
+            continue
+        read += 1
+        student_code = _cell(row, positions["student_code"])
+        subject_name = _cell(row, positions["subject"])
+        question_code = _cell(row, positions["question_code"])
+        student_id = students.get(student_code)
+        question = questions.get((subject_name, question_code))
+        message = None
+        if student_id is None:
+            message = f"考号 {student_code} 不存在"
+        elif question is None:
+            message = f"本场考试没有 {subject_name} 第 {question_code} 题"
+        else:
+            try:
+                score = Decimal(_cell(row, positions["score"]))
+            except InvalidOperation:
+                score = None
+            if score is None or not score.is_finite():
+                message = f"得分 {_cell(row, positions['score'])} 不是数字"
+            elif not 0 <= score <= question[2]:
+                message = f"得分 {score} 超出 [0, {question[2]}]"
+
+        if message is not None:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": line, "message": message})
+            continue
+
+        pending[(question[0], student_id)] = {
+            "student_id": student_id,
+            "question_id": question[0],
+            "final_score": score,
+            "final_comment": _cell(row, positions.get("comment")) or None,
+        }
+        if len(pending) >= chunk_size:
+            flush()
+    flush()
+
+    seconds = time.perf_counter() - started
+    return {
+        "exam_id": exam_id,
+        "dry_run": dry_run,
+        "rows": read,
+        "imported": imported,
+        "rejected": rejected,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(read / seconds, 1) if seconds and read else None,
+        "batches": batches,
+    }
@@ -0,0 +1,83 @@
+"""
+历次考试胜率序列
+
+考试发布时为每个学生写入一行 (考试, 班级胜率, 年级胜率, 名次)，改分后重新发布时整体替换。
+Page06 的趋势图和趋势分析文字只需按 (student_id, published_at) 做一次范围读取。
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import Exam, ExamScoreTotal, WinRateSeries
+from services.rank_index import GRADE_SCOPE, RankIndexRegistry, class_scope
+
+def append_win_rates(db: Session, exam: Exam, rank_indexes: RankIndexRegistry) -> int:
+    """重新写入本场考试全部学生的胜率记录，返回写入的行数（由调用方提交事务）"""
+    if exam.published_at is None:
+        exam.published_at = datetime.now(timezone.utc)
+
+    db.query(WinRateSeries).filter(WinRateSeries.exam_id == exam.id).delete(synchronize_session=False)
+    totals = db.query(ExamScoreTotal).filter(ExamScoreTotal.exam_id == exam.id).all()
+    grade_index = rank_indexes.get(db, exam.id, None, GRADE_SCOPE)
+
+    rows = []
+    for total in totals:
+        class_index = rank_indexes.get(db, exam.id, None, class_scope(total.cclass))
+        rows.append({
+            "student_id": total.student_id,
+            "exam_id": exam.id,
+            "exam_label": exam.name or exam.intro or f"考试{exam.id}",
+            "published_at": exam.published_at,
+            "class_win_rate": class_index.beat_percent(total.total_score),
+            "school_win_rate": grade_index.beat_percent(total.total_score),
+            "class_rank": class_index.rank(total.total_score),
+            "school_rank": grade_index.rank(total.total_score),
+        })
+    if rows:
+        db.execute(insert(WinRateSeries), rows)
+    return len(rows)
+
+def recent_win_rates(db: Session, student_id: int, limit: int = 10) -> List[WinRateSeries]:
+    """按发布时间顺序返回学生最近若干次考试的胜率记录"""
+    rows = (
+        db.query(WinRateSeries)
+        .filter(WinRateSeries.student_id == student_id)
+        .order_by(WinRateSeries.published_at.desc())
+        .limit(limit)
+        .all()
+    )
+    rows.reverse()
+    return rows
+
+def describe_trend(series: List[WinRateSeries], mode: str) -> Optional[str]:
+    """根据胜率序列生成趋势分析文字（mode 为 class 或 school）"""
+    if not series:
+        return None
+    scope_name = "班级" if mode == "class" else "年级"
+    rate_of = (lambda row: float(row.class_win_rate)) if mode == "class" else (lambda row: float(row.school_win_rate))
+    rank_of = (lambda row: row.class_rank) if mode == "class" else (lambda row: row.school_rank)
+
+    latest = series[-1]
+    parts = []
+    if len(series) >= 2:
+        delta = rate_of(latest) - rate_of(series[-2])
+        if delta > 0:
+            parts.append(f"本次考试{scope_name}胜率相比上次提升了{delta:.1f}个百分点")
+        elif delta < 0:
+            parts.append(f"本次考试{scope_name}胜率相比上次下降了{-delta:.1f}个百分点")
+        else:
+            parts.append(f"本次考试{scope_name}胜率与上次持平")
+        rank_delta = rank_of(series[-2]) - rank_of(latest)
+        if rank_delta:
+            parts.append(f"{scope_name}排名{'上升' if rank_delta > 0 else '下降'}{abs(rank_delta)}名")
+    else:
+        parts.append(f"本次考试{scope_name}胜率为{rate_of(latest):.1f}%")
+
+    best = min(series, key=rank_of)
+    worst = max(series, key=rank_of)
+    parts.append(
+        f"最近{len(series)}次考试中{scope_name}最好排名第{rank_of(best)}名（{best.exam_label}），"
+        f"最差排名第{rank_of(worst)}名（{worst.exam_label}）"
+    )
+    return "，".join(parts) + "。"
@@ -0,0 +1,60 @@
+"""
+理想排名（假设分数）预测
+
+把假设总分在本场考试全年级总分的排名索引上做二分查找，得到预测名次。
+每个科目的假设分数被限制在 [0, 科目满分] 之间。一次调用可评估多组假设，
+小程序拖动滑块时批量提交，所有场景共用同一份已缓存的群体数据。
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, List
+from models import ExamSubjectScore
+from services.rank_index import RankIndex
+
+def clamp_score(score: Decimal, full_score: Decimal) -> Decimal:
+    """把假设分数限制在 [0, 满分] 之间"""
+    return min(max(score, Decimal("0")), full_score)
+
+def evaluate_scenarios(
+    cohort: RankIndex,
+    current_total: Decimal,
+    subject_rows: List[ExamSubjectScore],
+    scenarios: List[Dict[str, float]]
+) -> List[Dict[str, Any]]:
+    """
+    评估一组假设场景。
+
+    cohort 为全年级总分排名索引（包含本人当前总分），scenarios 中每一项是
+    {科目名称: 假设分数}，未给出的科目保持当前分数。
+    """
+    current_rank = cohort.rank(current_total)
+    results = []
+    for ideal_scores in scenarios:
+        subjects = []
+        new_total = Decimal("0")
+        for row in subject_rows:
+            full_score = row.full_score if row.full_score is not None else row.score
+            ideal = ideal_scores.get(row.subject_name)
+            ideal_score = row.score if ideal is None else clamp_score(Decimal(str(ideal)), full_score)
+            subjects.append({
+                "subject": row.subject_name,
+                "current_score": float(row.score),
+                "ideal_score": float(ideal_score),
+                "max_score": float(full_score),
+            })
+            new_total += ideal_score
+
+        # 其他同学中总分高于假设总分的人数（排除本人当前总分）
+        higher = cohort.count_greater(new_total)
+        if current_total > new_total:
+            higher -= 1
+        predicted_rank = higher + 1
+
+        results.append({
+            "subjects": subjects,
+            "new_total_score": float(new_total),
+            "predicted_rank": predicted_rank,
+            "rank_change": current_rank - predicted_rank,
+            "current_rank": current_rank,
+        })
+    return results
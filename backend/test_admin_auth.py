@@ -0,0 +1,63 @@
+"""
+管理员接口权限测试：只有 admin_teacher_ids 中的教师可以调用，未登录、其他教师和学生返回 403
+
+运行: pytest test_admin_auth.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from auth import create_access_token
+from config import settings
+from main import app
+from routers import grading, teacher
+
+ADMIN = {"sub": "1", "user_type": "teacher", "teacher_id": "T001"}
+TEACHER = {"sub": "2", "user_type": "teacher", "teacher_id": "T002"}
+STUDENT = {"sub": "3", "user_type": "student", "student_code": "S0003"}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "admin_teacher_ids", ["T001"])
+    monkeypatch.setattr(teacher, "republish", lambda exam_id: {"student_count": 0, "payload_count": 0, "version": 1})
+    monkeypatch.setattr(grading, "_ingest", lambda exam_id, items: {"exam_id": exam_id, "rows": len(items), "seconds": 0.0, "batches": []})
+    monkeypatch.setattr(grading, "_import_sheet", lambda exam_id, fmt, stream, dry_run: {
+        "exam_id": exam_id, "dry_run": dry_run, "rows": 0, "imported": 0, "rejected": 0,
+        "errors": [], "seconds": 0.0, "batches": [],
+    })
+    return TestClient(app)
+
+def headers(claims):
+    return {"Authorization": f"Bearer {create_access_token(claims)}"}
+
+def test_finalize_requires_admin(client):
+    assert client.post("/teacher/exams/1/finalize").status_code == 403
+    for claims in (TEACHER, STUDENT):
+        response = client.post("/teacher/exams/1/finalize", headers=headers(claims))
+        assert response.status_code == 403
+    response = client.post("/teacher/exams/1/finalize", headers=headers(ADMIN))
+    assert response.status_code == 200
+    assert response.json()["exam_id"] == 1
+
+def test_grade_ingest_requires_admin(client):
+    body = {"items": [{"student_id": 1, "question_id": 1, "final_score": 5}]}
+    for claims in (TEACHER, STUDENT):
+        response = client.post("/grading/exams/1/answers", json=body, headers=headers(claims))
+        assert response.status_code == 403
+    response = client.post("/grading/exams/1/answers", json=body, headers=headers(ADMIN))
+    assert response.status_code == 200
+    assert response.json()["rows"] == 1
+
+def test_score_import_requires_admin(client):
+    files = {"file": ("scores.csv", "考号,科目,题号,得分\n".encode("utf-8"), "text/csv")}
+    for claims in (TEACHER, STUDENT):
+        response = client.post("/grading/exams/1/import", files=files, headers=headers(claims))
+        assert response.status_code == 403
+    response = client.post("/grading/exams/1/import?dry_run=true", files=files, headers=headers(ADMIN))
+    assert response.status_code == 200
+    assert response.json()["dry_run"] is True
+
+@pytest.mark.parametrize("path", ["/metrics/pool", "/metrics/auth"])
+def test_metrics_require_admin(client, path):
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers=headers(TEACHER)).status_code == 403
+    assert client.get(path, headers=headers(ADMIN)).status_code == 200
@@ -0,0 +1,103 @@
+"""
+群体统计测试：向量化结果与逐班、逐列的朴素 NumPy 计算一致
+
+覆盖缺考（NaN）、某班某科全部缺考、无班级学生、空考试，以及及格线和满分的边界。
+
+运行: pytest test_cohort_stats.py
+"""
+import numpy as np
+import pytest
+
+from services.cohort_stats import PASS_RATIO, PERCENTILES, SEGMENTS, CohortStats, compute_stats, summarize
+
+SUBJECT_IDS = [10, 20, 30, None]
+FULL_SCORES = np.array([100.0, 150.0, 50.0, 300.0])
+
+def reference(values, full_score):
+    """一组分数的朴素统计，缺考不计入；全部缺考时返回 None"""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    return {
+        "count": values.size,
+        "mean": values.mean(),
+        "max": values.max(),
+        "min": values.min(),
+        "std": values.std(),
+        "pass_rate": (values >= full_score * PASS_RATIO).mean() * 100,
+        "percentiles": np.percentile(values, PERCENTILES),
+        "segments": np.bincount(np.minimum((values / full_score * SEGMENTS).astype(int), SEGMENTS - 1),
+                                minlength=SEGMENTS),
+    }
+
+def assert_matches(actual, expected):
+    if expected is None:
+        assert actual is None
+        return
+    assert actual["count"] == expected["count"]
+    for name in ("mean", "max", "min", "std", "pass_rate", "percentiles"):
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-9, err_msg=name)
+    assert actual["segments"] == expected["segments"].tolist()
+
+@pytest.fixture
+def cohort():
+    rng = np.random.default_rng(7)
+    size = 60
+    scores = rng.uniform(0, 1, (size, len(FULL_SCORES))) * FULL_SCORES
+    scores[:, :-1] = np.round(scores[:, :-1] * 2) / 2
+    subjects = scores[:, :-1]
+    subjects[rng.random(subjects.shape) < 0.15] = np.nan
+    classes = rng.choice([1, 2, 3, -1], size)
+    # 及格线和满分边界：恰好及格、差半分、满分、零分
+    classes[:4] = 1
+    scores[:4, 0] = [60.0, 59.5, 100.0, 0.0]
+    scores[:4, 1] = [90.0, 89.5, 150.0, 0.0]
+    # 3 班数学整科缺考
+    scores[classes == 3, 0] = np.nan
+    scores[:, -1] = np.nansum(scores[:, :-1], axis=1)
+    return scores, classes
+
+def test_matches_reference(cohort):
+    scores, classes = cohort
+    stats = CohortStats(SUBJECT_IDS, compute_stats(scores, FULL_SCORES, classes))
+    scopes = [("grade", None, np.ones(len(scores), dtype=bool))]
+    scopes += [("class", None if c == -1 else int(c), classes == c) for c in (1, 2, 3, -1)]
+    for scope, cclass, mask in scopes:
+        for column, subject_id in enumerate(SUBJECT_IDS):
+            expected = reference(scores[mask, column], FULL_SCORES[column])
+            assert_matches(stats.get((scope, cclass), subject_id), expected)
+
+    # 整科缺考的班级没有该科统计，其他科目照常
+    assert stats.get(("class", 3), 10) is None
+    assert stats.get(("class", 3), 20) is not None
+    # 不存在的班级和科目
+    assert stats.get(("class", 99), None) is None
+    assert stats.get(("grade", None), 999) is None
+
+def test_pass_line_and_full_score_boundaries():
+    scores = np.array([[60.0, 60.0], [59.5, 59.5], [100.0, 100.0], [np.nan, np.nan]])
+    full_scores = np.array([100.0, 100.0])
+    stats = CohortStats([10, None], compute_stats(scores, full_scores, np.array([1, 1, 2, 2])))
+
+    grade = stats.get(("grade", None), 10)
+    assert grade["count"] == 3
+    assert grade["pass_rate"] == pytest.approx(200 / 3)
+    # 满分计入最高段，恰好 60 分计入第 7 段
+    assert grade["segments"] == [0, 0, 0, 0, 0, 1, 1, 0, 0, 1]
+    assert stats.get(("class", 1), 10)["pass_rate"] == 50.0
+    # 2 班只有一名学生到考
+    assert stats.get(("class", 2), 10)["count"] == 1
+    assert stats.get(("class", 2), 10)["std"] == 0.0
+
+def test_empty_exam():
+    scores = np.empty((0, len(FULL_SCORES)))
+    results = compute_stats(scores, FULL_SCORES, np.empty(0, dtype=np.int64))
+    assert list(results) == [("grade", None)]
+    stats = CohortStats(SUBJECT_IDS, results)
+    assert all(stats.get(("grade", None), subject_id) is None for subject_id in SUBJECT_IDS)
+
+def test_summarize():
+    assert summarize([60, 59.5, 100], pass_line=60) == pytest.approx(
+        {"mean": 219.5 / 3, "max": 100.0, "std": np.std([60, 59.5, 100]), "pass_rate": 200 / 3}
+    )
+    assert summarize([], pass_line=60) == {"mean": 0.0, "max": 0.0, "std": 0.0, "pass_rate": 0.0}
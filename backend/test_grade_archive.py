@@ -0,0 +1,91 @@
+"""
+评分记录归档测试：归档后热表删除、审计接口读回的记录与归档前完全一致、近期考试不受影响
+
+运行: pytest test_grade_archive.py
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+import migrations
+from config import settings
+from models import Answer, Exam, GradeRecord, GradeRecordArchive, Question, Reviewer, Student, Subject
+from services.grade_archive import archive_grade_records, grade_history
+
+NOW = datetime.now(timezone.utc)
+OLD_EXAM, CURRENT_EXAM = 1, 2
+STUDENTS = (1, 2, 3)
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # 每批一名学生，覆盖分批提交
+    monkeypatch.setattr(settings, "grade_archive_batch_students", 1)
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    migrations.upgrade(engine)
+    with Session(engine) as session:
+        session.add(Reviewer(id=1, name="阅卷人"))
+        session.add(Exam(id=OLD_EXAM, name="去年期末", published_at=NOW - timedelta(days=400)))
+        session.add(Exam(id=CURRENT_EXAM, name="本次月考", published_at=NOW - timedelta(days=3)))
+        for student_id in STUDENTS:
+            session.add(Student(id=student_id, student_code=f"S{student_id}", name=f"学生{student_id}", cclass=1))
+        for exam_id in (OLD_EXAM, CURRENT_EXAM):
+            session.add(Subject(id=exam_id, exam_id=exam_id, name="数学"))
+            for code in (1, 2):
+                question_id = exam_id * 10 + code
+                session.add(Question(id=question_id, subject_id=exam_id, question_code=code, full_score=Decimal("10")))
+                for student_id in STUDENTS:
+                    answer_id = question_id * 10 + student_id
+                    session.add(Answer(id=answer_id, student_id=student_id, question_id=question_id,
+                                       question_code=code, final_score=Decimal("7")))
+                    # 初评与复核两条记录
+                    for minute, score in ((0, "6"), (5, "7")):
+                        session.add(GradeRecord(
+                            answer_id=answer_id, reviewer_id=1, score=Decimal(score), comment=f"第{minute}分钟",
+                            timestamp=NOW - timedelta(days=exam_id, minutes=30 - minute - code)
+                        ))
+        session.commit()
+        yield session
+    engine.dispose()
+
+def hot_records(db, exam_id):
+    return db.execute(
+        select(func.count(GradeRecord.id))
+        .join(Answer, GradeRecord.answer_id == Answer.id)
+        .join(Question, Answer.question_id == Question.id)
+        .join(Subject, Question.subject_id == Subject.id)
+        .where(Subject.exam_id == exam_id)
+    ).scalar()
+
+def test_archive_moves_old_exam_records(db):
+    before = {(exam_id, student_id): grade_history(db, exam_id, student_id)
+              for exam_id in (OLD_EXAM, CURRENT_EXAM) for student_id in STUDENTS}
+    assert hot_records(db, OLD_EXAM) == hot_records(db, CURRENT_EXAM) == 12
+
+    results = archive_grade_records(db, after_days=365)
+    assert [(r["exam_id"], r["students"], r["records"]) for r in results] == [(OLD_EXAM, 3, 12)]
+
+    # 旧考试的记录离开热表，本次考试不受影响
+    assert hot_records(db, OLD_EXAM) == 0
+    assert hot_records(db, CURRENT_EXAM) == 12
+    assert db.execute(select(GradeRecordArchive.exam_id).distinct()).scalars().all() == [OLD_EXAM]
+
+    for (exam_id, student_id), records in before.items():
+        assert len(records) == 4
+        after = grade_history(db, exam_id, student_id)
+        archived = exam_id == OLD_EXAM
+        assert [record["archived"] for record in after] == [archived] * len(records)
+        # 除 archived 标记外逐字段一致，顺序不变
+        assert [{**record, "archived": False} for record in after] == records
+
+    # 按题目过滤同样适用于归档数据
+    assert [r["question_id"] for r in grade_history(db, OLD_EXAM, 1, question_id=12)] == [12, 12]
+
+def test_archive_is_idempotent(db):
+    archive_grade_records(db, after_days=365)
+    assert archive_grade_records(db, after_days=365) == [
+        {"exam_id": OLD_EXAM, "students": 0, "records": 0, "raw_bytes": 0, "archived_bytes": 0}
+    ]
+    assert db.execute(select(func.count(GradeRecordArchive.id))).scalar() == len(STUDENTS)
@@ -0,0 +1,81 @@
+"""
+批量录入阅卷成绩测试：upsert 的新建数、改分数与评分记录
+
+使用临时 SQLite 数据库，考试未发布（不触发后台重新发布）。
+
+运行: pytest test_grade_ingest.py
+"""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import migrations
+from models import Answer, Exam, GradeRecord, Question, Student, Subject
+from services.grade_ingest import GradeIngestError, _upsert_statement, ingest_grades
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    migrations.upgrade(engine)
+    with Session(engine) as session:
+        session.add(Exam(id=1, name="期中考试"))
+        session.add(Subject(id=1, exam_id=1, name="数学"))
+        session.add_all([Question(id=q, subject_id=1, question_code=q, full_score=Decimal("10")) for q in (1, 2)])
+        session.add_all([Student(id=s, student_code=f"S{s}", name=f"学生{s}", cclass=1) for s in (1, 2, 3)])
+        session.add(Answer(student_id=1, question_id=1, question_code=1, final_score=Decimal("4"), final_comment="步骤不全"))
+        session.commit()
+        yield session
+    engine.dispose()
+
+def item(student_id, question_id, score, **extra):
+    return {"student_id": student_id, "question_id": question_id, "final_score": score, **extra}
+
+def answers(db):
+    return {(a.student_id, a.question_id): a for a in db.query(Answer).populate_existing()}
+
+def test_ingest_counts_inserted_and_changed(db):
+    items = [item(1, 1, 4), item(1, 2, 7), item(2, 1, 10), item(2, 2, 0), item(3, 1, 5.5)]
+    result = ingest_grades(db, 1, items, chunk_size=2)
+    assert result["rows"] == 5
+    assert [(b["batch"], b["rows"], b["inserted"], b["changed"]) for b in result["batches"]] == [
+        (1, 2, 1, 1),    # (1, 1) 已存在且得分未变，(1, 2) 新建
+        (2, 2, 2, 2),
+        (3, 1, 1, 1),
+    ]
+    stored = answers(db)
+    assert len(stored) == 5
+    assert stored[(3, 1)].final_score == Decimal("5.5")
+    assert stored[(1, 2)].question_code == 2
+    assert db.query(GradeRecord).count() == 5
+
+def test_reingest_updates_scores_and_keeps_comment(db):
+    ingest_grades(db, 1, [item(1, 1, 4), item(2, 1, 6)])
+    result = ingest_grades(db, 1, [item(1, 1, 9), item(2, 1, 6, final_comment="满分思路")])
+    assert [(b["inserted"], b["changed"]) for b in result["batches"]] == [(0, 1)]
+    stored = answers(db)
+    assert stored[(1, 1)].final_score == Decimal("9")
+    # 新评语为空时保留原评语
+    assert stored[(1, 1)].final_comment == "步骤不全"
+    assert stored[(2, 1)].final_comment == "满分思路"
+    assert db.query(GradeRecord).filter(GradeRecord.answer_id == stored[(1, 1)].id).count() == 2
+
+def test_ingest_bumps_version_of_exam_being_graded(db):
+    before = db.get(Exam, 1).publish_version or 0
+    ingest_grades(db, 1, [item(1, 1, 5), item(1, 2, 5), item(2, 1, 5)], chunk_size=2)
+    db.expire_all()
+    assert db.get(Exam, 1).publish_version == before + 2
+
+def test_invalid_rows_reject_whole_request(db):
+    with pytest.raises(GradeIngestError) as excinfo:
+        ingest_grades(db, 1, [item(1, 1, 5), item(1, 9, 5), item(9, 1, 5), item(2, 1, 11), item(1, 1, 6)])
+    assert [e["index"] for e in excinfo.value.errors] == [1, 2, 3, 4]
+    assert "重复" in excinfo.value.errors[-1]["message"]
+    assert answers(db)[(1, 1)].final_score == Decimal("4")
+    assert db.query(GradeRecord).count() == 0
+
+def test_unsupported_dialect_is_rejected(db, monkeypatch):
+    monkeypatch.setattr(db.get_bind().dialect, "name", "oracle")
+    with pytest.raises(ValueError, match="oracle"):
+        _upsert_statement(db, [item(1, 1, 5)])
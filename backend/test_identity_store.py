@@ -0,0 +1,70 @@
+"""
+登录身份缓存测试：重复登录不访问数据库，其他进程修改的密码在一个同步周期后生效
+
+使用临时 SQLite 数据库（aiosqlite），“其他进程”的修改直接用同步会话写库（不调用 forget）。
+
+运行: pytest test_identity_store.py
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+import identity_store
+import migrations
+from models import Credential
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    path = tmp_path / "identity.db"
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    with Session(engine) as db:
+        db.add(Credential(user_type="student", identity_id="S0001", user_id="1", name="学生1", password_hash="old"))
+        db.commit()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    identity_store.identity_cache.clear()
+    monkeypatch.setattr(identity_store, "_changes_checked_at", None)
+    queries = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    yield engine, async_sessionmaker(async_engine, expire_on_commit=False), queries
+    identity_store.identity_cache.clear()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def login(sessions, identity_id="S0001"):
+    async def main():
+        async with sessions() as db:
+            return await identity_store.get_login(db, "student", identity_id)
+    return asyncio.run(main())
+
+def change_password_elsewhere(engine, password_hash):
+    with Session(engine) as db:
+        db.execute(update(Credential).where(Credential.identity_id == "S0001")
+                   .values(password_hash=password_hash, updated_at=datetime.now(timezone.utc)))
+        db.commit()
+
+def test_repeated_login_is_served_from_cache(stores):
+    _, sessions, queries = stores
+    identity, password_hash = login(sessions)
+    assert (identity.user_id, identity.name, password_hash) == ("1", "学生1", "old")
+    assert len(queries) == 1
+    assert login(sessions) == (identity, password_hash)
+    assert len(queries) == 1
+    assert login(sessions, "S9999") is None
+
+def test_password_change_in_another_process_expires_cache(stores, monkeypatch):
+    engine, sessions, queries = stores
+    login(sessions)
+    change_password_elsewhere(engine, "new")
+    # 同步周期内仍使用缓存
+    assert login(sessions)[1] == "old"
+    # 下一个同步周期按 updated_at 发现修改，重新读取该账号
+    monkeypatch.setattr(identity_store, "_changes_checked_at",
+                        identity_store._changes_checked_at - timedelta(seconds=60))
+    assert login(sessions)[1] == "new"
+    assert login(sessions)[1] == "new"
+    assert len(queries) == 3
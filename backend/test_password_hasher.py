@@ -0,0 +1,47 @@
+"""
+密码线程池测试：线程和队列都占满时立即返回 503，任务结束后名额释放
+
+用 threading.Event 阻塞的任务代替 bcrypt，避免测试依赖计算耗时。
+
+运行: pytest test_password_hasher.py
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import PasswordHasher, verify_password_async
+
+def test_full_queue_returns_503():
+    async def scenario():
+        hasher = PasswordHasher(workers=1, max_queue=1)
+        release = threading.Event()
+        # 一个任务在线程中运行，一个在队列中等待
+        running = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert hasher.stats()["in_flight"] == 2
+        assert hasher.stats()["queued"] == 1
+
+        with pytest.raises(HTTPException) as error:
+            await hasher.run(release.wait)
+        assert error.value.status_code == 503
+        assert error.value.headers == {"Retry-After": "1"}
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        # 名额释放后可以再次提交
+        assert await hasher.run(sum, [1, 2]) == 3
+        return hasher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats == {"workers": 1, "capacity": 2, "in_flight": 0, "queued": 0, "completed": 3, "rejected": 1}
+
+def test_verify_password_async_uses_pool(monkeypatch):
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    hashed = auth.get_password_hash("secret")
+    assert asyncio.run(verify_password_async("secret", hashed))
+    assert not asyncio.run(verify_password_async("wrong", hashed))
+    assert hasher.stats()["completed"] == 2
@@ -0,0 +1,56 @@
+"""
+连接池监控测试：借出次数、溢出连接、借出超时与快照输出
+
+使用临时 SQLite 文件（文件库才会使用 InstrumentedQueuePool）。
+
+运行: pytest test_pool_metrics.py
+"""
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from config import settings
+from pool_metrics import InstrumentedQueuePool, configure_engine, pool_options, pool_snapshot
+
+@pytest.fixture
+def engine(tmp_path):
+    pool_settings = settings.model_copy(update={
+        "db_pool_size": 1, "db_max_overflow": 1, "db_pool_timeout": 0.1, "db_pool_pre_ping": "never",
+    })
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = configure_engine(create_engine(url, **pool_options(url, pool_settings)), pool_settings)
+    yield engine
+    engine.dispose()
+
+def test_checkouts_and_overflow_are_counted(engine):
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    with engine.connect() as first:
+        first.execute(text("select 1"))
+        snapshot = pool_snapshot(engine.pool)
+        assert (snapshot["checkouts"], snapshot["in_use"], snapshot["overflow_events"]) == (1, 1, 0)
+        # 常驻连接已借出，第二个连接是溢出连接
+        with engine.connect() as second:
+            second.execute(text("select 1"))
+            snapshot = pool_snapshot(engine.pool)
+            assert (snapshot["checkouts"], snapshot["in_use"], snapshot["overflow"]) == (2, 2, 1)
+            assert snapshot["overflow_events"] == 1
+            # 常驻与溢出都已用尽，第三个借出等待 pool_timeout 后超时
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+    snapshot = pool_snapshot(engine.pool)
+    assert snapshot["timeouts"] == 1
+    assert snapshot["in_use"] == 0
+
+    # 归还后复用常驻连接，不再计为溢出
+    with engine.connect():
+        pass
+    snapshot = pool_snapshot(engine.pool)
+    assert (snapshot["checkouts"], snapshot["overflow_events"]) == (3, 1)
+    histogram = snapshot["wait_ms_histogram"]
+    assert histogram[-1] == {"le": "+Inf", "count": 3}
+    assert [bucket["count"] for bucket in histogram] == sorted(bucket["count"] for bucket in histogram)
+
+def test_memory_sqlite_keeps_default_pool():
+    options = pool_options("sqlite://", settings)
+    assert "poolclass" not in options
+    with pytest.raises(ValueError):
+        pool_options("sqlite://", settings.model_copy(update={"db_pool_pre_ping": "sometimes"}))
@@ -0,0 +1,89 @@
+"""
+SQL 执行监控测试：请求内的语句计数、N+1 告警与慢查询日志
+
+每个用例在独立的 contextvars 上下文中运行，模拟一个请求。
+
+运行: pytest test_query_metrics.py
+"""
+import contextvars
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import query_metrics
+from config import settings
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("create table item (id integer primary key, name text)"))
+        connection.execute(text("insert into item (id, name) values (1, 'a'), (2, 'b'), (3, 'c')"))
+    yield engine
+    engine.dispose()
+
+def in_request(fn):
+    """在新的上下文中开始一个请求并执行 fn，返回该请求的统计"""
+    def run():
+        stats = query_metrics.start_request("/test")
+        fn()
+        return stats
+    return contextvars.copy_context().run(run)
+
+def log_records(caplog, name):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == name]
+
+def test_repeated_statement_is_reported_once(engine, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "n_plus_one_threshold", 3)
+    caplog.set_level(logging.WARNING)
+
+    def n_plus_one():
+        with engine.connect() as connection:
+            ids = connection.execute(text("select id from item")).scalars().all()
+            for item_id in ids + ids:
+                connection.execute(text("select name from item where id = :id"), {"id": item_id})
+
+    stats = in_request(n_plus_one)
+    assert stats.count == 7
+    repeated = "select name from item where id = ?"
+    assert stats.repeated == {repeated: 6}
+    # 达到阈值时只告警一次
+    assert log_records(caplog, "sql.n_plus_one") == [
+        {"event": "repeated_query", "count": 3, "statement": repeated, "path": "/test"}
+    ]
+
+def test_distinct_statements_are_not_flagged(engine, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "n_plus_one_threshold", 3)
+    caplog.set_level(logging.WARNING)
+
+    def batched():
+        with engine.connect() as connection:
+            connection.execute(text("select id from item")).all()
+            connection.execute(text("select name from item where id in (1, 2, 3)")).all()
+
+    stats = in_request(batched)
+    assert stats.count == 2
+    assert stats.repeated == {}
+    assert log_records(caplog, "sql.n_plus_one") == []
+
+def test_slow_queries_are_logged_without_parameters(engine, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_ms", 0)
+    caplog.set_level(logging.WARNING)
+
+    def lookup():
+        with engine.connect() as connection:
+            connection.execute(text("select name from item where id = :id"), {"id": 2}).all()
+
+    in_request(lookup)
+    records = log_records(caplog, "sql.slow")
+    assert len(records) == 1
+    assert records[0]["statement"] == "select name from item where id = ?"
+    assert records[0]["path"] == "/test"
+    assert "parameters" not in records[0]
+
+def test_queries_outside_requests_are_not_counted(engine):
+    with engine.connect() as connection:
+        connection.execute(text("select 1"))
+    assert query_metrics.current_stats() is None
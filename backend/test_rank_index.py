@@ -0,0 +1,41 @@
+"""
+排名索引（树状数组）测试：与直接对分数列表计数的结果比较
+
+运行: pytest test_rank_index.py
+"""
+import random
+from decimal import Decimal
+
+from services.rank_index import RankIndex
+
+def brute_rank(scores, score):
+    return sum(1 for s in scores if s > score) + 1
+
+def brute_beat_percent(scores, score):
+    return round(sum(1 for s in scores if s < score) / len(scores) * 100, 1) if scores else 0.0
+
+def test_rank_with_ties():
+    index = RankIndex([Decimal(s) for s in (90, 80, 80, 70, 60)])
+    assert index.size == 5
+    assert [index.rank(Decimal(s)) for s in (90, 80, 70, 60)] == [1, 2, 4, 5]
+    assert index.count_less(Decimal(80)) == 2
+    assert index.count_greater(Decimal(80)) == 1
+    assert index.beat_percent(Decimal(70)) == 20.0
+
+def test_rank_of_score_not_in_cohort():
+    index = RankIndex([Decimal(s) for s in (90, 80, 70)])
+    assert index.rank(Decimal(100)) == 1
+    assert index.rank(Decimal(85)) == 2
+    assert index.rank(Decimal(0)) == 4
+    assert RankIndex([]).beat_percent(Decimal(50)) == 0.0
+
+def test_random_cohorts_match_brute_force():
+    rng = random.Random(3)
+    for size in (1, 7, 200):
+        scores = [Decimal(rng.randint(0, 60)) / 2 for _ in range(size)]
+        index = RankIndex(scores)
+        assert index.size == len(scores)
+        for _ in range(100):
+            probe = Decimal(rng.randint(-2, 82)) / 2
+            assert index.rank(probe) == brute_rank(scores, probe)
+            assert index.beat_percent(probe) == brute_beat_percent(scores, probe)
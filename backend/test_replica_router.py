@@ -0,0 +1,118 @@
+"""
+只读副本路由测试：用一对 SQLite 文件分别作为主库和副本
+
+GET 接口在副本追上主库时读副本，写入走主库；发布后副本的考试版本号落后于主库的这段时间内
+读请求回退到主库，副本同步（版本号追上）后恢复读副本。
+
+运行: pytest test_replica_router.py
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+import database
+import migrations
+from database import ReplicaRouter, get_async_db, get_async_read_db
+from models import Exam
+from services import page_cache
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name in ("primary", "replica"):
+        path = str(tmp_path / f"{name}.db")
+        engine = create_engine(f"sqlite:///{path}")
+        migrations.upgrade(engine)
+        with Session(engine) as db:
+            db.add_all([Exam(id=1, name="期中", publish_version=1), Exam(id=2, name="期末", publish_version=1)])
+            db.commit()
+        engine.dispose()
+        paths[name] = path
+    return paths
+
+@pytest.fixture
+def router(files, monkeypatch):
+    engines = {name: create_async_engine(f"sqlite+aiosqlite:///{path}") for name, path in files.items()}
+    primary = async_sessionmaker(engines["primary"], expire_on_commit=False)
+    replica = async_sessionmaker(engines["replica"], expire_on_commit=False)
+    # 版本号缓存足够长，测试中由 note_write 和手动过期控制何时重新读取
+    test_router = ReplicaRouter(primary, [replica], version_check_seconds=60)
+    monkeypatch.setattr(database, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(database, "replica_router", test_router)
+    monkeypatch.setattr(page_cache, "replica_router", test_router)
+    yield test_router
+    for engine in engines.values():
+        asyncio.run(engine.dispose())
+
+@pytest.fixture
+def client(router):
+    app = FastAPI()
+
+    def source(db: AsyncSession) -> str:
+        return os.path.basename(db.bind.url.database).split(".")[0]
+
+    @app.get("/exams/{exam_id}/source")
+    async def exam_source(db: AsyncSession = Depends(get_async_read_db)):
+        return source(db)
+
+    @app.get("/trend/source")
+    async def trend_source(db: AsyncSession = Depends(get_async_read_db)):
+        return source(db)
+
+    @app.post("/exams/{exam_id}/publish")
+    async def publish(exam_id: int, db: AsyncSession = Depends(get_async_db)):
+        await db.execute(update(Exam).where(Exam.id == exam_id).values(publish_version=Exam.publish_version + 1))
+        await db.commit()
+        # 与发布流水线提交后相同：通知路由重新读取主库版本号
+        page_cache.mark_exam_changed({exam_id})
+        return source(db)
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+def replicate(files, exam_id, version):
+    engine = create_engine(f"sqlite:///{files['replica']}")
+    with Session(engine) as db:
+        db.execute(update(Exam).where(Exam.id == exam_id).values(publish_version=version))
+        db.commit()
+    engine.dispose()
+
+def expire_versions(router):
+    for versions in router._versions.values():
+        versions.clear()
+
+def test_reads_use_replica_and_writes_use_primary(client, router):
+    assert client.get("/exams/1/source").json() == "replica"
+    assert client.get("/trend/source").json() == "replica"
+    assert client.post("/exams/1/publish").json() == "primary"
+    assert (router.replica_reads, router.primary_reads) == (2, 0)
+
+def test_reads_fall_back_to_primary_until_replica_catches_up(client, router, files):
+    assert client.get("/exams/1/source").json() == "replica"
+    client.post("/exams/1/publish")
+
+    # 副本尚未同步：该考试和跨考试的读请求都回退到主库，其他考试不受影响
+    assert client.get("/exams/1/source").json() == "primary"
+    assert client.get("/trend/source").json() == "primary"
+    assert client.get("/exams/2/source").json() == "replica"
+
+    # 副本同步后，缓存的副本版本号过期即恢复读副本
+    replicate(files, 1, 2)
+    assert client.get("/exams/1/source").json() == "primary"
+    expire_versions(router)
+    assert client.get("/exams/1/source").json() == "replica"
+    assert client.get("/trend/source").json() == "replica"
+
+def test_without_replicas_reads_use_primary(files):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{files['primary']}")
+    primary = async_sessionmaker(engine)
+    router = ReplicaRouter(primary, [], version_check_seconds=1)
+    assert asyncio.run(router.session_maker(1)) is primary
+    assert router.primary_reads == 1
+    asyncio.run(engine.dispose())
@@ -0,0 +1,245 @@
+"""
+数据访问层与各接口的查询次数测试
+
+使用临时 SQLite 数据库（不依赖运行中的服务），对每个接口统计一次请求发出的 SQL 条数，
+并在两种数据规模下比较：查询次数不随题目数、学生数增长，说明没有 N+1。
+
+运行: pytest test_repositories.py
+"""
+import random
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+import migrations
+import repositories
+from auth import get_current_student, get_current_teacher
+from database import get_async_read_db
+from models import (Answer, Exam, ExamScoreTotal, KnowledgePoint, Question, Student, Subject,
+                    question_knowledge)
+from routers import student, teacher
+from services.cohort_stats import cohort_stats
+from services.exam_versions import exam_versions
+from services.page_cache import mark_exam_changed, page_cache
+from services.publish import publish_exam
+from services.rank_index import GRADE_SCOPE, rank_indexes
+
+SMALL = dict(classes=2, students=5, subjects=2, questions=3)
+LARGE = dict(classes=3, students=12, subjects=4, questions=8)
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def measure(self, fn):
+        before = self.count
+        result = fn()
+        return self.count - before, result
+
+def seed(db: Session, classes: int, students: int, subjects: int, questions: int) -> None:
+    random.seed(7)
+    db.add(Exam(id=1, name="期末考试", intro="期末"))
+    point = KnowledgePoint(id=1, subject_name="科目0", name="函数")
+    db.add(point)
+    question_id = 1
+    for s in range(subjects):
+        db.add(Subject(id=s + 1, exam_id=1, name=f"科目{s}"))
+        for code in range(1, questions + 1):
+            db.add(Question(id=question_id, subject_id=s + 1, question_code=code,
+                            full_score=Decimal("10"), question_type="解答题"))
+            question_id += 1
+    db.flush()
+    db.execute(question_knowledge.insert(), [
+        {"question_id": q, "knowledge_point_id": 1, "weight": 1} for q in range(1, question_id)
+    ])
+    student_id = 1
+    for c in range(1, classes + 1):
+        for _ in range(students):
+            db.add(Student(id=student_id, student_code=f"S{student_id:04d}", name=f"学生{student_id}", cclass=c))
+            for q in range(1, question_id):
+                db.add(Answer(student_id=student_id, question_id=q,
+                              final_score=Decimal(random.choice([0, 4, 7, 10]))))
+            student_id += 1
+    db.commit()
+
+@pytest.fixture(params=[SMALL, LARGE], ids=["small", "large"])
+def exam_db(request, tmp_path):
+    """建库、灌数据、发布考试，返回 (同步引擎, 异步引擎, 数据规模)"""
+    path = tmp_path / "exam.db"
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    with Session(engine) as db:
+        seed(db, **request.param)
+        publish_exam(db, db.get(Exam, 1))
+        db.commit()
+    # 清空进程内的索引与缓存，让每个用例从冷启动开始
+    mark_exam_changed({1})
+    page_cache.clear()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield engine, async_engine, request.param
+    mark_exam_changed({1})
+    page_cache.clear()
+    engine.dispose()
+
+@pytest.fixture
+def client(exam_db):
+    _, async_engine, _ = exam_db
+    sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def read_db():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(student.router)
+    app.include_router(teacher.router)
+    app.dependency_overrides[get_async_read_db] = read_db
+    app.dependency_overrides[get_current_student] = lambda: {"user_id": "1", "user_type": "student"}
+    app.dependency_overrides[get_current_teacher] = lambda: {"user_id": "t1", "user_type": "teacher"}
+    counter = QueryCounter(async_engine.sync_engine)
+    with TestClient(app) as test_client:
+        yield test_client, counter
+
+# ==================== 加载方案 ====================
+
+def test_exam_report_profile_loads_tree_in_fixed_queries(exam_db):
+    engine, _, size = exam_db
+    counter = QueryCounter(engine)
+    with Session(engine) as db:
+        count, exam = counter.measure(lambda: repositories.get_exam(db, 1, "exam_report"))
+        # 考试、科目、题目、知识点各一条
+        assert count == 4
+        walked, points = counter.measure(lambda: [
+            point.name
+            for subject in exam.subjects
+            for question in subject.questions
+            for point in question.knowledge_points
+        ])
+        assert walked == 0
+        assert len(points) == size["subjects"] * size["questions"]
+
+def test_answer_sheet_profile_is_one_join(exam_db):
+    engine, _, size = exam_db
+    counter = QueryCounter(engine)
+    with Session(engine) as db:
+        count, answers = counter.measure(lambda: repositories.student_answers(db, 1, 1))
+        assert count == 1
+        walked, labels = counter.measure(lambda: [
+            f"{answer.question.subject.name}{answer.question.question_code}" for answer in answers
+        ])
+        assert walked == 0
+        assert len(labels) == size["subjects"] * size["questions"]
+
+def test_undeclared_relationship_raises(exam_db):
+    engine, _, _ = exam_db
+    with Session(engine) as db:
+        answer = repositories.student_answers(db, 1, 1)[0]
+        with pytest.raises(InvalidRequestError):
+            answer.student
+
+def test_class_roster(exam_db):
+    engine, _, size = exam_db
+    counter = QueryCounter(engine)
+    with Session(engine) as db:
+        count, roster = counter.measure(lambda: repositories.class_roster(db, 1))
+        assert count == 1
+        assert len(roster) == size["students"]
+
+# ==================== 接口查询次数 ====================
+
+# 冷启动下每个接口的查询次数，与数据规模无关
+ENDPOINT_QUERIES = [
+    ("GET", "/student/exams/1/scores", None, 2),
+    ("GET", "/student/exams/1/level-position?mode=class", None, 2),
+    ("GET", "/student/exams/1/pk-analysis", None, 2),
+    ("GET", "/student/exams/1/bias-analysis", None, 2),
+    ("GET", "/student/exams/1/loss-analysis", None, 2),
+    ("GET", "/student/exams/1/knowledge-analysis", None, 2),
+    ("GET", "/student/exams/1/question-analysis?subject=科目0", None, 4),
+    ("POST", "/student/exams/1/ideal-ranking", {"ideal_scores": [{"subject": "科目0", "ideal_score": 30}]}, 4),
+    ("GET", "/student/trend-analysis?mode=class", None, 1),
+    # 群体统计按考试版本号缓存，首次读取时多一次版本号查询
+    ("GET", "/teacher/classes/1/scores?examId=1", None, 5),
+]
+
+@pytest.mark.parametrize("method,url,body,expected", ENDPOINT_QUERIES,
+                         ids=[url for _, url, _, _ in ENDPOINT_QUERIES])
+def test_endpoint_query_count(client, method, url, body, expected):
+    test_client, counter = client
+    count, response = counter.measure(lambda: test_client.request(method, url, json=body))
+    assert response.status_code == 200, response.text
+    assert count == expected
+
+def test_cached_page_needs_no_queries(client):
+    test_client, counter = client
+    test_client.get("/student/exams/1/question-analysis?subject=科目1")
+    count, response = counter.measure(lambda: test_client.get("/student/exams/1/question-analysis?subject=科目1"))
+    assert response.status_code == 200
+    assert count == 0
+
+def test_what_if_requests_stay_out_of_page_cache(client):
+    test_client, _ = client
+    for score in range(20):
+        body = {"ideal_scores": [{"subject": "科目0", "ideal_score": score}]}
+        assert test_client.post("/student/exams/1/ideal-ranking", json=body).status_code == 200
+    assert len(page_cache._entries) == 0
+
+def test_pk_analysis_accepts_class_ids(client, exam_db):
+    test_client, _ = client
+    _, _, size = exam_db
+    own = test_client.get("/student/exams/1/pk-analysis").json()
+    assert own["class_total_students"] == size["students"]
+    assert test_client.get("/student/exams/1/pk-analysis?class_id=class_001").json() == own
+    assert test_client.get("/student/exams/1/pk-analysis?class_id=1").json() == own
+    assert test_client.get("/student/exams/1/pk-analysis?class_id=class_x").status_code == 400
+
+def test_class_scores_require_teacher_class(client):
+    test_client, counter = client
+    # 班级 9 不在该教师所教班级中，即使考试已定稿也不能读取成绩立方体
+    count, response = counter.measure(lambda: test_client.get("/teacher/classes/9/scores?examId=1"))
+    assert response.status_code == 403
+    assert count == 0
+    assert test_client.get("/teacher/classes/class_001/scores?examId=1").status_code == 200
+
+def test_unpublished_exam_never_returns_demo_scores(client):
+    test_client, _ = client
+    # 考试 2 没有成绩立方体（未定稿）：真实考试号不能回退到演示数据
+    for url in ("/student/exams/2/scores", "/student/exams/2/level-position?mode=class",
+                "/student/exams/2/loss-analysis", "/teacher/classes/1/scores?examId=2"):
+        response = test_client.get(url)
+        assert response.status_code == 404, url
+        assert response.json()["detail"] == "成绩未发布"
+    assert test_client.post("/student/exams/2/ideal-ranking", json={"ideal_scores": []}).status_code == 404
+    # 演示考试号仍返回演示数据
+    assert test_client.get("/student/exams/exam_001/scores").json()["total_score"] == 532.0
+
+def test_registries_follow_exam_version(exam_db):
+    engine, _, _ = exam_db
+    with Session(engine) as db:
+        old_index = rank_indexes.get(db, 1, None, GRADE_SCOPE)
+        old_stats = cohort_stats.get(db, 1)
+        assert rank_indexes.get(db, 1, None, GRADE_SCOPE) is old_index
+
+        # 模拟其他 worker 重新发布：立方体变化、版本号加一，本进程只通过版本号同步感知
+        db.execute(update(ExamScoreTotal).where(ExamScoreTotal.exam_id == 1, ExamScoreTotal.student_id == 1)
+                   .values(total_score=Decimal("999")))
+        db.execute(update(Exam).where(Exam.id == 1).values(publish_version=Exam.publish_version + 1))
+        db.commit()
+        assert rank_indexes.get(db, 1, None, GRADE_SCOPE) is old_index
+        exam_versions.forget(1)
+
+        new_index = rank_indexes.get(db, 1, None, GRADE_SCOPE)
+        assert new_index is not old_index
+        assert new_index.count_greater(Decimal("999")) == 0
+        assert cohort_stats.get(db, 1).get(("grade", None), None)["max"] == 999
+        assert cohort_stats.get(db, 1) is not old_stats
@@ -0,0 +1,93 @@
+"""
+成绩表导入测试：CSV / XLSX 解析、出错行的行号与原因、dry_run
+
+运行: pytest test_score_import.py
+"""
+import io
+from decimal import Decimal
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import migrations
+from models import Answer, Exam, Question, Student, Subject
+from services.score_import import ScoreImportError, file_format, import_score_sheet, iter_csv_rows, iter_xlsx_rows
+
+HEADER = ["考号", "科目", "题号", "得分", "评语"]
+ROWS = [
+    ["S1", "数学", 1, 8, "思路正确"],
+    ["S2", "数学", 2, 10, ""],
+    ["S9", "数学", 1, 5, ""],      # 考号不存在
+    ["S1", "语文", 1, 5, ""],      # 科目不属于本场考试
+    ["S2", "数学", 1, "缺考", ""],  # 得分不是数字
+    ["", "", "", "", ""],          # 空行跳过，不计入读取行数
+    ["S3", "数学", 2, 12, ""],     # 超出满分
+    ["S3", "数学", 1, 6.5, ""],
+]
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    migrations.upgrade(engine)
+    with Session(engine) as session:
+        session.add(Exam(id=1, name="期中考试"))
+        session.add(Subject(id=1, exam_id=1, name="数学"))
+        session.add_all([Question(id=q, subject_id=1, question_code=q, full_score=Decimal("10")) for q in (1, 2)])
+        session.add_all([Student(id=s, student_code=f"S{s}", name=f"学生{s}", cclass=1) for s in (1, 2, 3)])
+        session.commit()
+        yield session
+    engine.dispose()
+
+def csv_stream(rows):
+    text = "\n".join(",".join(str(cell) for cell in row) for row in rows)
+    return io.BytesIO(("\ufeff" + text + "\n").encode("utf-8"))
+
+def check_result(db, result):
+    assert (result["rows"], result["imported"], result["rejected"]) == (7, 3, 4)
+    assert result["errors"] == [
+        {"row": 4, "message": "考号 S9 不存在"},
+        {"row": 5, "message": "本场考试没有 语文 第 1 题"},
+        {"row": 6, "message": "得分 缺考 不是数字"},
+        {"row": 8, "message": "得分 12 超出 [0, 10.00]"},
+    ]
+    stored = {(a.student_id, a.question_id): a for a in db.query(Answer)}
+    assert set(stored) == {(1, 1), (2, 2), (3, 1)}
+    assert stored[(1, 1)].final_comment == "思路正确"
+    assert stored[(3, 1)].final_score == Decimal("6.5")
+
+def test_csv_import_reports_rejected_rows(db):
+    result = import_score_sheet(db, 1, iter_csv_rows(csv_stream([HEADER] + ROWS)), chunk_size=2)
+    check_result(db, result)
+    assert [b["rows"] for b in result["batches"]] == [2, 1]
+
+def test_dry_run_writes_nothing(db):
+    result = import_score_sheet(db, 1, iter_csv_rows(csv_stream([HEADER] + ROWS)), dry_run=True)
+    assert (result["imported"], result["rejected"], result["batches"]) == (3, 4, [])
+    assert db.query(Answer).count() == 0
+
+def test_english_header_and_missing_column(db):
+    header = ["student_code", "subject", "question_code", "score"]
+    result = import_score_sheet(db, 1, iter_csv_rows(csv_stream([header, ["S1", "数学", 2, 3]])))
+    assert (result["imported"], result["rejected"]) == (1, 0)
+    with pytest.raises(ScoreImportError, match="缺少必需的列: score"):
+        import_score_sheet(db, 1, iter_csv_rows(csv_stream([["考号", "科目", "题号"]])))
+    with pytest.raises(ScoreImportError, match="文件为空"):
+        import_score_sheet(db, 1, iter([]))
+
+def test_file_format():
+    assert file_format("成绩.CSV") == "csv"
+    assert file_format("scores.xlsx") == "xlsx"
+    with pytest.raises(ScoreImportError):
+        file_format("scores.xls")
+
+def test_xlsx_import_reports_rejected_rows(db):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in [HEADER] + ROWS:
+        sheet.append([None if cell == "" else cell for cell in row])
+    stream = io.BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+    check_result(db, import_score_sheet(db, 1, iter_xlsx_rows(stream)))
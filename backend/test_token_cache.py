@@ -0,0 +1,61 @@
+"""
+令牌验签缓存测试：同一令牌只验签一次，缓存条目在令牌的 exp 时刻失效
+
+运行: pytest test_token_cache.py
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+from auth import create_access_token, verify_token
+from config import settings
+from ttl_cache import TTLCache
+
+CLAIMS = {"user_id": "1", "user_type": "student", "identity_id": "S0001"}
+
+@pytest.fixture
+def cache(monkeypatch):
+    test_cache = TTLCache(16)
+    monkeypatch.setattr(auth, "token_cache", test_cache)
+    return test_cache
+
+def cache_key(token):
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+def test_token_is_verified_once(cache, monkeypatch):
+    token = create_access_token(CLAIMS)
+    payload = verify_token(token)
+    assert cache._entries[cache_key(token)][0] == payload["exp"]
+
+    # 命中缓存时不再调用 jwt.decode
+    def fail(*args, **kwargs):
+        raise AssertionError("cached token was decoded again")
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert verify_token(token) == payload
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_cached_token_expires_at_exp(cache):
+    token = create_access_token(CLAIMS, expires_delta=timedelta(seconds=1))
+    exp = verify_token(token)["exp"]
+    assert verify_token(token)["exp"] == exp
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 到了 exp 缓存即失效，不等条目被淘汰
+    time.sleep(max(exp - time.time(), 0) + 0.05)
+    assert cache.get(cache_key(token)) is None
+    # jose 以整秒比较 exp，过期后的下一秒重新验签被拒
+    time.sleep(max(exp + 1 - time.time(), 0) + 0.05)
+    with pytest.raises(HTTPException) as error:
+        verify_token(token)
+    assert error.value.status_code == 401
+    assert cache_key(token) not in cache._entries
+
+def test_token_without_exp_is_not_cached(cache):
+    token = jwt.encode(CLAIMS, settings.secret_key, algorithm=settings.algorithm)
+    assert verify_token(token) == CLAIMS
+    assert cache._entries == {}
@@ -0,0 +1,106 @@
+"""
+刷新令牌轮换测试：一次有效、重复使用吊销整个令牌族、退出登录
+
+使用临时 SQLite 数据库（aiosqlite），刷新接口通过覆盖 get_async_db 依赖接到临时库。
+
+运行: pytest test_token_store.py
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import migrations
+import token_store
+from auth import create_refresh_token, decode_refresh_token, verify_token
+from config import settings
+from database import get_async_db
+from models import RevokedToken
+from routers import auth as auth_router
+
+CLAIMS = {"user_id": "1", "user_type": "student", "identity_id": "S0001"}
+
+@pytest.fixture
+def sessions(tmp_path):
+    path = tmp_path / "tokens.db"
+    migrations.upgrade(create_engine(f"sqlite:///{path}"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def client(sessions):
+    async def db():
+        async with sessions() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(auth_router.router)
+    app.dependency_overrides[get_async_db] = db
+    with TestClient(app) as test_client:
+        yield test_client
+
+def run(sessions, fn, *args):
+    async def main():
+        async with sessions() as db:
+            return await fn(db, *args)
+    return asyncio.run(main())
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refreshToken": token})
+
+def test_refresh_token_is_single_use(sessions):
+    first = decode_refresh_token(create_refresh_token(CLAIMS))
+    run(sessions, token_store.consume, first)
+    with pytest.raises(token_store.TokenRevoked, match="已被使用"):
+        run(sessions, token_store.consume, first)
+
+def test_reuse_revokes_whole_family(sessions):
+    first = decode_refresh_token(create_refresh_token(CLAIMS))
+    second = decode_refresh_token(create_refresh_token(CLAIMS, family=first["fam"]))
+    other = decode_refresh_token(create_refresh_token(CLAIMS))
+    run(sessions, token_store.consume, first)
+    with pytest.raises(token_store.TokenRevoked):
+        run(sessions, token_store.consume, first)
+    # 同族尚未使用过的令牌也随之失效，其他设备的令牌族不受影响
+    with pytest.raises(token_store.TokenRevoked, match="登录已失效"):
+        run(sessions, token_store.consume, second)
+    run(sessions, token_store.consume, other)
+
+def test_family_revocation_outlives_replayed_token(sessions):
+    payload = decode_refresh_token(create_refresh_token(CLAIMS))
+    # 被重放的令牌即将过期，族内更新的令牌仍有完整有效期
+    payload["exp"] = int((datetime.now(timezone.utc) + timedelta(minutes=1)).timestamp())
+    run(sessions, token_store.revoke_family, payload)
+
+    async def expires_at(db):
+        return (await db.execute(select(RevokedToken.expires_at))).scalar_one()
+
+    stored = run(sessions, expires_at).replace(tzinfo=timezone.utc)
+    lifetime = timedelta(days=settings.refresh_token_expire_days)
+    assert stored >= datetime.now(timezone.utc) + lifetime - timedelta(minutes=5)
+
+def test_refresh_endpoint_rotates_and_detects_reuse(client):
+    first = create_refresh_token(CLAIMS)
+    response = refresh(client, first)
+    assert response.status_code == 200
+    body = response.json()
+    assert verify_token(body["token"])["user_id"] == "1"
+    second = body["refreshToken"]
+    assert decode_refresh_token(second)["fam"] == decode_refresh_token(first)["fam"]
+
+    # 旧令牌被重放：拒绝并吊销令牌族，刚换发的新令牌也不能再用
+    assert refresh(client, first).status_code == 401
+    response = refresh(client, second)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "登录已失效，请重新登录"
+
+def test_logout_revokes_family(client):
+    token = create_refresh_token(CLAIMS)
+    assert client.post("/auth/logout", json={"refreshToken": token}).status_code == 200
+    assert refresh(client, token).status_code == 401
+    assert refresh(client, "not-a-token").status_code == 401
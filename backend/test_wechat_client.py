@@ -0,0 +1,161 @@
+"""
+微信接口客户端测试：熔断器状态转换、重试与探测请求的结果记录
+
+用 httpx.MockTransport 代替真实的微信接口，不访问网络。
+
+运行: pytest test_wechat_client.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import wechat_client as wechat
+from config import settings
+from wechat_client import CircuitBreaker, WechatClient, WechatError, WechatUnavailable
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # 只替换 wechat_client 模块看到的 time，事件循环仍使用真实时钟
+    monkeypatch.setattr(wechat, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "wechat_max_retries", 2)
+    monkeypatch.setattr(settings, "wechat_retry_backoff_seconds", 0)
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    # 成功会清零计数，还差一次才熔断
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 1
+    assert not breaker.allow()
+
+def test_half_open_allows_one_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # 探测失败重新熔断并重新计时
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def run_client(handler, call):
+    """在新的事件循环中用 MockTransport 运行 call(client)，返回 (结果或异常, client)"""
+    client = WechatClient()
+
+    async def main():
+        client._client = httpx.AsyncClient(base_url="http://wechat.test", transport=httpx.MockTransport(handler))
+        client._loop = asyncio.get_running_loop()
+        try:
+            return await call(client)
+        except Exception as e:
+            return e
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main()), client
+
+def test_retries_then_counts_one_failure():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, text="busy") if len(calls) < 3 else httpx.Response(200, json={"errcode": -1})
+
+    result, client = run_client(handler, lambda c: c.get("/sns/jscode2session", {}))
+    assert isinstance(result, WechatUnavailable)
+    assert len(calls) == 3
+    assert (client.requests, client.retries, client.failures) == (3, 2, 1)
+
+def test_business_error_is_not_retried_or_counted():
+    result, client = run_client(
+        lambda request: httpx.Response(200, json={"errcode": 40029, "errmsg": "invalid code"}),
+        lambda c: c.jscode2session("invalid"),
+    )
+    assert isinstance(result, WechatError) and result.errcode == 40029
+    assert (client.requests, client.failures) == (1, 0)
+    assert client.breaker.state == "closed"
+
+def test_success_after_retry_returns_json():
+    responses = iter([httpx.Response(502), httpx.Response(200, json={"openid": "o1", "session_key": "k"})])
+    result, client = run_client(lambda request: next(responses), lambda c: c.jscode2session("code"))
+    assert result["openid"] == "o1"
+    assert client.retries == 1
+
+def open_breaker(client, clock):
+    for _ in range(client.breaker.failure_threshold):
+        client.breaker.record_failure()
+    clock.now += client.breaker.reset_seconds
+
+def test_unexpected_error_in_probe_reopens_breaker(clock):
+    def handler(request):
+        raise KeyError("boom")
+
+    async def call(client):
+        open_breaker(client, clock)
+        return await client.get("/sns/jscode2session", {})
+
+    result, client = run_client(handler, call)
+    assert isinstance(result, KeyError)
+    assert client.breaker.state == "open"
+    clock.now += client.breaker.reset_seconds
+    assert client.breaker.allow()
+
+def test_cancelled_probe_releases_slot(clock):
+    async def handler(request):
+        await asyncio.sleep(10)
+
+    async def call(client):
+        open_breaker(client, clock)
+        task = asyncio.create_task(client.get("/sns/jscode2session", {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return client.breaker.state
+
+    result, client = run_client(handler, call)
+    assert result == "half_open"
+    assert client.breaker.allow()
+
+def test_new_event_loop_closes_previous_client():
+    client = WechatClient()
+    old = asyncio.run(client._http())
+    new = asyncio.run(client._http())
+    assert new is not old
+    assert old.is_closed
+    asyncio.run(client.aclose())
@@ -0,0 +1,51 @@
+"""
+理想排名预测测试
+
+运行: pytest test_what_if.py
+"""
+from decimal import Decimal
+
+from models import ExamSubjectScore
+from services.rank_index import RankIndex
+from services.what_if import clamp_score, evaluate_scenarios
+
+# 本人当前总分 150（语文 70 + 数学 80），全年级总分如下
+COHORT = [Decimal(s) for s in (190, 180, 170, 150, 140, 120)]
+ROWS = [
+    ExamSubjectScore(subject_name="语文", score=Decimal("70"), full_score=Decimal("100")),
+    ExamSubjectScore(subject_name="数学", score=Decimal("80"), full_score=Decimal("100")),
+]
+
+def evaluate(*scenarios):
+    return evaluate_scenarios(RankIndex(COHORT), Decimal("150"), ROWS, list(scenarios))
+
+def test_clamp_score():
+    assert clamp_score(Decimal("120"), Decimal("100")) == Decimal("100")
+    assert clamp_score(Decimal("-5"), Decimal("100")) == Decimal("0")
+    assert clamp_score(Decimal("42.5"), Decimal("100")) == Decimal("42.5")
+
+def test_unchanged_scenario_keeps_rank():
+    [result] = evaluate({})
+    assert result["new_total_score"] == 150.0
+    assert result["current_rank"] == result["predicted_rank"] == 4
+    assert result["rank_change"] == 0
+
+def test_higher_score_passes_classmates():
+    [result] = evaluate({"数学": 105})
+    # 数学被限制在满分 100，新总分 170 与第三名并列
+    assert [s["ideal_score"] for s in result["subjects"]] == [70.0, 100.0]
+    assert result["new_total_score"] == 170.0
+    assert result["predicted_rank"] == 3
+    assert result["rank_change"] == 1
+
+def test_lower_score_excludes_own_current_total():
+    [result] = evaluate({"语文": 50})
+    # 本人原来的 150 分不再算作比自己高的人
+    assert result["new_total_score"] == 130.0
+    assert result["predicted_rank"] == 5
+    assert result["rank_change"] == -1
+
+def test_scenarios_are_evaluated_independently():
+    results = evaluate({"语文": 100, "数学": 100}, {"语文": 0})
+    assert [r["predicted_rank"] for r in results] == [1, 6]
+    assert all(r["current_rank"] == 4 for r in results)
@@ -0,0 +1,76 @@
+"""
+刷新令牌的吊销名单
+
+刷新令牌一次有效：每次刷新把旧令牌的 jti 写入 revoked_token，并换发同一令牌族（fam）的
+新令牌。jti 是 revoked_token 的主键，同一个刷新令牌被并发使用时只有一个请求能写入成功。
+已吊销的令牌再次出现说明令牌可能被盗用，此时吊销整个令牌族，该设备需要重新登录。
+退出登录同样吊销令牌族。
+
+jti / fam 以 UUID 的 16 字节存储（MySQL 为 BINARY(16)），按主键查找；行在令牌过期后失去
+意义，由定时任务清理：
+
+    python token_store.py purge
+"""
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import RevokedToken
+
+class TokenRevoked(Exception):
+    """刷新令牌已被使用或所在令牌族已被吊销"""
+
+def _token_id(hex_id: str) -> bytes:
+    return uuid.UUID(hex=hex_id).bytes
+
+def _expires_at(payload: Dict[str, Any]) -> datetime:
+    return datetime.fromtimestamp(payload["exp"], timezone.utc)
+
+async def revoke_family(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """吊销刷新令牌所在的整个令牌族"""
+    # 族内此后换发的令牌可能比当前令牌晚过期，吊销记录至少保留一个完整的刷新令牌有效期
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
+    try:
+        await db.execute(insert(RevokedToken).values(token_id=_token_id(payload["fam"]), expires_at=expires_at))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+
+async def consume(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """
+    使用一个已验签的刷新令牌：令牌族未吊销且该令牌未使用过时把它记为已使用，
+    否则抛出 TokenRevoked（重复使用时先吊销整个令牌族）。
+    """
+    jti, fam = _token_id(payload["jti"]), _token_id(payload["fam"])
+    revoked = set((await db.execute(
+        select(RevokedToken.token_id).where(RevokedToken.token_id.in_([jti, fam]))
+    )).scalars())
+    if fam in revoked:
+        raise TokenRevoked("登录已失效，请重新登录")
+    if jti not in revoked:
+        try:
+            await db.execute(insert(RevokedToken).values(token_id=jti, expires_at=_expires_at(payload)))
+            await db.commit()
+            return
+        except IntegrityError:
+            # 并发请求已经使用了同一个刷新令牌
+            await db.rollback()
+    await revoke_family(db, payload)
+    raise TokenRevoked("刷新令牌已被使用，请重新登录")
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if sys.argv[1:] != ["purge"]:
+        print("用法: python token_store.py purge")
+        sys.exit(1)
+    with SessionLocal() as session:
+        result = session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now(timezone.utc)))
+        session.commit()
+    print(f"已清理过期的吊销记录: {result.rowcount}")
@@ -0,0 +1,202 @@
+"""
+微信服务端接口客户端
+
+所有请求共用一个 httpx.AsyncClient（长连接池），避免每次登录都重新建立 TLS 连接；
+连接和读取都有超时，上游变慢时不会无限期占住 worker。
+
+- 网络错误、超时、HTTP 5xx 以及微信返回的系统繁忙（errcode -1）按指数退避加随机抖动重试
+- 连续失败达到 wechat_breaker_failures 次后熔断，wechat_breaker_reset_seconds 秒内直接失败，
+  之后放行一个探测请求，成功则恢复
+- 业务错误（如 code 无效）不重试，也不计入熔断
+
+离线压测时把 wechat_api_base 指向 wechat_mock_server.py 启动的本地服务即可。
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import settings
+
+# 微信返回该 errcode 表示系统繁忙，可以重试
+WECHAT_BUSY_ERRCODE = -1
+
+class WechatError(Exception):
+    """微信返回的业务错误（code 无效、已使用等），重试无意义"""
+
+    def __init__(self, errcode: int, errmsg: str):
+        super().__init__(f"{errcode}: {errmsg}")
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+class WechatUnavailable(Exception):
+    """微信接口不可用：重试耗尽或熔断中"""
+
+class CircuitBreaker:
+    """连续失败计数熔断器：closed -> open（拒绝请求）-> half_open（放行一个探测请求）"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """请求没有结果（如被取消）时交还探测名额，熔断状态不变"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+class WechatClient:
+    def __init__(self):
+        self.breaker = CircuitBreaker(settings.wechat_breaker_failures, settings.wechat_breaker_reset_seconds)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    async def _http(self) -> httpx.AsyncClient:
+        # 连接池绑定在创建它的事件循环上，换了事件循环（如测试）时关闭旧连接池后重新创建
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                try:
+                    await self._client.aclose()
+                except RuntimeError:
+                    # 旧事件循环已关闭，其上的连接无法正常关闭，直接丢弃
+                    pass
+            self._client = httpx.AsyncClient(
+                base_url=settings.wechat_api_base,
+                timeout=httpx.Timeout(settings.wechat_timeout_seconds, connect=settings.wechat_connect_timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=settings.wechat_max_connections,
+                    max_keepalive_connections=settings.wechat_max_connections,
+                ),
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _backoff(self, attempt: int) -> None:
+        # 全抖动：在 [0, base * 2^attempt] 内随机等待，避免大量登录同时重试
+        self.retries += 1
+        await asyncio.sleep(random.uniform(0, settings.wechat_retry_backoff_seconds * (2 ** attempt)))
+
+    async def get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """请求微信接口，返回 JSON；业务错误抛出 WechatError，不可用时抛出 WechatUnavailable"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise WechatUnavailable("微信接口暂时不可用（熔断中）")
+
+        # 每个放行的请求都必须记录结果，否则半开状态的探测名额不会交还，熔断器一直拒绝请求
+        recorded = False
+        try:
+            http = await self._http()
+            last_error = ""
+            for attempt in range(settings.wechat_max_retries + 1):
+                if attempt:
+                    await self._backoff(attempt - 1)
+                self.requests += 1
+                try:
+                    response = await http.get(path, params=params)
+                except httpx.HTTPError as e:
+                    last_error = f"{type(e).__name__}: {e}"
+                    continue
+                if response.status_code >= 500:
+                    last_error = f"HTTP {response.status_code}"
+                    continue
+                try:
+                    result = response.json()
+                except ValueError:
+                    last_error = f"HTTP {response.status_code} 非 JSON 响应"
+                    continue
+                errcode = result.get("errcode") or 0
+                if errcode == WECHAT_BUSY_ERRCODE:
+                    last_error = f"{errcode}: {result.get('errmsg', '')}"
+                    continue
+                recorded = True
+                self.breaker.record_success()
+                if errcode:
+                    raise WechatError(errcode, result.get("errmsg", "未知错误"))
+                return result
+
+            self.failures += 1
+            recorded = True
+            self.breaker.record_failure()
+            raise WechatUnavailable(f"微信接口请求失败: {last_error}")
+        except Exception:
+            # 意外异常按失败计入
+            if not recorded:
+                recorded = True
+                self.failures += 1
+                self.breaker.record_failure()
+            raise
+        finally:
+            # 只剩请求被取消（CancelledError 不是 Exception）：交还探测名额
+            if not recorded:
+                self.breaker.release()
+
+    async def jscode2session(self, code: str) -> Dict[str, Any]:
+        """小程序登录凭证校验，返回 openid、session_key（及 unionid）"""
+        return await self.get("/sns/jscode2session", {
+            "appid": settings.wechat_app_id,
+            "secret": settings.wechat_app_secret,
+            "js_code": code,
+            "grant_type": "authorization_code",
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+wechat_client = WechatClient()
@@ -0,0 +1,51 @@
+"""
+本地微信接口模拟服务，用于离线压测登录流程
+
+    python wechat_mock_server.py --port 9100 --latency-ms 80 --error-rate 0.05
+
+然后设置 WECHAT_API_BASE=http://127.0.0.1:9100、WECHAT_LOGIN_ENABLED=true 启动后端。
+
+- 同一个 code 总是得到同一个 openid（code 的 sha256 前缀），便于重复登录
+- code 以 invalid 开头时返回 40029（code 无效）
+- --error-rate 按比例返回系统繁忙（errcode -1），--failure-rate 按比例返回 HTTP 500，用于观察重试与熔断
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI(title="WeChat API mock")
+app.state.latency_ms = 0.0
+app.state.error_rate = 0.0
+app.state.failure_rate = 0.0
+
+@app.get("/sns/jscode2session")
+async def jscode2session(appid: str = "", secret: str = "", js_code: str = "", grant_type: str = ""):
+    if app.state.latency_ms:
+        await asyncio.sleep(app.state.latency_ms / 1000)
+    if random.random() < app.state.failure_rate:
+        return PlainTextResponse("internal error", status_code=500)
+    if random.random() < app.state.error_rate:
+        return {"errcode": -1, "errmsg": "system error"}
+    if not js_code or js_code.startswith("invalid"):
+        return {"errcode": 40029, "errmsg": "invalid code"}
+    digest = hashlib.sha256(js_code.encode("utf-8")).hexdigest()
+    return {"openid": "mock_" + digest[:24], "session_key": digest[24:48]}
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地微信接口模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的模拟延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回系统繁忙（errcode -1）的比例")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回 HTTP 500 的比例")
+    args = parser.parse_args()
+    app.state.latency_ms = args.latency_ms
+    app.state.error_rate = args.error_rate
+    app.state.failure_rate = args.failure_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
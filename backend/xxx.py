@@ -1,27 +1,17 @@
-from models import Exam,Subject
 from config import settings
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from repositories import get_exam
 
 
 DATABASEURL=settings.database_url
 engine=create_engine(DATABASEURL)
 SessionLocal=sessionmaker(bind=engine)
 session=SessionLocal()
-exam=session.query(Exam).filter(Exam.id==1).first()
+# 按 exam_subjects 方案一次取回考试和全部科目，循环中不再逐个懒加载
+exam=get_exam(session, 1, "exam_subjects")
 print(exam.subjects)
 
 for subject in exam.subjects:
     print(exam.intro)
     print(subject.name)
-
-
-
-
-
-
-
-
-
-
-